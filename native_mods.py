@@ -92,8 +92,9 @@ def make_modules(src_path, include_path, lib_path=None):
         include_dirs = buildutils.make_source_list(
             include_path, ['cairo', 'pycairo', 'pango-1.0', 'glib-2.0'])
     elif os.name == 'posix':
-        include_dirs = buildutils.get_pkg_includes(['pangocairo', 'pycairo'])
-        pango_libs = buildutils.get_pkg_libs(['pangocairo', ])
+        include_dirs = buildutils.get_pkg_includes(
+            ['pangocairo', 'pangoft2', 'pycairo'])
+        pango_libs = buildutils.get_pkg_libs(['pangocairo', 'pangoft2'])
 
     pango_module = Extension(
         'uc2.libpango._libpango',
@@ -21,7 +21,7 @@ from uc2 import uc2const
 from uc2.uc2const import COLOR_DISPLAY
 from uc2.utils import fsutils
 
-from uc2.cms import ColorManager, CS, libcms, val_255
+from uc2.cms import ColorManager, CS, libcms, linkcache, val_255
 from sk1 import config, events
 
 
@@ -42,6 +42,7 @@ class AppColorManager(ColorManager):
             events.emit(events.CMS_CHANGED)
             for item in self.app.docs:
                 item.model.clear_color_cache()
+                item.canvas.renderer.invalidate()
             self.app.current_doc.canvas.force_redraw()
 
     def update(self):
@@ -94,6 +95,11 @@ class AppColorManager(ColorManager):
             self.flags = self.flags | uc2const.cmsFLAGS_BLACKPOINTCOMPENSATION
         if config.cms_bpt_flag:
             self.flags = self.flags | uc2const.cmsFLAGS_PRESERVEBLACK
+        cache_dir = None
+        if config.cms_proof_cache:
+            cache_dir = self.app.appdata.app_proof_cache_dir
+            cache_dir = fsutils.get_sys_path(cache_dir)
+        linkcache.set_cache_dir(cache_dir)
 
     def registry_cm(self, cm):
         self.color_mngrs.append(cm)
@@ -228,6 +228,16 @@ class AppConfig(UCConfig):
 
     rotation_step = 5.0  # in degrees
     stroke_sensitive_size = 5.0  # in pixels
+    render_margin = 3.0  # in pixels, visible area extension for culling
+    render_damage_limit = 0.5  # part of canvas area for partial repaint
+    tiled_rendering = False  # renders canvas by tiles in background threads
+    lod_rendering = False  # simplified rendering of tiny and dense objects
+    lod_pixel_size = 1.0  # in pixels, smaller objects are drawn as dots
+    lod_tolerance = 0.5  # in pixels, simplification tolerance of curves
+    tile_size = 256  # in pixels
+    tile_workers = 2  # number of tile rendering threads
+    tile_cache_memory = 128  # in MB, memory limit for rendered tiles
+    image_pyramid_memory = 256  # in MB, memory limit for image mipmaps
 
     # ============== SNAPPING OPTIONS ================
     snap_distance = 10.0  # in pixels
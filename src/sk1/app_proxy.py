@@ -352,6 +352,7 @@ class AppProxy:
         self.app.current_doc.canvas.zoom_selected()
 
     def force_redraw(self):
+        self.app.current_doc.canvas.renderer.invalidate()
         self.app.current_doc.canvas.force_redraw()
 
     def preferences(self):
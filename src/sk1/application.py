@@ -33,13 +33,17 @@ from sk1.app_palettes import AppPaletteManager
 from sk1.app_proxy import AppProxy
 from sk1.app_stdout import StreamLogger
 from sk1.clipboard import AppClipboard
+from sk1.document import tiles
 from sk1.document.presenter import SK1Presenter
 from sk1.parts.artprovider import create_artprovider
 from sk1.parts.mw import AppMainWindow
 from sk1.pwidgets import generate_fcache
 from uc2 import uc2const, libimg, msgconst
 from uc2.application import UCApplication
+from uc2.cms import libcms
 from uc2.formats import get_saver_by_id, get_loader
+from uc2.formats.pdf import pdf_filters
+from uc2.libimg import pyramid
 from uc2.utils import fsutils
 from uc2.utils.fsutils import get_sys_path
 from uc2.utils.mixutils import config_logging
@@ -106,8 +110,17 @@ class SK1Application(wal.Application, UCApplication):
         self.plugins = app_plugins.scan_plugins(self)
         self.actions = app_actions.create_actions(self)
 
+        libcms.cms_set_bitmap_threads(config.cms_bitmap_threads)
         self.default_cms = AppColorManager(self)
         self.palettes = AppPaletteManager(self)
+        pyramid.set_memory_limit(config.image_pyramid_memory * 1024 * 1024)
+        pyramid.set_ready_callback(self.image_pyramid_ready)
+        tiles.set_memory_limit(config.tile_cache_memory * 1024 * 1024)
+        tiles.set_workers(config.tile_workers)
+        tiles.set_ready_callback(self.canvas_tiles_ready)
+        # PDF export is not parallel here: forking GUI process with
+        # running threads can deadlock worker processes
+        pdf_filters.set_font_embedding(config.pdf_embed_fonts)
         self.clipboard = AppClipboard(self)
 
         self.mw = AppMainWindow(self)
@@ -146,6 +159,21 @@ class SK1Application(wal.Application, UCApplication):
                 events.emit(events.NO_DOCS)
         self.update_actions()
 
+    def image_pyramid_ready(self):
+        wal.call_after(self.redraw_current_doc)
+
+    def canvas_tiles_ready(self):
+        wal.call_after(self.repaint_current_doc)
+
+    def repaint_current_doc(self):
+        if self.current_doc:
+            self.current_doc.canvas.force_redraw()
+
+    def redraw_current_doc(self):
+        if self.current_doc:
+            self.current_doc.canvas.renderer.invalidate()
+            self.current_doc.canvas.force_redraw()
+
     def update_wal(self):
         wal.SPIN['overlay'] = config.spin_overlay
         wal.SPIN['sep'] = config.spin_sep
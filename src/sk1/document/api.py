@@ -223,6 +223,7 @@ class AbstractAPI:
             obj.fill_trafo = fill_trafo
             obj.stroke_trafo = stroke_trafo
             obj.clear_color_cache()
+            obj.mark_changed()
 
     def _fill_objs(self, objs, color):
         for obj in objs:
@@ -248,6 +249,7 @@ class AbstractAPI:
                     style[0] = []
             obj.style = style
             obj.fill_trafo = []
+            obj.mark_changed()
 
     def _set_objs_fill_style(self, objs, fill_style):
         for obj in objs:
@@ -256,6 +258,7 @@ class AbstractAPI:
                 style[0] = deepcopy(fill_style)
                 obj.style = style
                 obj.clear_color_cache()
+                obj.mark_changed()
 
     def _set_paths_and_trafo(self, obj, paths, trafo):
         obj.paths = paths
@@ -343,6 +346,7 @@ class AbstractAPI:
                     style[1] = []
                     obj.stroke_trafo = []
             obj.style = style
+            obj.mark_changed()
 
     def _set_objs_stroke_style(self, objs, stroke_style):
         for obj in objs:
@@ -350,6 +354,7 @@ class AbstractAPI:
                 style = deepcopy(obj.style)
                 style[1] = deepcopy(stroke_style)
                 obj.style = style
+                obj.mark_changed()
 
     def _set_parent(self, objs, parent):
         for obj in objs:
@@ -362,12 +367,14 @@ class AbstractAPI:
     def _set_bitmap(self, obj, bmpstr, colorspace=None):
         obj.bitmap = bmpstr
         obj.clear_color_cache()
+        obj.mark_changed()
         if colorspace:
             obj.colorspace = colorspace
 
     def _set_alpha(self, obj, alphastr):
         obj.alpha_channel = alphastr
         obj.clear_color_cache()
+        obj.mark_changed()
 
     def _get_text_data(self, text_obj):
         text = text_obj.get_text()
@@ -1250,6 +1257,7 @@ class PresenterAPI(AbstractAPI):
 
     def set_temp_style(self, obj, style):
         obj.style = style
+        obj.mark_changed()
         self.eventloop.emit(self.eventloop.DOC_MODIFIED)
         self.selection.update()
 
@@ -24,7 +24,7 @@ from sk1.appconst import PAGEFIT, ZOOM_IN, ZOOM_OUT
 from sk1.document import controllers
 from sk1.document.renderer import PDRenderer
 from sk1.pwidgets import Painter
-from uc2 import libcairo, libgeom
+from uc2 import libcairo, libgeom, sk2const
 from uc2.libcairo import normalize_bbox
 from uc2.sk2const import DOC_ORIGIN_LL, DOC_ORIGIN_LU
 from uc2.uc2const import mm_to_pt
@@ -212,8 +212,9 @@ class AppCanvas(Painter):
 
     def _set_center(self, center):
         x, y = center
-        _dx = self.width / 2.0 - x
-        _dy = self.height / 2.0 - y
+        # whole pixel shift keeps rendered canvas content reusable
+        _dx = round(self.width / 2.0 - x)
+        _dy = round(self.height / 2.0 - y)
         m11, m12, m21, m22, dx, dy = self.trafo
         dx += _dx
         dy += _dy
@@ -469,6 +470,7 @@ class AppCanvas(Painter):
                     self.dragged_guide = ()
             self.renderer.finalize()
         except Exception as e:
+            self.renderer.invalidate()
             LOG.error('Painting error %s', e)
 
 
@@ -500,42 +502,53 @@ class HitSurface:
         return trafo
 
     def is_point_into_object(self, win_point, obj, fill_anyway=False):
-        self.clear()
-        self._draw_object(obj, self.get_context_trafo(win_point), fill_anyway)
-        return not libcairo.check_surface_whiteness(self.surface)
-
-    def _draw_object(self, obj, trafo, fill_anyway=False):
+        point = self.canvas.win_to_doc(win_point)
+        return self.is_doc_point_into_object(point, obj, fill_anyway)
+
+    def is_doc_point_into_object(self, point, obj, fill_anyway=False):
+        """
+        Analytic hit-test of object by point in document coordinates.
+        Tolerances emulate rasterized probe for current zoom.
+        """
         if obj.childs:
             for child in obj.childs:
-                self._draw_object(child, trafo)
-        else:
-            path = obj.cache_cpath
-
-            if obj.is_text():
-                path = libcairo.convert_bbox_to_cpath(obj.cache_bbox)
-                fill_anyway = True
-            if obj.is_curve() and len(obj.paths) > 100:
-                path = libcairo.convert_bbox_to_cpath(obj.cache_bbox)
-                fill_anyway = True
-            if obj.is_pixmap():
-                fill_anyway = True
-
-            self.ctx.set_matrix(libcairo.get_matrix_from_trafo(trafo))
-            self.ctx.new_path()
-            self.ctx.append_path(path)
-            stroke_width = config.stroke_sensitive_size
-            if not self.canvas.stroke_view and obj.style[0]:
-                self.ctx.fill_preserve()
-            if fill_anyway:
-                self.ctx.fill_preserve()
-            if obj.style[1]:
-                stroke = obj.style[1]
-                width = stroke[1] * trafo[0]
-                stroke_width /= trafo[0]
-                if width < stroke_width:
-                    width = stroke_width
-                self.ctx.set_line_width(width)
-                self.ctx.stroke()
+                if self.is_doc_point_into_object(point, child, fill_anyway):
+                    return True
+            return False
+
+        zoom = self.canvas.zoom
+        tolerance = 0.5 / zoom
+        if obj.is_text():
+            bbox = libgeom.enlarge_bbox(obj.cache_bbox, tolerance, tolerance)
+            return libgeom.is_point_in_bbox(point, bbox)
+
+        hit_paths = obj.get_hit_paths()
+        fill = obj.style[0]
+        if obj.is_pixmap():
+            fill_anyway = True
+        if fill_anyway or (not self.canvas.stroke_view and fill):
+            rule = fill[0] if fill else sk2const.FILL_EVENODD
+            evenodd = bool(rule & sk2const.FILL_EVENODD)
+            closed_only = bool(rule & sk2const.FILL_CLOSED_ONLY) \
+                and not fill_anyway
+            if libgeom.is_point_in_hit_paths(point, hit_paths,
+                                             evenodd, closed_only):
+                return True
+            if libgeom.is_point_on_hit_paths(point, hit_paths, tolerance):
+                return True
+        if obj.style[1]:
+            stroke = obj.style[1]
+            width = stroke[1]
+            if stroke[8] and obj.stroke_trafo:
+                points = [[0.0, 0.0], [1.0, 0.0]]
+                points = libgeom.apply_trafo_to_points(points,
+                                                       obj.stroke_trafo)
+                width *= libgeom.distance(*points)
+            width = max(width, config.stroke_sensitive_size / zoom)
+            distance = width / 2.0 + tolerance
+            if libgeom.is_point_on_hit_paths(point, hit_paths, distance):
+                return True
+        return False
 
     def is_point_on_path(self, win_point, path):
         self.clear()
@@ -20,6 +20,7 @@ import math
 from copy import deepcopy
 
 from sk1 import config
+from sk1.document import tiles
 from uc2 import libcairo, libgeom
 from uc2 import uc2const, sk2const
 from uc2.formats.sk2.crenderer import CairoRenderer
@@ -28,6 +29,9 @@ CAIRO_BLACK = [0.0, 0.0, 0.0]
 CAIRO_GRAY = [0.0, 0.0, 0.0, 0.5]
 CAIRO_WHITE = [1.0, 1.0, 1.0]
 
+SCROLL_TOLERANCE = 1.0e-6
+MAX_QUERY_RECTS = 8
+
 
 class PDRenderer(CairoRenderer):
     direct_matrix = None
@@ -40,6 +44,11 @@ class PDRenderer(CairoRenderer):
     doc_methods = None
     for_display = True
     temp_surface = None
+    view_state = None
+    view_offset = None
+    scroll_buffer = None
+    tile_state = None
+    tile_cache = None
 
     frame = []
     snap = []
@@ -61,15 +70,283 @@ class PDRenderer(CairoRenderer):
             # -------DOCUMENT RENDERING
 
     def paint_document(self):
+        """
+        Renders document into backing surface. While view is not changed
+        only areas damaged by model changes are repainted.
+        """
         self.presenter = self.canvas.presenter
         self.doc_methods = self.presenter.methods
         self.cms = self.presenter.cms
+        self.lod_flag = config.lod_rendering
+        self.lod_pixel_size = config.lod_pixel_size
+        self.lod_tolerance = config.lod_tolerance
+        if config.tiled_rendering:
+            self.paint_tiles()
+            return
+        self.tile_state = None
+        damage = self.collect_damage()
+        state = self.get_view_state()
+        offset = self.canvas.trafo[4:]
+        rects = None
+        if self.surface is not None and state == self.view_state \
+                and damage is not None:
+            rects = self.get_damage_rects(damage)
+            if rects is not None and offset != self.view_offset:
+                rects = self.scroll_surface(offset, rects)
+        if rects is None:
+            self.start()
+            self.paint_page()
+            self.render_doc()
+            self.render_grid()
+            self.render_guides()
+            self.view_state = state
+            self.view_offset = offset
+        elif rects:
+            self.repaint_rects(rects)
+
+    def invalidate(self):
+        """
+        Drops backing surface content, so next paint_document()
+        call renders whole document.
+        """
+        self.view_state = None
+        self.tile_state = None
+
+    def get_view_state(self):
+        """
+        Returns snapshot of everything (except page objects and scroll
+        offset) which affects backing surface content.
+        """
+        methods = self.doc_methods
+        canvas = self.canvas
+        page = self.presenter.active_page
+        layers = [(id(layer), layer.properties, layer.style)
+                  for layer in page.childs]
+        grid_layer = methods.get_grid_layer()
+        guide_layer = methods.get_guide_layer()
+        guides = [(item.orientation, item.position)
+                  for item in guide_layer.childs if item.is_guide()]
+        return repr((canvas.dc.get_size(), canvas.trafo[:4],
+                     canvas.draft_view, canvas.stroke_view, id(page), layers,
+                     self.presenter.get_page_size(),
+                     methods.get_desktop_bg(), methods.get_page_fill(),
+                     methods.get_page_border(), methods.get_doc_units(),
+                     methods.get_doc_origin(), grid_layer.properties,
+                     grid_layer.grid, grid_layer.color,
+                     guide_layer.properties, guide_layer.color, guides,
+                     config.guide_line_dash, config.snap_distance,
+                     self.get_lod_state()))
+
+    def get_tile_state(self):
+        """
+        Returns snapshot of view options which affect rendered tiles.
+        """
+        canvas = self.canvas
+        page = self.presenter.active_page
+        layers = [(id(layer), layer.properties, layer.style)
+                  for layer in page.childs]
+        return repr((canvas.draft_view, canvas.stroke_view, id(page),
+                     layers, self.get_lod_state()))
+
+    def get_lod_state(self):
+        return self.lod_flag, self.lod_pixel_size, self.lod_tolerance
+
+    def collect_damage(self):
+        """
+        Returns document bboxes changed since last paint
+        or None if whole page should be repainted.
+        """
+        ret = []
+        for layer in self.presenter.active_page.childs:
+            damage = layer.get_index().pop_damage()
+            if damage is None:
+                return None
+            ret += damage
+        return ret
+
+    def get_damage_rects(self, damage):
+        """
+        Converts damaged document bboxes into window rectangles.
+        Returns None if damaged area is too large for partial repaint.
+        """
+        margin = config.render_margin + 1.0
+        rects = []
+        area = 0
+        for bbox in damage:
+            x0, y0, x1, y1 = self.canvas.bbox_doc_to_win(bbox)
+            x0 = max(0, int(math.floor(x0 - margin)))
+            y0 = max(0, int(math.floor(y0 - margin)))
+            x1 = min(self.width, int(math.ceil(x1 + margin)))
+            y1 = min(self.height, int(math.ceil(y1 + margin)))
+            if x1 > x0 and y1 > y0:
+                rects.append([x0, y0, x1, y1])
+                area += (x1 - x0) * (y1 - y0)
+        if area > config.render_damage_limit * self.width * self.height:
+            return None
+        return rects
+
+    def scroll_surface(self, offset, rects):
+        """
+        Shifts backing surface content after view scrolling and
+        returns provided rectangles plus newly exposed strips.
+        Returns None if surface content cannot be reused.
+        """
+        dx = offset[0] - self.view_offset[0]
+        dy = offset[1] - self.view_offset[1]
+        idx, idy = int(round(dx)), int(round(dy))
+        if abs(dx - idx) > SCROLL_TOLERANCE or \
+                abs(dy - idy) > SCROLL_TOLERANCE or \
+                abs(idx) >= self.width or abs(idy) >= self.height:
+            return None
+        strips = []
+        if idx > 0:
+            strips.append([0, 0, idx, self.height])
+        elif idx < 0:
+            strips.append([self.width + idx, 0, self.width, self.height])
+        if idy > 0:
+            strips.append([0, 0, self.width, idy])
+        elif idy < 0:
+            strips.append([0, self.height + idy, self.width, self.height])
+        if self.scroll_buffer is None or \
+                self.scroll_buffer.get_width() != self.width or \
+                self.scroll_buffer.get_height() != self.height:
+            self.scroll_buffer = cairo.ImageSurface(cairo.FORMAT_RGB24,
+                                                    self.width, self.height)
+        ctx = cairo.Context(self.scroll_buffer)
+        ctx.set_operator(cairo.OPERATOR_SOURCE)
+        ctx.set_source_surface(self.surface, idx, idy)
+        ctx.paint()
+        self.surface, self.scroll_buffer = self.scroll_buffer, self.surface
+        self.view_offset = offset
+        return rects + strips
+
+    def repaint_rects(self, rects):
+        """
+        Repaints backing surface clipped by window rectangles.
+        """
+        self.ctx = cairo.Context(self.surface)
+        for x0, y0, x1, y1 in rects:
+            self.ctx.rectangle(x0, y0, x1 - x0, y1 - y0)
+        self.ctx.clip()
+        self.ctx.set_source_rgb(*self.doc_methods.get_desktop_bg())
+        self.ctx.paint()
+        self.ctx.set_matrix(self.canvas.matrix)
+        self.paint_page()
+        if len(rects) > MAX_QUERY_RECTS:
+            x0, y0, x1, y1 = rects[0]
+            for rect in rects[1:]:
+                x0, y0 = min(x0, rect[0]), min(y0, rect[1])
+                x1, y1 = max(x1, rect[2]), max(y1, rect[3])
+            rects = [[x0, y0, x1, y1]]
+        margin = config.render_margin
+        bboxes = [self.canvas.bbox_win_to_doc([x0 - margin, y0 - margin,
+                                               x1 + margin, y1 + margin])
+                  for x0, y0, x1, y1 in rects]
+        self.render_doc(bboxes)
+        self.render_grid()
+        self.render_guides()
+
+    def paint_tiles(self):
+        """
+        Composes canvas from document tiles rendered in background.
+        Missing tiles are requested (low resolution ones first)
+        and replaced by available low resolution tiles.
+        """
+        if self.tile_cache is None:
+            self.tile_cache = tiles.TileCache(config.tile_size)
+        cache = self.tile_cache
+        damage = self.collect_damage()
+        state = self.get_tile_state()
+        if state != self.tile_state or damage is None:
+            cache.clear()
+            self.tile_state = state
+        elif damage:
+            cache.invalidate(damage)
+        self.view_state = None
+
         self.start()
         self.paint_page()
-        self.render_doc()
+        self.ctx.set_matrix(self.direct_matrix)
+        zoom = self.canvas.zoom
+        dx, dy = self.canvas.trafo[4:]
+        view = [-dx, -dy, self.width - dx, self.height - dy]
+        low_zoom = zoom / tiles.LOW_RES
+        low_view = [item / tiles.LOW_RES for item in view]
+        low_keys = self.get_tile_keys(low_zoom, low_view)
+        keys = self.get_tile_keys(zoom, view)
+        resources = tiles.TileResources(self, self.canvas.stroke_view)
+        cache.request([(0, key) for key in low_keys] +
+                      [(1, key) for key in keys],
+                      self.get_tile_layers, self.get_tile_options(),
+                      resources)
+        surfaces = [(key, cache.get(key)) for key in keys]
+        if not all([surface for key, surface in surfaces]):
+            for key in low_keys:
+                surface = cache.get(key)
+                if surface is not None:
+                    self.paint_tile(surface, key, tiles.LOW_RES, dx, dy)
+        for key, surface in surfaces:
+            if surface is not None:
+                self.paint_tile(surface, key, 1, dx, dy)
+        self.ctx.set_matrix(self.canvas.matrix)
         self.render_grid()
         self.render_guides()
 
+    def get_tile_keys(self, zoom, bbox):
+        i0, j0, i1, j1 = self.tile_cache.get_tile_range(zoom, bbox)
+        return [(zoom, i, j) for j in range(j0, j1 + 1)
+                for i in range(i0, i1 + 1)]
+
+    def get_tile_layers(self, bbox, zoom, resources):
+        """
+        Returns list of (objects, antialias flag, stroke style)
+        for visible layers in tile document bbox. Colors and images
+        of objects are added into tile resources.
+        """
+        margin = config.render_margin / zoom
+        bbox = [bbox[0] - margin, bbox[1] - margin,
+                bbox[2] + margin, bbox[3] + margin]
+        ret = []
+        for layer in self.presenter.active_page.childs:
+            if not layer.properties[0]:
+                continue
+            stroke_style = None
+            if self.canvas.stroke_view:
+                stroke_style = deepcopy(layer.style)
+                stroke_style[1][1] = 1.0 / zoom
+                resources.add_style(stroke_style)
+            antialias_flag = not self.canvas.draft_view and \
+                             bool(layer.properties[3])
+            objs = list(layer.query_bbox(bbox))
+            tiles.prepare_objects(objs, resources)
+            if self.lod_flag:
+                self.prepare_lod(objs, zoom)
+            ret.append((objs, antialias_flag, stroke_style))
+        return ret
+
+    def get_tile_options(self):
+        """
+        Returns renderer attributes for tile workers.
+        """
+        return {'contour_flag': self.canvas.stroke_view,
+                'lod_flag': self.lod_flag,
+                'lod_build': False,
+                'lod_pixel_size': self.lod_pixel_size,
+                'lod_tolerance': self.lod_tolerance}
+
+    def paint_tile(self, surface, key, scale, dx, dy):
+        zoom, i, j = key
+        size = self.tile_cache.tile_size
+        self.ctx.save()
+        self.ctx.translate(dx, dy)
+        self.ctx.scale(scale, scale)
+        self.ctx.rectangle(i * size, j * size, size, size)
+        self.ctx.clip()
+        self.ctx.set_source_surface(surface, i * size, j * size)
+        self.ctx.get_source().set_extend(cairo.EXTEND_PAD)
+        self.ctx.paint()
+        self.ctx.restore()
+
     def start(self):
         width, height = self.canvas.dc.get_size()
         if self.surface is None:
@@ -148,7 +425,28 @@ class PDRenderer(CairoRenderer):
             self.ctx.stroke()
         self.ctx.set_antialias(cairo.ANTIALIAS_DEFAULT)
 
-    def render_doc(self):
+    def get_visible_bbox(self):
+        """
+        Returns document bounding box of canvas window area.
+        Area is enlarged by a few pixels to cover antialiasing
+        and contour mode strokes.
+        """
+        margin = config.render_margin
+        bbox = [-margin, -margin, self.width + margin, self.height + margin]
+        return self.canvas.bbox_win_to_doc(bbox)
+
+    def query_layer(self, layer, bboxes):
+        """
+        Returns layer childs which can be visible in any of bboxes.
+        """
+        if len(bboxes) == 1:
+            return layer.query_bbox(bboxes[0])
+        hits = set()
+        for bbox in bboxes:
+            hits.update(layer.query_bbox(bbox))
+        return [obj for obj in layer.childs if obj in hits]
+
+    def render_doc(self, bboxes=None):
         if self.canvas.draft_view:
             self.antialias_flag = False
         else:
@@ -160,6 +458,7 @@ class PDRenderer(CairoRenderer):
             self.contour_flag = False
 
         page = self.presenter.active_page
+        bboxes = bboxes or [self.get_visible_bbox()]
         for layer in page.childs:
             if layer.properties[0]:
                 if self.canvas.stroke_view:
@@ -168,7 +467,7 @@ class PDRenderer(CairoRenderer):
                     stroke[1] = 1.0 / self.canvas.zoom
                 if not layer.properties[3] and not self.canvas.draft_view:
                     self.antialias_flag = False
-                self.render(self.ctx, layer.childs)
+                self.render(self.ctx, self.query_layer(layer, bboxes))
                 if not layer.properties[3] and not self.canvas.draft_view:
                     self.antialias_flag = True
 
@@ -16,6 +16,7 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from uc2 import libgeom
+from uc2.formats.sk2.sk2_model import get_visual_bbox
 
 from sk1 import _, config
 from sk1 import events
@@ -117,40 +118,28 @@ class Selection:
         else:
             self.set(result)
 
-    def _get_fixed_bbox(self, bbox):
-        bbox = self.presenter.canvas.bbox_doc_to_win(bbox)
-        bbox = libgeom.normalize_bbox(bbox)
-        if not bbox[2] - bbox[0]:
-            bbox[2] += 4
-            bbox[0] -= 4
-        if not bbox[3] - bbox[1]:
-            bbox[3] += 4
-            bbox[1] -= 4
-        return bbox
-
     def _select_at_point(self, point, check_unfilled=False):
         result = []
         doc = self.presenter
         layers = doc.get_editable_layers()
         layers.reverse()
-        win_point = doc.canvas.doc_to_win(point)
         hit_surface = doc.canvas.hit_surface
+        d = config.stroke_sensitive_size / doc.canvas.zoom
+        x, y = point
+        point_bbox = [x - d, y - d, x + d, y + d]
         for layer in layers:
             if result:
                 break
-            objs = [] + layer.childs
+            objs = [] + layer.query_bbox(point_bbox)
             objs.reverse()
             for obj in objs:
-                bbox = self._get_fixed_bbox(obj.cache_bbox)
-                d = 0.0
-                if obj.style[1]:
-                    d = doc.canvas.zoom * obj.style[1][1]
-                bbox = libgeom.enlarge_bbox(bbox, d, d)
-                if libgeom.is_point_in_bbox(win_point, bbox):
-                    if hit_surface.is_point_into_object(win_point, obj,
+                bbox = get_visual_bbox(obj)
+                if not bbox or not libgeom.is_bbox_overlap(point_bbox, bbox):
+                    continue
+                if hit_surface.is_doc_point_into_object(point, obj,
                                                         check_unfilled):
-                        result.append(obj)
-                        break
+                    result.append(obj)
+                    break
         return result
 
     def select_at_point(self, point, add_flag=False):
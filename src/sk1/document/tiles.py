@@ -0,0 +1,414 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tiled document rendering for canvas.
+
+Document is rasterised into fixed size tiles per zoom level by
+background worker threads. Tile (i, j) of zoom Z covers pixels
+[i * size, (i + 1) * size) x [j * size, (j + 1) * size) of document
+scaled by Z (with Y axis flipped), so tiles do not depend on scroll
+offset. Rendered tiles share common memory budget and least recently
+used tiles are evicted first. Low resolution tiles are requested
+before tiles of canvas zoom and are shown till those are ready.
+
+Objects to render are collected by GUI thread when tile is requested,
+workers only rasterise them. Display colors and images are resolved
+by GUI thread too (see TileResources), so workers do not use color
+manager and image caches which are not thread-safe.
+"""
+
+import cairo
+import logging
+import math
+import threading
+import time
+import weakref
+from Queue import PriorityQueue
+from collections import OrderedDict
+
+from uc2 import libgeom, libimg, sk2const
+from uc2.formats.sk2.crenderer import CairoRenderer
+
+LOG = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+LOW_RES = 4
+MEMORY_LIMIT = 128 * 1024 * 1024
+WORKERS = 2
+CALLBACK_INTERVAL = 0.1
+
+
+def prepare_objects(objs, resources):
+    """
+    Updates geometry of objects which are not updated yet
+    and resolves their colors and images, so workers do not modify
+    document model.
+    """
+    for obj in objs:
+        if obj.is_primitive():
+            if obj.cache_cpath is None:
+                obj.update()
+            resources.add_object(obj)
+        elif obj.childs:
+            prepare_objects(obj.childs, resources)
+
+
+def get_color_key(color):
+    # alpha is not converted and color name does not affect conversion
+    return repr(color[:2])
+
+
+class TileResources(object):
+    """
+    Display colors, images and pattern images of objects
+    in tile jobs. Resources are resolved by provided renderer
+    in GUI thread and are read by workers only.
+    """
+
+    def __init__(self, renderer, contour_flag=False):
+        self.renderer = renderer
+        self.contour_flag = contour_flag
+        self.colors = {}
+        self.images = {}
+        self.patterns = {}
+
+    def add_color(self, color):
+        if color:
+            key = get_color_key(color)
+            if key not in self.colors:
+                self.colors[key] = self.renderer.cms.get_display_color(color)
+
+    def add_style(self, style):
+        fill, stroke = style[:2]
+        if fill and fill[1] == sk2const.FILL_SOLID:
+            self.add_color(fill[2])
+        elif fill and fill[1] == sk2const.FILL_GRADIENT:
+            for stop in fill[2][2]:
+                self.add_color(stop[1])
+        if stroke:
+            self.add_color(stroke[2])
+
+    def add_object(self, obj):
+        if obj.is_pixmap():
+            if self.contour_flag:
+                if not obj.cache_gray_cdata:
+                    libimg.update_gray_image(self.renderer.cms, obj)
+            else:
+                self.images[id(obj)] = self.renderer.get_image(obj)
+            return
+        # contour is drawn by layer stroke style
+        if self.contour_flag:
+            return
+        self.add_style(obj.style)
+        fill = obj.style[0]
+        if fill and fill[1] == sk2const.FILL_PATTERN:
+            self.patterns[id(obj)] = self.renderer.get_pattern_image(obj)
+
+
+class TileRenderer(CairoRenderer):
+    """
+    Renderer of tile workers which takes colors and images
+    from TileResources instead of color manager.
+    """
+
+    def __init__(self, resources):
+        CairoRenderer.__init__(self, None)
+        self.resources = resources
+        self.for_display = True
+
+    def get_color(self, color):
+        r, g, b = self.resources.colors[get_color_key(color)]
+        return r, g, b, color[2]
+
+    def get_image(self, pixmap):
+        return self.resources.images[id(pixmap)]
+
+    def get_pattern_image(self, obj):
+        return self.resources.patterns[id(obj)]
+
+
+class TileJob(object):
+    """
+    Request for rendering of single tile.
+    """
+
+    def __init__(self, cache, key, layers, options, resources):
+        self.cache = weakref.ref(cache)
+        self.key = key
+        self.layers = layers
+        self.options = options
+        self.resources = resources
+        self.generation = cache.generation
+        self.stamp = cache.stamps.get(key, 0)
+        self.epoch = cache.epoch
+
+    def is_actual(self, cache):
+        return self.generation == cache.generation and \
+               self.stamp == cache.stamps.get(self.key, 0)
+
+
+class TileCache(object):
+    """
+    Rendered tiles of single canvas.
+    """
+
+    def __init__(self, tile_size=TILE_SIZE):
+        self.tile_size = tile_size
+        self.tiles = {}
+        self.pending = {}
+        self.stamps = {}
+        self.generation = 0
+        self.epoch = 0
+
+    def get_tile_bbox(self, key):
+        """
+        Returns document bounding box of tile.
+        """
+        zoom, i, j = key
+        size = float(self.tile_size) / zoom
+        return [i * size, -(j + 1) * size, (i + 1) * size, -j * size]
+
+    def get_tile_range(self, zoom, bbox):
+        """
+        Returns range of tile indexes (i0, j0, i1, j1) which covers
+        provided window pixel bbox of document scaled by zoom.
+        """
+        size = float(self.tile_size)
+        x0, y0, x1, y1 = bbox
+        return (int(math.floor(x0 / size)), int(math.floor(y0 / size)),
+                int(math.ceil(x1 / size)) - 1, int(math.ceil(y1 / size)) - 1)
+
+    def get(self, key):
+        surface = self.tiles.get(key)
+        if surface is not None:
+            BUILDER.touch(self, key)
+        return surface
+
+    def request(self, keys, get_layers, options, resources):
+        """
+        Schedules rendering of missing tiles from provided list
+        of (priority, key) pairs. Objects for tile are collected
+        by get_layers(tile_bbox, zoom, resources) call which adds
+        their colors and images into resources, options dict contains
+        CairoRenderer attributes. Pending jobs which are not requested
+        again are dropped by workers.
+        """
+        with BUILDER.lock:
+            self.epoch += 1
+            for priority, key in keys:
+                if key in self.tiles:
+                    continue
+                job = self.pending.get(key)
+                if job is not None and job.is_actual(self):
+                    job.epoch = self.epoch
+                    continue
+                layers = get_layers(self.get_tile_bbox(key), key[0],
+                                    resources)
+                job = TileJob(self, key, layers, options, resources)
+                self.pending[key] = job
+                BUILDER.request(job, priority)
+
+    def clear(self):
+        with BUILDER.lock:
+            self.generation += 1
+            BUILDER.forget(self)
+            self.tiles = {}
+            self.pending = {}
+            self.stamps = {}
+
+    def invalidate(self, bboxes):
+        """
+        Drops tiles which intersect provided document bboxes.
+        """
+        with BUILDER.lock:
+            keys = set(self.tiles.keys() + self.pending.keys())
+            for key in keys:
+                tile_bbox = self.get_tile_bbox(key)
+                for bbox in bboxes:
+                    if libgeom.is_bbox_overlap(tile_bbox, bbox):
+                        self.stamps[key] = self.stamps.get(key, 0) + 1
+                        self.pending.pop(key, None)
+                        BUILDER.remove(self, key)
+                        break
+
+    def render(self, job):
+        zoom, i, j = job.key
+        size = self.tile_size
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, size, size)
+        ctx = cairo.Context(surface)
+        ctx.set_matrix(cairo.Matrix(zoom, 0.0, 0.0, -zoom,
+                                    -i * size, -j * size))
+        renderer = TileRenderer(job.resources)
+        for name, value in job.options.items():
+            setattr(renderer, name, value)
+        for objs, antialias_flag, stroke_style in job.layers:
+            renderer.antialias_flag = antialias_flag
+            renderer.stroke_style = stroke_style
+            renderer.render(ctx, objs)
+        return surface
+
+
+class TileBuilder(object):
+    """
+    Background workers which render tiles and keep tiles
+    memory under limit.
+    """
+
+    callback = None
+    memory_limit = MEMORY_LIMIT
+    workers = WORKERS
+
+    def __init__(self):
+        self.queue = PriorityQueue()
+        self.threads = []
+        self.lock = threading.RLock()
+        self.lru = OrderedDict()
+        self.refs = {}
+        self.size = 0
+        self.counter = 0
+        self.updated = False
+        self.last_callback = 0.0
+
+    def request(self, job, priority):
+        self.counter += 1
+        self.queue.put((priority, self.counter, job))
+        self.threads = [item for item in self.threads if item.is_alive()]
+        while len(self.threads) < self.workers:
+            thread = threading.Thread(target=self._run)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def _run(self):
+        while True:
+            job = self.queue.get()[2]
+            cache = job.cache()
+            if cache is not None:
+                self._process(cache, job)
+            cache = job = None
+            self._notify()
+
+    def _process(self, cache, job):
+        with self.lock:
+            if cache.pending.get(job.key) is not job:
+                return
+            if job.epoch != cache.epoch:
+                del cache.pending[job.key]
+                return
+        try:
+            surface = cache.render(job)
+        except Exception as e:
+            LOG.error('Cannot render canvas tile %s', e)
+            surface = None
+        with self.lock:
+            if cache.pending.get(job.key) is job:
+                del cache.pending[job.key]
+            if surface is not None and job.is_actual(cache):
+                self.add(cache, job.key, surface)
+                self.updated = True
+
+    def _notify(self):
+        now = time.time()
+        with self.lock:
+            if not self.updated or not (self.queue.empty() or
+                    now - self.last_callback > CALLBACK_INTERVAL):
+                return
+            self.updated = False
+            self.last_callback = now
+        if self.callback is not None:
+            self.callback()
+
+    def _get_ref(self, cache):
+        ref = self.refs.get(id(cache))
+        if ref is None:
+            ref = weakref.ref(cache, self._forget_ref)
+            self.refs[id(cache)] = ref
+        return ref
+
+    def _forget_ref(self, ref):
+        with self.lock:
+            for key in [key for key in self.lru if key[0] is ref]:
+                self.size -= self.lru.pop(key)
+            for key, value in self.refs.items():
+                if value is ref:
+                    del self.refs[key]
+
+    def add(self, cache, key, surface):
+        with self.lock:
+            lru_key = (self._get_ref(cache), key)
+            cache.tiles[key] = surface
+            self.size -= self.lru.pop(lru_key, 0)
+            self.lru[lru_key] = surface.get_stride() * surface.get_height()
+            self.size += self.lru[lru_key]
+            self._evict()
+
+    def remove(self, cache, key):
+        with self.lock:
+            cache.tiles.pop(key, None)
+            ref = self.refs.get(id(cache))
+            if ref is not None:
+                self.size -= self.lru.pop((ref, key), 0)
+
+    def forget(self, cache):
+        ref = self.refs.get(id(cache))
+        if ref is not None:
+            self._forget_ref(ref)
+
+    def touch(self, cache, key):
+        with self.lock:
+            ref = self.refs.get(id(cache))
+            if ref is not None and (ref, key) in self.lru:
+                self.lru[(ref, key)] = self.lru.pop((ref, key))
+
+    def _evict(self):
+        while self.size > self.memory_limit and len(self.lru) > 1:
+            (ref, key), size = self.lru.popitem(last=False)
+            self.size -= size
+            cache = ref()
+            if cache is not None:
+                cache.tiles.pop(key, None)
+
+    def set_memory_limit(self, limit):
+        with self.lock:
+            self.memory_limit = limit
+            self._evict()
+
+
+BUILDER = TileBuilder()
+
+
+def set_memory_limit(limit):
+    """
+    Sets memory limit (in bytes) for all rendered tiles.
+    """
+    BUILDER.set_memory_limit(limit)
+
+
+def set_workers(num):
+    """
+    Sets number of tile rendering threads.
+    """
+    BUILDER.workers = max(1, num)
+
+
+def set_ready_callback(callback):
+    """
+    Sets callback which is called (from worker thread)
+    when requested tiles are rendered.
+    """
+    BUILDER.callback = callback
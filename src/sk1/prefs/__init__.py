@@ -29,8 +29,7 @@ from sk1.resources import icons
 from templates import GridPrefs
 
 PREFS_APP = [GeneralPrefs, CMSPrefs, RulersPrefs,
-             PalettesPrefs, FontPrefs,
-             # CanvasPrefs,
+             PalettesPrefs, FontPrefs, CanvasPrefs,
              PrinterPrefs, ]
 
 PREFS_DOC = [GridPrefs, ]
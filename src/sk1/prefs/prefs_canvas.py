@@ -26,11 +26,61 @@ from generic import PrefPanel
 class CanvasPrefs(PrefPanel):
     pid = 'Canvas'
     name = _('Canvas')
-    title = _('Canvas marker preferences')
+    title = _('Canvas rendering preferences')
     icon_id = icons.PD_PREFS_PALETTE
 
+    lod = None
+    lod_pixel_size = None
+    lod_tolerance = None
+    tiles = None
+
     def __init__(self, app, dlg, *args):
         PrefPanel.__init__(self, app, dlg)
 
     def build(self):
+        txt = _('Simplify tiny and dense objects (level of detail)')
+        self.lod = wal.Checkbox(self, txt, config.lod_rendering,
+                                onclick=self.update_lod)
+        self.pack(self.lod, align_center=False, padding_all=5)
+
+        grid = wal.GridPanel(self, rows=2, cols=2, hgap=10, vgap=5)
+
+        grid.pack(wal.Label(grid, _('Draw as dot objects smaller than (px):')))
+        self.lod_pixel_size = wal.FloatSpin(grid, config.lod_pixel_size,
+                                            (0.1, 10.0), step=0.1)
+        grid.pack(self.lod_pixel_size)
+
+        grid.pack(wal.Label(grid, _('Curve simplification tolerance (px):')))
+        self.lod_tolerance = wal.FloatSpin(grid, config.lod_tolerance,
+                                           (0.1, 5.0), step=0.1)
+        grid.pack(self.lod_tolerance)
+
+        self.pack(grid, align_center=False, padding_all=10)
+
+        txt = _('Render canvas by tiles in background')
+        self.tiles = wal.Checkbox(self, txt, config.tiled_rendering)
+        self.pack(self.tiles, align_center=False, padding_all=5)
+
+        self.update_lod()
         self.built = True
+
+    def update_lod(self):
+        state = self.lod.get_value()
+        self.lod_pixel_size.set_enable(state)
+        self.lod_tolerance.set_enable(state)
+
+    def apply_changes(self):
+        config.lod_rendering = self.lod.get_value()
+        config.lod_pixel_size = self.lod_pixel_size.get_value()
+        config.lod_tolerance = self.lod_tolerance.get_value()
+        config.tiled_rendering = self.tiles.get_value()
+        if self.app.current_doc:
+            self.app.current_doc.canvas.force_redraw()
+
+    def restore_defaults(self):
+        defaults = config.get_defaults()
+        self.lod.set_value(defaults['lod_rendering'])
+        self.lod_pixel_size.set_value(defaults['lod_pixel_size'])
+        self.lod_tolerance.set_value(defaults['lod_tolerance'])
+        self.tiles.set_value(defaults['tiled_rendering'])
+        self.update_lod()
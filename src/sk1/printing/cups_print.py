@@ -243,6 +243,7 @@ class CUPS_Printer(AbstractPrinter):
         renderer.set_compression(True)
         renderer.set_colorspace(self.colorspace)
         renderer.set_spot_usage(False)
+        renderer.set_font_usage(config.pdf_embed_fonts)
 
         renderer.set_progress_message(_('Printing in progress...'))
         renderer.set_num_pages(len(pages))
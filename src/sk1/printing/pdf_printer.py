@@ -97,6 +97,7 @@ class PDF_Printer(AbstractPrinter):
         renderer.set_compression(self.compressed)
         renderer.set_colorspace(self.colorspace)
         renderer.set_spot_usage(self.use_spot)
+        renderer.set_font_usage(config.pdf_embed_fonts)
 
         renderer.set_progress_message(_('Printing in progress...'))
         renderer.set_num_pages(len(pages))
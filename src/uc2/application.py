@@ -21,7 +21,7 @@ import os
 import sys
 
 import uc2
-from uc2 import cms, uc2const
+from uc2 import batch, cms, server, uc2const
 from uc2 import events, msgconst
 from uc2.app_palettes import PaletteManager
 from uc2.formats import get_loader, get_saver, get_saver_by_id
@@ -52,7 +52,10 @@ Universal vector graphics format translator
 copyright (C) 2007-%s sK1 Project Team (http://www.sk1project.net)
 
 Usage: uniconvertor [OPTIONS] [INPUT FILE] [OUTPUT FILE]
+       uniconvertor --batch [OPTIONS] [INPUT FILES]
+       uniconvertor --server [OPTIONS]
 Example: uniconvertor drawing.cdr drawing.svg
+         uniconvertor --batch --format=svg --output-dir=out "*.cdr"
 
  Available options:
  --help      Display this help and exit
@@ -60,6 +63,22 @@ Example: uniconvertor drawing.cdr drawing.svg
  --log=      Logging level: DEBUG, INFO, WARN, ERROR (by default, INFO)
  --format=   Type of output file format (values provided below)
 
+ Batch mode options:
+ --batch         Convert many files (names or glob patterns) in one run
+ --manifest=     File with input file name or tab separated input and
+                 output file names per line
+ --output-dir=   Directory for output files (by default, input directory)
+ --workers=      Worker processes: 0 - none, -1 - per CPU (by default, -1)
+ --timeout=      Per-file conversion timeout in seconds (0 - no limit)
+ --worker-files= Files converted by worker before restart (0 - no limit)
+ --report=       CSV file for per-file conversion results
+
+ Conversion server options:
+ --server        Serve conversions over HTTP (POST /convert?to=<format>)
+ --port=         Localhost TCP port (by default, %s)
+ --socket=       Unix socket path to listen instead of TCP port
+ --workers=      Worker processes: 0 - none, -1 - per CPU (by default, -1)
+
 ---INPUT FILE FORMATS-------------------------------
 
  Supported input vector graphics file formats:
@@ -119,6 +138,7 @@ class UCApplication(object):
         app_name = '%s %s%s' % (
             self.appdata.app_name, self.appdata.version, self.appdata.revision)
         echo(HELP_TEMPLATE % (app_name, str(datetime.date.today().year),
+                              server.PORT,
                               self._get_infos(uc2const.MODEL_LOADERS),
                               self._get_infos(uc2const.PALETTE_LOADERS),
                               self._get_infos(uc2const.BITMAP_LOADERS),
@@ -144,10 +164,16 @@ class UCApplication(object):
             echo('For details see logs: %s\n' % self.log_filepath)
             sys.exit(1)
 
+    def _get_number(self, options, key, default):
+        try:
+            return float(options.get(key, default))
+        except (TypeError, ValueError):
+            self.show_short_help('Wrong value of --%s option!' % key)
+
     def run(self):
         if '--help' in sys.argv or '-help' in sys.argv or len(sys.argv) == 1:
             self.show_help()
-        elif len(sys.argv) == 2:
+        elif len(sys.argv) == 2 and not sys.argv[1] == '--server':
             self.show_short_help('Not enough arguments!')
 
         files = []
@@ -162,13 +188,6 @@ class UCApplication(object):
             else:
                 files.append(fsutils.get_utf8_path(item))
 
-        if not files:
-            self.show_short_help('File names are not provided!')
-        elif len(files) == 1:
-            self.show_short_help('Destination file name is not provided!')
-        elif not os.path.lexists(files[0]):
-            self.show_short_help('Source file "%s" is not found!' % files[0])
-
         for item in options_list:
             result = item[2:].split('=')
             if not len(result) == 2:
@@ -182,14 +201,39 @@ class UCApplication(object):
                     value = False
                 options[key] = value
 
+        if options.get('server'):
+            pass
+        elif options.get('batch'):
+            if not files and not options.get('manifest'):
+                self.show_short_help('File names are not provided!')
+        elif not files:
+            self.show_short_help('File names are not provided!')
+        elif len(files) == 1:
+            self.show_short_help('Destination file name is not provided!')
+        elif not os.path.lexists(files[0]):
+            self.show_short_help('Source file "%s" is not found!' % files[0])
+
         self.do_verbose = options.get('verbose', False)
         events.connect(events.MESSAGES, self.verbose)
         log_level = options.get('log', self.config.log_level)
         self.log_filepath = os.path.join(self.appdata.app_config_dir, 'uc2.log')
         config_logging(self.log_filepath, log_level)
 
+        cms.libcms.cms_set_bitmap_threads(self.config.cms_bitmap_threads)
+        if self.config.cms_proof_cache:
+            cache_dir = fsutils.get_sys_path(self.appdata.app_proof_cache_dir)
+            cms.linkcache.set_cache_dir(cache_dir)
         self.default_cms = cms.ColorManager()
         self.palettes = PaletteManager(self)
+        if self.config.pdf_export_workers:
+            # PDF format module is not imported if it is not required
+            from uc2.formats.pdf import pdf_filters
+            pdf_filters.set_workers(self.config.pdf_export_workers)
+
+        if options.get('server'):
+            self.run_server(options)
+        elif options.get('batch'):
+            self.run_batch(files, options)
 
         msg = 'Translation of "%s" into "%s"' % (files[0], files[1])
         events.emit(events.MESSAGES, msgconst.JOB, msg)
@@ -261,3 +305,76 @@ class UCApplication(object):
             echo('')
 
         sys.exit(0)
+
+    def run_batch(self, files, options):
+        saver_ids = uc2const.PALETTE_SAVERS + uc2const.MODEL_SAVERS + \
+                    uc2const.BITMAP_SAVERS
+        saver_id = options.get('format', '').lower() or None
+        if saver_id and saver_id not in saver_ids:
+            self.show_short_help('Unknown output format "%s"!' % saver_id)
+        output_dir = options.get('output-dir')
+        if output_dir:
+            output_dir = fsutils.get_utf8_path(output_dir)
+            if not fsutils.lexists(output_dir):
+                fsutils.makedirs(output_dir)
+        try:
+            jobs = batch.get_jobs(files, options.get('manifest'),
+                                  output_dir, saver_id)
+        except Exception as e:
+            self.show_short_help('%s!' % e)
+
+        config = self.config
+        workers = self._get_number(options, 'workers', config.batch_workers)
+        timeout = self._get_number(options, 'timeout', config.batch_timeout)
+        worker_files = self._get_number(options, 'worker-files',
+                                        config.batch_worker_files)
+        converter = batch.BatchConverter(self, saver_id, int(workers),
+                                         timeout, int(worker_files))
+        report = None
+        if options.get('report'):
+            report = batch.ReportWriter(options['report'])
+
+        def show_result(result):
+            src, dst, status, seconds, message = result
+            if report is not None:
+                report.write(result)
+            indent = ' ' * (msgconst.MAX_LEN - len(status))
+            echo('%s%s| %s -> %s (%.2f s)' % (status, indent, src, dst,
+                                              seconds))
+            if message and not status == batch.OK:
+                echo('%s| %s' % (' ' * msgconst.MAX_LEN, message))
+
+        msg = 'Batch translation of %d files' % len(jobs)
+        events.emit(events.MESSAGES, msgconst.JOB, msg)
+        start = datetime.datetime.now()
+        try:
+            results = converter.run(jobs, show_result)
+        finally:
+            if report is not None:
+                report.close()
+
+        failed = len([item for item in results if not item[2] == batch.OK])
+        seconds = (datetime.datetime.now() - start).total_seconds()
+        msg = '%d of %d files are translated in %.1f s' % \
+              (len(results) - failed, len(results), seconds)
+        LOG.info(msg)
+        echo('\n%s\n' % msg)
+        sys.exit(1 if failed else 0)
+
+    def run_server(self, options):
+        address = options.get('socket')
+        if not address:
+            port = self._get_number(options, 'port', server.PORT)
+            address = (server.HOST, int(port))
+        workers = self._get_number(options, 'workers',
+                                   self.config.server_workers)
+        echo('Conversion server is listening on %s' % (address,))
+        try:
+            server.serve(self, address, int(workers))
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            LOG.error('Conversion server is interrupted %s', e)
+            echo('Conversion server is interrupted: %s' % e)
+            sys.exit(1)
+        sys.exit(0)
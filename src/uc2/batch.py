@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Batch conversion of many files in one process.
+
+Files are converted by worker processes forked from initialized
+application, so config, color management and format modules are
+loaded once per run and color transforms are reused by every file
+converted by worker. Each file is converted in isolation: errors are
+reported for failed file only, worker which exceeds per-file timeout
+or dies is killed and replaced by fresh one.
+"""
+
+import csv
+import glob
+import logging
+import multiprocessing
+import os
+import select
+import time
+
+from uc2 import events, msgconst, uc2const
+from uc2.formats import get_loader, get_saver, get_loader_by_id, \
+    get_saver_by_id
+from uc2.utils import fsutils
+from uc2.utils.fs import get_file_extension
+
+LOG = logging.getLogger(__name__)
+
+OK = 'OK'
+ERROR = 'ERROR'
+TIMEOUT = 'TIMEOUT'
+CRASH = 'CRASH'
+
+REPORT_FIELDS = ['input', 'output', 'status', 'seconds', 'message']
+
+POLL_INTERVAL = 0.1
+
+# Application is inherited by forked worker processes
+APP = None
+
+
+def get_jobs(items, manifest=None, output_dir=None, saver_id=None):
+    """
+    Returns list of (input, output) pairs for provided file names
+    and glob patterns and for manifest file. Manifest contains input
+    file name or tab separated input and output file names per line.
+    Output file name which is not provided is made from input file
+    name and saver extension, output_dir replaces input directory.
+    Raises ValueError if several inputs are converted into the same
+    output file.
+    """
+    pairs = []
+    for item in items:
+        if glob.has_magic(item):
+            pairs += [(path, None) for path in sorted(glob.glob(item))]
+        else:
+            pairs.append((item, None))
+    if manifest:
+        with open(manifest, 'rb') as fileptr:
+            for line in fileptr.readlines():
+                line = line.strip('\r\n')
+                if not line.strip() or line.startswith('#'):
+                    continue
+                fields = line.split('\t')
+                output = fields[1].strip() if len(fields) > 1 else ''
+                pairs.append((fields[0].strip(), output or None))
+
+    jobs = []
+    for src, dst in pairs:
+        if dst is None:
+            if not saver_id:
+                msg = 'Output format for "%s" is not provided' % src
+                raise ValueError(msg)
+            name = os.path.splitext(os.path.basename(src))[0]
+            ext = uc2const.FORMAT_EXTENSION[saver_id][0]
+            path = output_dir or os.path.dirname(src)
+            dst = os.path.join(path, '%s.%s' % (name, ext))
+        jobs.append((src, dst))
+    check_outputs(jobs)
+    return jobs
+
+
+def check_outputs(jobs):
+    """
+    Raises ValueError if output file is shared by several jobs,
+    so one converted file does not silently overwrite another.
+    """
+    outputs = {}
+    duplicates = []
+    for src, dst in jobs:
+        key = os.path.normcase(os.path.abspath(dst))
+        if key in outputs:
+            duplicates.append('"%s" and "%s" -> "%s"' % (outputs[key], src,
+                                                         dst))
+        else:
+            outputs[key] = src
+    if duplicates:
+        msg = 'Several files are converted into the same output: %s'
+        raise ValueError(msg % '; '.join(duplicates))
+
+
+def preload_formats(jobs, saver_id=None):
+    """
+    Imports format modules for provided jobs, so forked workers
+    do not import them for every file again.
+    """
+    src_exts = set([get_file_extension(src) for src, dst in jobs])
+    for pid in uc2const.LOADER_FORMATS:
+        if src_exts.intersection(uc2const.FORMAT_EXTENSION[pid]):
+            get_loader_by_id(pid)
+    if saver_id:
+        get_saver_by_id(saver_id)
+    else:
+        for ext in set([get_file_extension(dst) for src, dst in jobs]):
+            get_saver('file.' + ext)
+
+
+def convert(appdata, src, dst, saver_id=None):
+    """
+    Converts single file. Raises exception if file cannot be converted.
+    """
+    if not fsutils.lexists(src):
+        raise ValueError('Source file "%s" is not found' % src)
+    if saver_id:
+        saver = get_saver_by_id(saver_id)
+    else:
+        saver, saver_id = get_saver(dst, return_id=True)
+    if saver is None:
+        raise ValueError('Output file format of "%s" is unsupported' % dst)
+    loader, loader_id = get_loader(src, return_id=True)
+    if loader is None:
+        raise ValueError('Input file format of "%s" is unsupported' % src)
+
+    palettes = loader_id in uc2const.PALETTE_LOADERS and \
+               saver_id in uc2const.PALETTE_SAVERS
+    if palettes:
+        doc = loader(appdata, src, convert=True)
+    else:
+        doc = loader(appdata, src)
+    if doc is None:
+        raise ValueError('Error creating model for "%s"' % src)
+    try:
+        if palettes:
+            saver(doc, dst, translate=False, convert=True)
+        else:
+            saver(doc, dst)
+    finally:
+        doc.close()
+
+
+def convert_job(src, dst, saver_id, messages):
+    """
+    Converts single file and returns (status, seconds, message) result.
+    Error messages emitted while conversion are included into
+    result message.
+    """
+    del messages[:]
+    start = time.time()
+    status = OK
+    try:
+        convert(APP.appdata, src, dst, saver_id)
+    except Exception as e:
+        LOG.error('Cannot convert "%s" %s', src, e)
+        status = ERROR
+        messages.append(str(e) or e.__class__.__name__)
+    return status, time.time() - start, '; '.join(messages)
+
+
+def _run_worker(conn):
+    # messages are collected for current file instead of printing
+    messages = []
+
+    def collect(msg_type, msg):
+        if msg_type == msgconst.ERROR:
+            messages.append(msg)
+
+    events.clean_channel(events.FILTER_INFO)
+    events.clean_channel(events.MESSAGES)
+    events.connect(events.MESSAGES, collect)
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        conn.send(convert_job(job[0], job[1], job[2], messages))
+
+
+class Worker(object):
+    """
+    Worker process with its own pipe, so killed worker cannot
+    break communication with other workers.
+    """
+
+    def __init__(self):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_run_worker,
+                                               args=(child_conn,))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+        self.index = None
+        self.start = 0.0
+        self.done = 0
+
+    def send(self, index, job):
+        self.index = index
+        self.start = time.time()
+        self.conn.send(job)
+
+    def stop(self):
+        if self.index is None and self.process.is_alive():
+            try:
+                self.conn.send(None)
+                self.process.join(1.0)
+            except (IOError, OSError):
+                pass
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+
+class BatchConverter(object):
+    """
+    Converts list of (input, output) jobs.
+
+    workers      number of worker processes: 0 - files are converted
+                 in current process, -1 - one worker per CPU
+    timeout      per-file timeout in seconds (for workers only),
+                 0 - no limit
+    worker_files number of files converted by worker before it is
+                 replaced by fresh one, 0 - no limit
+    """
+
+    def __init__(self, app, saver_id=None, workers=-1, timeout=0,
+                 worker_files=0):
+        self.app = app
+        self.saver_id = saver_id
+        self.workers = workers
+        self.timeout = timeout
+        self.worker_files = worker_files
+
+    def get_workers(self, jobs_num):
+        workers = self.workers
+        if workers < 0:
+            workers = multiprocessing.cpu_count()
+        # application cannot be passed into spawned process
+        if not hasattr(os, 'fork'):
+            workers = 0
+        return min(workers, jobs_num)
+
+    def run(self, jobs, callback=None):
+        """
+        Converts jobs and returns list of (input, output, status,
+        seconds, message) results in jobs order. Callback is called
+        with every result as soon as it is ready.
+        """
+        global APP
+        results = [None] * len(jobs)
+        callback = callback or (lambda result: None)
+        APP = self.app
+        preload_formats(jobs, self.saver_id)
+        try:
+            if self.get_workers(len(jobs)):
+                self.run_parallel(jobs, results, callback)
+            else:
+                self.run_serial(jobs, results, callback)
+        finally:
+            APP = None
+        return results
+
+    def run_serial(self, jobs, results, callback):
+        messages = []
+
+        def collect(msg_type, msg):
+            if msg_type == msgconst.ERROR:
+                messages.append(msg)
+
+        events.connect(events.MESSAGES, collect)
+        try:
+            for index, (src, dst) in enumerate(jobs):
+                result = convert_job(src, dst, self.saver_id, messages)
+                results[index] = (src, dst) + result
+                callback(results[index])
+        finally:
+            events.disconnect(events.MESSAGES, collect)
+
+    def run_parallel(self, jobs, results, callback):
+        pending = range(len(jobs) - 1, -1, -1)
+        workers = [Worker() for _ in range(self.get_workers(len(jobs)))]
+        try:
+            while True:
+                for worker in workers:
+                    if worker.index is None and pending:
+                        index = pending.pop()
+                        worker.send(index, jobs[index] + (self.saver_id,))
+                busy = [item for item in workers if item.index is not None]
+                if not busy:
+                    break
+                ready = select.select([item.conn for item in busy],
+                                      [], [], POLL_INTERVAL)[0]
+                for worker in busy:
+                    result = self.get_result(worker, worker.conn in ready)
+                    if result is None:
+                        continue
+                    index = worker.index
+                    worker.index = None
+                    worker.done += 1
+                    results[index] = jobs[index] + result
+                    callback(results[index])
+                    if result[0] in (TIMEOUT, CRASH):
+                        LOG.error('Cannot convert "%s" %s',
+                                  jobs[index][0], result[2])
+                        worker.process.terminate()
+                    if result[0] in (TIMEOUT, CRASH) or (
+                            self.worker_files and
+                            worker.done >= self.worker_files):
+                        worker.stop()
+                        workers[workers.index(worker)] = Worker()
+        finally:
+            for worker in workers:
+                worker.stop()
+
+    def get_result(self, worker, ready):
+        seconds = time.time() - worker.start
+        if ready:
+            try:
+                return worker.conn.recv()
+            except (EOFError, IOError, OSError):
+                worker.process.join(1.0)
+                msg = 'Worker process is terminated (exit code %s)' % \
+                      worker.process.exitcode
+                return CRASH, seconds, msg
+        if self.timeout and seconds > self.timeout:
+            msg = 'Conversion is not finished in %s s' % self.timeout
+            return TIMEOUT, seconds, msg
+        return None
+
+
+class ReportWriter(object):
+    """
+    Writes conversion results into CSV file as soon as they are ready,
+    so report of interrupted run is not lost.
+    """
+
+    def __init__(self, filepath):
+        self.fileptr = open(filepath, 'wb')
+        self.writer = csv.writer(self.fileptr)
+        self.writer.writerow(REPORT_FIELDS)
+        self.fileptr.flush()
+
+    def write(self, result):
+        src, dst, status, seconds, message = result
+        self.writer.writerow([src, dst, status, '%.3f' % seconds, message])
+        self.fileptr.flush()
+
+    def close(self):
+        self.fileptr.close()
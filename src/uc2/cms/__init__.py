@@ -16,9 +16,11 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import copy
+from collections import OrderedDict
 from copy import deepcopy
 
 import libcms
+import linkcache
 
 from uc2 import uc2const
 from uc2.uc2const import COLOR_RGB, COLOR_CMYK, COLOR_LAB, COLOR_GRAY, \
@@ -456,6 +458,11 @@ class ColorManager(object):
     handles = None
     transforms = None
     proof_transforms = None
+    profile_hashes = None
+    color_cache = None
+    color_cache_size = 4096
+    cache_hits = 0
+    cache_misses = 0
 
     use_cms = True
     use_display_profile = False
@@ -483,6 +490,41 @@ class ColorManager(object):
     def clear_transforms(self):
         self.transforms = {}
         self.proof_transforms = {}
+        self.profile_hashes = {}
+        self.clear_color_cache()
+
+    def clear_color_cache(self):
+        """
+        Drops converted colors. Should be called on any change
+        of profiles, intents or proofing settings.
+        """
+        self.color_cache = OrderedDict()
+
+    def reset_cache_stats(self):
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def get_cache_stats(self):
+        """
+        Returns dict of color cache hits, misses and current size.
+        """
+        return {'hits': self.cache_hits, 'misses': self.cache_misses,
+                'size': len(self.color_cache)}
+
+    def _get_cached_color(self, key):
+        values = self.color_cache.pop(key, None)
+        if values is None:
+            self.cache_misses += 1
+            return None
+        self.cache_hits += 1
+        self.color_cache[key] = values
+        return [] + values
+
+    def _cache_color(self, key, values):
+        cache = self.color_cache
+        cache[key] = values
+        if len(cache) > self.color_cache_size:
+            cache.popitem(last=False)
 
     def get_transform(self, cs_in, cs_out):
         """
@@ -504,25 +546,46 @@ class ColorManager(object):
             self.transforms[tr_type] = tr
         return self.transforms[tr_type]
 
+    def get_profile_hash(self, cs):
+        if cs not in self.profile_hashes:
+            handle = self.handles[cs]
+            self.profile_hashes[cs] = linkcache.get_profile_hash(handle)
+        return self.profile_hashes[cs]
+
     def get_proof_transform(self, cs_in):
         """
         Returns requested proof transform using self.proof_transforms dict.
         If requested transform is not initialized yet, creates it.
+        Proof transform is compiled into device link which is reused
+        by other color managers and sessions.
         """
         tr_type = cs_in
         if tr_type not in self.proof_transforms:
             handle_in = self.handles[cs_in]
+            cs_out = COLOR_RGB
             if self.use_display_profile and COLOR_DISPLAY in self.handles:
-                handle_out = self.handles[COLOR_DISPLAY]
-            else:
-                handle_out = self.handles[COLOR_RGB]
+                cs_out = COLOR_DISPLAY
+            handle_out = self.handles[cs_out]
             handle_proof = self.handles[COLOR_CMYK]
-            tr = libcms.cms_create_proofing_transform(handle_in, cs_in,
-                                                      handle_out, COLOR_RGB,
-                                                      handle_proof,
-                                                      self.cmyk_intent,
-                                                      self.rgb_intent,
-                                                      self.flags)
+
+            def create_transform():
+                return libcms.cms_create_proofing_transform(
+                    handle_in, cs_in, handle_out, COLOR_RGB, handle_proof,
+                    self.cmyk_intent, self.rgb_intent, self.flags)
+
+            if self.flags & uc2const.cmsFLAGS_GAMUTCHECK:
+                # gamut alarm cannot be stored in device link
+                tr = create_transform()
+            else:
+                key = linkcache.get_key(
+                    cs_in, self.get_profile_hash(cs_in),
+                    self.get_profile_hash(cs_out),
+                    self.get_profile_hash(COLOR_CMYK),
+                    self.cmyk_intent, self.rgb_intent, self.flags)
+                flags = self.flags & ~uc2const.cmsFLAGS_SOFTPROOFING
+                tr = linkcache.get_link_transform(key, create_transform,
+                                                  cs_in, COLOR_RGB,
+                                                  self.cmyk_intent, flags)
             self.proof_transforms[tr_type] = tr
         return self.proof_transforms[tr_type]
 
@@ -534,10 +597,47 @@ class ColorManager(object):
         if not self.use_cms:
             return do_simple_transform(color[1], cs_in, cs_out)
         in_color = colorb(color)
+        key = (cs_in, cs_out, self.proofing) + tuple(in_color)
+        ret = self._get_cached_color(key)
+        if ret is not None:
+            return ret
         out_color = colorb()
         transform = self.get_transform(cs_in, cs_out)
         libcms.cms_do_transform(transform, in_color, out_color)
-        return decode_colorb(out_color, cs_out)
+        ret = decode_colorb(out_color, cs_out)
+        self._cache_color(key, ret)
+        return [] + ret
+
+    def do_transform_many(self, colors, cs_in, cs_out):
+        """
+        Converts list of colors between colorspaces.
+        Colors missed in color cache are converted by single lcms call.
+        Returns list of color values lists.
+        """
+        if not self.use_cms:
+            return [do_simple_transform(color[1], cs_in, cs_out)
+                    for color in colors]
+        ret = []
+        missed = {}
+        for color in colors:
+            in_color = colorb(color)
+            key = (cs_in, cs_out, self.proofing) + tuple(in_color)
+            values = self._get_cached_color(key)
+            if values is None:
+                missed[key] = in_color
+            ret.append(key if values is None else values)
+        if missed:
+            keys = missed.keys()
+            transform = self.get_transform(cs_in, cs_out)
+            mode_out = COLOR_RGB if cs_out == COLOR_DISPLAY else cs_out
+            out_colors = libcms.cms_do_transform_many(
+                transform, [missed[key] for key in keys], cs_in, mode_out)
+            for key, out_color in zip(keys, out_colors):
+                missed[key] = decode_colorb(out_color, cs_out)
+                self._cache_color(key, missed[key])
+            ret = [[] + missed[item] if isinstance(item, tuple) else item
+                   for item in ret]
+        return ret
 
     def do_bitmap_transform(self, img, mode, cs_out=None):
         """
@@ -558,10 +658,16 @@ class ColorManager(object):
         Returns list of color values.
         """
         in_color = colorb(color)
+        key = (cs_in, None, True) + tuple(in_color)
+        ret = self._get_cached_color(key)
+        if ret is not None:
+            return ret
         out_color = colorb()
         transform = self.get_proof_transform(cs_in)
         libcms.cms_do_transform(transform, in_color, out_color)
-        return decode_colorb(out_color, COLOR_RGB)
+        ret = decode_colorb(out_color, COLOR_RGB)
+        self._cache_color(key, ret)
+        return [] + ret
 
     def do_proof_bitmap_transform(self, img):
         """
@@ -483,6 +483,35 @@ pycms_TransformPixels (PyObject *self, PyObject *args) {
 	return Py_BuildValue("O",  PyCObject_FromVoidPtr((void *)result, (void *)free));
 }
 
+static PyObject *
+pycms_TransformPixelString (PyObject *self, PyObject *args) {
+
+	char *pixbuf;
+	int size, in_size, out_size, pixels;
+	void *transform;
+	cmsHTRANSFORM hTransform;
+	PyObject *result;
+
+	if (!PyArg_ParseTuple(args, "Os#ii", &transform, &pixbuf, &size,
+			&in_size, &out_size) || in_size <= 0 || out_size <= 0) {
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	cmsErrorAction(LCMS_ERROR_IGNORE);
+
+	hTransform = (cmsHTRANSFORM) PyCObject_AsVoidPtr(transform);
+	pixels = size / in_size;
+	result = PyString_FromStringAndSize(NULL, pixels * out_size);
+	if (result == NULL) {
+		return NULL;
+	}
+
+	cmsDoTransform(hTransform, pixbuf, PyString_AS_STRING(result), pixels);
+
+	return result;
+}
+
 static PyObject *
 pycms_GetVersion (PyObject *self, PyObject *args) {
 	return Py_BuildValue("i",  LCMS_VERSION);
@@ -508,6 +537,7 @@ PyMethodDef pycms_methods[] = {
 	{"getPixelsFromImage", pycms_GetPixelsFromImage, METH_VARARGS},
 	{"setImagePixels", pycms_SetImagePixels, METH_VARARGS},
 	{"transformPixels", pycms_TransformPixels, METH_VARARGS},
+	{"transformPixelString", pycms_TransformPixelString, METH_VARARGS},
 	{NULL, NULL}
 };
 
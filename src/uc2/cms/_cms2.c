@@ -17,9 +17,13 @@
  */
 
 #include <Python.h>
+#include <pythread.h>
 #include <lcms2.h>
 #include "Imaging.h"
 
+/* rows of bitmap are not split between threads below this pixel count */
+#define MIN_THREAD_PIXELS 65536
+
 /* redefine the ImagingObject struct defined in _imagingmodule.c */
 typedef struct {
     PyObject_HEAD
@@ -231,6 +235,102 @@ pycms_BuildProofingTransform (PyObject *self, PyObject *args) {
 	return Py_BuildValue("O", PyCObject_FromVoidPtr((void *)hTransform, (void *)cmsDeleteTransform));
 }
 
+static PyObject *
+pycms_BuildDeviceLinkTransform (PyObject *self, PyObject *args) {
+
+	char *inMode;
+	char *outMode;
+	int renderingIntent;
+	int inFlags;
+	cmsUInt32Number flags;
+	void *deviceLink;
+	cmsHPROFILE hDeviceLink;
+	cmsHTRANSFORM hTransform;
+
+	if (!PyArg_ParseTuple(args, "Ossii", &deviceLink, &inMode, &outMode, &renderingIntent, &inFlags)) {
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	hDeviceLink = (cmsHPROFILE) PyCObject_AsVoidPtr(deviceLink);
+	flags = (cmsUInt32Number) inFlags;
+
+	hTransform = cmsCreateTransform(hDeviceLink, getLCMStype(inMode),
+			NULL, getLCMStype(outMode), renderingIntent, flags);
+
+	if(hTransform==NULL) {
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	return Py_BuildValue("O", PyCObject_FromVoidPtr((void *)hTransform, (void *)cmsDeleteTransform));
+}
+
+/* returns ICC data of profile as a string */
+static PyObject *
+get_profile_data(cmsHPROFILE hProfile) {
+
+	cmsUInt32Number size = 0;
+	PyObject *ret;
+
+	if (!cmsSaveProfileToMem(hProfile, NULL, &size)) {
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	ret = PyString_FromStringAndSize(NULL, size);
+	if (ret == NULL) {
+		return NULL;
+	}
+
+	if (!cmsSaveProfileToMem(hProfile, PyString_AS_STRING(ret), &size)) {
+		Py_DECREF(ret);
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+	return ret;
+}
+
+static PyObject *
+pycms_GetProfileData (PyObject *self, PyObject *args) {
+
+	void *profile;
+
+	if (!PyArg_ParseTuple(args, "O", &profile)) {
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	return get_profile_data((cmsHPROFILE) PyCObject_AsVoidPtr(profile));
+}
+
+static PyObject *
+pycms_TransformToDeviceLink (PyObject *self, PyObject *args) {
+
+	void *transform;
+	cmsHTRANSFORM hTransform;
+	cmsHPROFILE hDeviceLink;
+	PyObject *ret;
+
+	if (!PyArg_ParseTuple(args, "O", &transform)) {
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	hTransform = (cmsHTRANSFORM) PyCObject_AsVoidPtr(transform);
+
+	hDeviceLink = cmsTransform2DeviceLink(hTransform, 4.3, 0);
+
+	if(hDeviceLink==NULL) {
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	ret = get_profile_data(hDeviceLink);
+	cmsCloseProfile(hDeviceLink);
+	return ret;
+}
+
 static PyObject *
 pycms_SetAlarmCodes (PyObject *self, PyObject *args) {
 
@@ -313,30 +413,93 @@ pycms_TransformPixel2 (PyObject *self, PyObject *args) {
 	return result;
 }
 
+/* LCMS2 transform can be shared by threads, each thread
+ * transforms its own range of bitmap rows */
+typedef struct {
+	cmsHTRANSFORM hTransform;
+	Imaging inImg;
+	Imaging outImg;
+	int width;
+	int first;
+	int last;
+	PyThread_type_lock done;
+} TransformJob;
+
+static void
+transform_rows (void *arg) {
+
+	TransformJob *job = (TransformJob*) arg;
+	int i;
+
+	for (i = job->first; i < job->last; i++) {
+		cmsDoTransform(job->hTransform, job->inImg->image[i], job->outImg->image[i], job->width);
+	}
+	if (job->done) {
+		PyThread_release_lock(job->done);
+	}
+}
+
 static PyObject *
 pycms_TransformBitmap (PyObject *self, PyObject *args) {
 
 	ImagingObject* inImage;
 	ImagingObject* outImage;
-	Imaging inImg, outImg;
 	void *transform;
-	cmsHTRANSFORM hTransform;
-	int width, height, i;
+	TransformJob *jobs;
+	int width, height, i, threads = 1;
 
-	if (!PyArg_ParseTuple(args, "OOOii", &transform, &inImage, &outImage, &width, &height)) {
+	if (!PyArg_ParseTuple(args, "OOOii|i", &transform, &inImage, &outImage,
+			&width, &height, &threads)) {
 		Py_INCREF(Py_None);
 		return Py_None;
 	}
 
-	inImg=inImage->image;
-	outImg=outImage->image;
+	if (threads > height) {
+		threads = height;
+	}
+	if (threads > (long) width * height / MIN_THREAD_PIXELS + 1) {
+		threads = (long) width * height / MIN_THREAD_PIXELS + 1;
+	}
+	if (threads < 1) {
+		threads = 1;
+	}
 
-	hTransform = (cmsHTRANSFORM) PyCObject_AsVoidPtr(transform);
+	jobs = (TransformJob*) PyMem_Malloc(threads * sizeof(TransformJob));
+	if (jobs == NULL) {
+		return PyErr_NoMemory();
+	}
 
-	for (i = 0; i < height; i++) {
-		cmsDoTransform(hTransform, inImg->image[i],	outImg->image[i], width);
+	for (i = 0; i < threads; i++) {
+		jobs[i].hTransform = (cmsHTRANSFORM) PyCObject_AsVoidPtr(transform);
+		jobs[i].inImg = inImage->image;
+		jobs[i].outImg = outImage->image;
+		jobs[i].width = width;
+		jobs[i].first = (int) ((long) height * i / threads);
+		jobs[i].last = (int) ((long) height * (i + 1) / threads);
+		jobs[i].done = i ? PyThread_allocate_lock() : NULL;
+		if (jobs[i].done) {
+			PyThread_acquire_lock(jobs[i].done, 1);
+		}
 	}
 
+	Py_BEGIN_ALLOW_THREADS
+	/* rows of failed thread are transformed by current one */
+	for (i = 1; i < threads; i++) {
+		if (!jobs[i].done || PyThread_start_new_thread(transform_rows, &jobs[i]) == -1) {
+			transform_rows(&jobs[i]);
+		}
+	}
+	transform_rows(&jobs[0]);
+	for (i = 1; i < threads; i++) {
+		if (jobs[i].done) {
+			PyThread_acquire_lock(jobs[i].done, 1);
+			PyThread_free_lock(jobs[i].done);
+		}
+	}
+	Py_END_ALLOW_THREADS
+
+	PyMem_Free(jobs);
+
 	Py_INCREF(Py_None);
 	return Py_None;
 }
@@ -493,6 +656,33 @@ pycms_TransformPixels (PyObject *self, PyObject *args) {
 	return Py_BuildValue("O",  PyCObject_FromVoidPtr((void *)result, (void *)free));
 }
 
+static PyObject *
+pycms_TransformPixelString (PyObject *self, PyObject *args) {
+
+	char *pixbuf;
+	int size, in_size, out_size, pixels;
+	void *transform;
+	cmsHTRANSFORM hTransform;
+	PyObject *result;
+
+	if (!PyArg_ParseTuple(args, "Os#ii", &transform, &pixbuf, &size,
+			&in_size, &out_size) || in_size <= 0 || out_size <= 0) {
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	hTransform = (cmsHTRANSFORM) PyCObject_AsVoidPtr(transform);
+	pixels = size / in_size;
+	result = PyString_FromStringAndSize(NULL, pixels * out_size);
+	if (result == NULL) {
+		return NULL;
+	}
+
+	cmsDoTransform(hTransform, pixbuf, PyString_AS_STRING(result), pixels);
+
+	return result;
+}
+
 static PyObject *
 pycms_GetVersion (PyObject *self, PyObject *args) {
 	return Py_BuildValue("i",  LCMS_VERSION);
@@ -508,6 +698,9 @@ PyMethodDef pycms_methods[] = {
 	{"createGrayProfile", pycms_CreateGrayProfile, METH_VARARGS},
 	{"buildTransform", pycms_BuildTransform, METH_VARARGS},
 	{"buildProofingTransform", pycms_BuildProofingTransform, METH_VARARGS},
+	{"buildDeviceLinkTransform", pycms_BuildDeviceLinkTransform, METH_VARARGS},
+	{"getProfileData", pycms_GetProfileData, METH_VARARGS},
+	{"transformToDeviceLink", pycms_TransformToDeviceLink, METH_VARARGS},
 	{"setAlarmCodes", pycms_SetAlarmCodes, METH_VARARGS},
 	{"transformPixel", pycms_TransformPixel, METH_VARARGS},
 	{"transformPixel2", pycms_TransformPixel2, METH_VARARGS},
@@ -518,6 +711,7 @@ PyMethodDef pycms_methods[] = {
 	{"getPixelsFromImage", pycms_GetPixelsFromImage, METH_VARARGS},
 	{"setImagePixels", pycms_SetImagePixels, METH_VARARGS},
 	{"transformPixels", pycms_TransformPixels, METH_VARARGS},
+	{"transformPixelString", pycms_TransformPixelString, METH_VARARGS},
 	{NULL, NULL}
 };
 
@@ -17,6 +17,7 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import multiprocessing
 import os
 from PIL import Image
 
@@ -25,6 +26,10 @@ import _cms
 from uc2 import uc2const
 
 
+# threads used by bitmap transforms
+BITMAP_THREADS = 1
+
+
 class CmsError(Exception):
     pass
 
@@ -393,6 +398,64 @@ def cms_create_proofing_transform(in_profile, in_mode, out_profile, out_mode,
     return result
 
 
+def cms_create_device_link_transform(link_profile, in_mode, out_mode,
+                                     intent=uc2const.INTENT_PERCEPTUAL,
+                                     flags=uc2const.cmsFLAGS_NOTPRECALC):
+    """Returns a handle to lcms transformation wrapped as a Python object.
+    Transformation is made from single device link profile.
+
+    :param link_profile: valid lcms device link profile handle
+    :param in_mode: valid lcms or PIL mode
+    :param out_mode: valid lcms or PIL mode
+    :param intent: integer constant (0-3) of transform rendering intent
+    :param flags: lcms flags
+
+    :return: handle to lcms transformation
+    """
+
+    if intent not in INTENTS:
+        raise CmsError('renderingIntent must be an integer between 0 and 3')
+
+    result = _cms.buildDeviceLinkTransform(link_profile, in_mode, out_mode,
+                                           intent, flags)
+
+    if result is None:
+        msg = 'Cannot create requested device link transform'
+        raise CmsError("%s: %s %s" % (msg, in_mode, out_mode))
+
+    return result
+
+
+def cms_transform_to_device_link(transform):
+    """Compiles transformation into device link profile.
+
+    :param transform: valid lcms transformation handle
+    :return: device link ICC profile as a python string
+    """
+
+    result = _cms.transformToDeviceLink(transform)
+
+    if result is None:
+        raise CmsError('Cannot create device link profile')
+
+    return result
+
+
+def cms_get_profile_data(profile):
+    """Returns ICC data of profile.
+
+    :param profile: valid lcms profile handle
+    :return: ICC profile as a python string
+    """
+
+    result = _cms.getProfileData(profile)
+
+    if result is None:
+        raise CmsError('Cannot save profile')
+
+    return result
+
+
 def cms_do_transform(transform, inbuff, outbuff):
     """Transform color values from inputBuffer to outputBuffer using provided
     lcms transform handle.
@@ -413,6 +476,64 @@ def cms_do_transform(transform, inbuff, outbuff):
         raise CmsError(msg)
 
 
+# bytes per pixel of 8-bit lcms modes (see getLCMStype() in _cms.c),
+# unknown modes are handled by lcms as 8-bit grayscale
+PIXEL_SIZES = {
+    'RGB': 4, 'RGBA': 4, 'RGBX': 4, 'CMYK': 4,
+    'YCC': 3, 'YCCA': 3, 'LAB': 3,
+}
+
+
+def get_pixel_size(mode):
+    return PIXEL_SIZES.get(mode, 1)
+
+
+def cms_do_transform_many(transform, inbuffs,
+                          in_mode=uc2const.TYPE_RGBA_8,
+                          out_mode=uc2const.TYPE_RGBA_8):
+    """Transforms list of color values using single lcms call.
+
+    :param transform: valid lcms transformation handle
+    :param inbuffs: list of 4-member lists. The members should be
+                    between 0 and 255
+    :param in_mode: input mode of transform
+    :param out_mode: output mode of transform
+
+    :return: list of 4-member lists
+    """
+    if not inbuffs:
+        return []
+    in_size = get_pixel_size(in_mode)
+    out_size = get_pixel_size(out_mode)
+    try:
+        data = ''.join([chr(value) for inbuff in inbuffs
+                        for value in inbuff[:in_size]])
+    except (TypeError, ValueError):
+        msg = 'inbuffs must contain Python 4-member lists of bytes'
+        raise CmsError(msg)
+    if not len(data) == in_size * len(inbuffs):
+        raise CmsError('inbuffs must contain Python 4-member lists')
+    ret = _cms.transformPixelString(transform, data, in_size, out_size)
+    if ret is None:
+        raise CmsError('Cannot transform color values')
+    values = [ord(item) for item in ret]
+    padding = [0] * (4 - out_size)
+    return [values[i:i + out_size] + padding
+            for i in range(0, len(values), out_size)]
+
+
+def cms_set_bitmap_threads(threads=0):
+    """Sets number of threads which split bitmap rows while
+    transforming bitmap. Transformation does not hold GIL.
+
+    :param threads: number of threads, 0 - one thread per CPU core
+    """
+    global BITMAP_THREADS
+    if threads <= 0:
+        threads = multiprocessing.cpu_count()
+    BITMAP_THREADS = threads
+
+
 def cms_do_bitmap_transform(transform, image, in_mode, out_mode):
     """Provides PIL images support for color management.
     Currently supports L, RGB, CMYK and LAB modes only.
@@ -438,7 +559,8 @@ def cms_do_bitmap_transform(transform, image, in_mode, out_mode):
     image.load()
     new_image = Image.new(out_mode, (w, h))
 
-    _cms.transformBitmap(transform, image.im, new_image.im, w, h)
+    _cms.transformBitmap(transform, image.im, new_image.im, w, h,
+                         BITMAP_THREADS)
 
     return new_image
 
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Cache of compiled proofing transforms.
+
+Proofing transform is compiled into device link profile (single 3D LUT
+from source to display colorspace). Device links are kept in memory
+and saved into cache directory under hash of profiles data, intents
+and flags, so they are shared by sessions and processes. Transform
+made from device link is fast to create and to apply.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+
+import libcms
+
+LOG = logging.getLogger(__name__)
+
+LINK_EXTENSION = '.icc'
+MEMORY_LINKS = 16
+
+CACHE_DIR = None
+# key -> device link data
+LINKS = {}
+
+
+def set_cache_dir(path):
+    """
+    Sets directory for device link files, None - disk cache is disabled.
+    """
+    global CACHE_DIR
+    CACHE_DIR = path
+
+
+def get_profile_hash(profile):
+    return hashlib.sha1(libcms.cms_get_profile_data(profile)).hexdigest()
+
+
+def get_key(*items):
+    """
+    Returns cache key for profile hashes, colorspaces, intents and flags.
+    """
+    items = (libcms.get_version(),) + items
+    return hashlib.sha1(repr(items)).hexdigest()
+
+
+def _get_path(key):
+    return os.path.join(CACHE_DIR, key + LINK_EXTENSION)
+
+
+def load_link(key):
+    """
+    Returns device link data or None if link is not cached.
+    """
+    if key in LINKS:
+        return LINKS[key]
+    if not CACHE_DIR:
+        return None
+    path = _get_path(key)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'rb') as fileptr:
+            data = fileptr.read()
+    except (IOError, OSError) as e:
+        LOG.warn('Cannot read device link %s %s', path, e)
+        return None
+    _store_link(key, data)
+    return data
+
+
+def save_link(key, data):
+    _store_link(key, data)
+    if not CACHE_DIR:
+        return
+    # link is renamed when complete, so other processes
+    # never read partially written file
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        os.rename(tmp_path, _get_path(key))
+    except (IOError, OSError) as e:
+        LOG.warn('Cannot save device link into %s %s', CACHE_DIR, e)
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def drop_link(key):
+    """
+    Removes broken device link from cache.
+    """
+    LINKS.pop(key, None)
+    if CACHE_DIR and os.path.isfile(_get_path(key)):
+        try:
+            os.remove(_get_path(key))
+        except OSError:
+            pass
+
+
+def _store_link(key, data):
+    if len(LINKS) >= MEMORY_LINKS:
+        LINKS.clear()
+    LINKS[key] = data
+
+
+def get_link_transform(key, create_transform, in_mode, out_mode,
+                       intent, flags):
+    """
+    Returns transform made from cached device link. If link is not
+    cached, it is compiled from transform returned by create_transform
+    callable.
+    """
+    data = load_link(key)
+    if data is not None:
+        try:
+            link = libcms.cms_open_profile_from_string(data)
+            return libcms.cms_create_device_link_transform(
+                link, in_mode, out_mode, intent, flags)
+        except libcms.CmsError as e:
+            LOG.warn('Cached device link is broken %s', e)
+            drop_link(key)
+    transform = create_transform()
+    try:
+        data = libcms.cms_transform_to_device_link(transform)
+        link = libcms.cms_open_profile_from_string(data)
+        link_transform = libcms.cms_create_device_link_transform(
+            link, in_mode, out_mode, intent, flags)
+    except libcms.CmsError as e:
+        LOG.warn('Cannot compile proofing transform %s', e)
+        return transform
+    save_link(key, data)
+    return link_transform
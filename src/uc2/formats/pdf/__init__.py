@@ -31,6 +31,11 @@ def pdf_saver(sk2_doc, filename=None, fileptr=None, translate=True, cnf=None,
     cnf = merge_cnf(cnf, kw)
     sk2_saver = sk2_doc.saver
     sk2_doc.saver = PDF_Saver()
+    if 'workers' in cnf:
+        sk2_doc.saver.workers = int(cnf['workers'])
+    if 'embed_fonts' in cnf:
+        sk2_doc.saver.embed_fonts = cnf['embed_fonts'] not in \
+                                    (False, 'False', '0', 'no')
     sk2_doc.save(filename, fileptr)
     sk2_doc.saver = sk2_saver
 
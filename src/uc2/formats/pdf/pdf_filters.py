@@ -15,18 +15,110 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import multiprocessing
 import os
+from cStringIO import StringIO
 
+from uc2 import events
 from uc2.formats.generic_filters import AbstractSaver
 
 import pdfgen
+import pdfmerge
+
+# Number of worker processes for PDF export:
+# 0 - pages are rendered in current process, -1 - one worker per CPU
+WORKERS = 0
+# Pages are split into WORKERS * CHUNKS_PER_WORKER page ranges,
+# so progress is reported more often and workers are loaded evenly.
+CHUNKS_PER_WORKER = 4
+
+# Text is exported by embedded font subsets (if possible) or as curves
+EMBED_FONTS = True
+
+# Saver is inherited by forked worker processes
+SAVER = None
+
+
+def set_workers(num):
+    """
+    Sets number of worker processes for multi-page PDF export.
+    """
+    global WORKERS
+    WORKERS = num
+
+
+def set_font_embedding(val=True):
+    """
+    Sets text export mode: embedded font subsets or curves.
+    """
+    global EMBED_FONTS
+    EMBED_FONTS = val
+
+
+def get_workers(pages_num, workers=None):
+    workers = WORKERS if workers is None else workers
+    if workers < 0:
+        workers = multiprocessing.cpu_count()
+    # model cannot be passed into spawned process and daemonic
+    # process (batch conversion worker) cannot have children
+    if not hasattr(os, 'fork') or \
+            multiprocessing.current_process().daemon:
+        workers = 0
+    return min(workers, pages_num)
+
+
+def _init_worker():
+    # progress is reported by parent process only
+    del events.FILTER_INFO[1:]
+    del events.MESSAGES[1:]
+
+
+def _render_chunk(indexes):
+    fileptr = StringIO()
+    SAVER.render_pages(fileptr, indexes)
+    return fileptr.getvalue()
 
 
 class PDF_Saver(AbstractSaver):
     name = 'PDF_Saver'
+    workers = None
+    embed_fonts = None
 
     def do_save(self):
-        renderer = pdfgen.PDFGenerator(self.fileptr, self.presenter.cms)
+        pages_num = len(self.presenter.methods.get_pages())
+        workers = get_workers(pages_num, self.workers)
+        if workers > 1:
+            self.save_parallel(pages_num, workers)
+        else:
+            self.render_pages(self.fileptr, range(pages_num))
+
+    def save_parallel(self, pages_num, workers):
+        global SAVER
+        chunks = []
+        size = -(-pages_num // (workers * CHUNKS_PER_WORKER))
+        for index in range(0, pages_num, size):
+            chunks.append(range(index, min(index + size, pages_num)))
+
+        msg = pdfgen.PDFGenerator.prgs_msg
+        events.emit(events.FILTER_INFO, msg, 0.0)
+        SAVER = self
+        pool = multiprocessing.Pool(workers, _init_worker)
+        try:
+            merger = pdfmerge.PDFMerger()
+            done = 0
+            for index, data in enumerate(pool.imap(_render_chunk, chunks)):
+                merger.append(data)
+                done += len(chunks[index])
+                events.emit(events.FILTER_INFO, msg,
+                            float(done) / pages_num)
+            pool.close()
+        finally:
+            pool.terminate()
+            SAVER = None
+        merger.write(self.fileptr)
+
+    def render_pages(self, fileptr, indexes):
+        renderer = pdfgen.PDFGenerator(fileptr, self.presenter.cms)
 
         # ---PDF doc data
         appdata = self.presenter.appdata
@@ -53,15 +145,18 @@ class PDF_Saver(AbstractSaver):
         # ---PDF doc data end
 
         renderer.set_compression(True)
+        embed_fonts = self.embed_fonts
+        renderer.set_font_usage(EMBED_FONTS if embed_fonts is None
+                                else embed_fonts)
 
         methods = self.presenter.methods
         desktop_layers = methods.get_desktop_layers()
         master_layers = methods.get_master_layers()
         pages = methods.get_pages()
 
-        renderer.set_num_pages(len(pages))
+        renderer.set_num_pages(len(indexes))
 
-        for page in pages:
+        for page in [pages[index] for index in indexes]:
             w, h = methods.get_page_size(page)
             renderer.start_page(w, h)
 
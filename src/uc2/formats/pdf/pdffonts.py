@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Font files for PDF text output.
+
+Font files resolved by Pango are loaded by ReportLab once per process.
+ReportLab embeds TrueType fonts as subsets which contain used glyphs
+only. Fonts which cannot be embedded (PostScript outlines, embedding
+restrictions, variable font instances) are rejected, so text in such
+fonts is exported as curves.
+"""
+
+import logging
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+LOG = logging.getLogger(__name__)
+
+# (font file path, face index) -> registered font name or None
+FONTS = {}
+
+
+def get_font(fontfile):
+    """
+    Returns name of registered ReportLab font for (font file path,
+    face index) pair or None if font cannot be embedded.
+    """
+    if fontfile not in FONTS:
+        path, index = fontfile
+        name = None
+        # fontconfig keeps named instance of variable font in high bits
+        if not index >> 16:
+            try:
+                font = TTFont('UC2Font%d' % len(FONTS), path,
+                              subfontIndex=index)
+                pdfmetrics.registerFont(font)
+                name = font.fontName
+            except Exception as e:
+                LOG.info('Font "%s" cannot be embedded: %s', path, e)
+        FONTS[fontfile] = name
+    return FONTS[fontfile]
+
+
+def has_char(name, char):
+    """
+    Checks is character mapped by font cmap.
+    """
+    if len(char) != 1:
+        return False
+    return ord(char) in pdfmetrics.getFont(name).face.charToGlyph
@@ -15,19 +15,28 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import hashlib
 import math
-from PIL import Image
 from base64 import b64decode
-from cStringIO import StringIO
 from copy import deepcopy
+from cStringIO import StringIO
 from reportlab.lib.colors import CMYKColorSep, Color, CMYKColor
 from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase.pdfdoc import PDFInfo, PDFString, PDFDate, PDFDictionary
+from reportlab.pdfbase.pdfdoc import PDFInfo, PDFString, PDFDate, \
+    PDFDictionary, PDFArray, PDFName, PDFStream, PDFAxialShading, \
+    PDFRadialShading, PDFImageXObject
+from reportlab.pdfbase.pdfutils import readJPEGInfo
 from reportlab.pdfgen.canvas import Canvas, FILL_EVEN_ODD, FILL_NON_ZERO
 
+try:
+    from reportlab.pdfgen.canvas import _buildColorFunction
+except ImportError:
+    _buildColorFunction = None
+
+import pdffonts
 from pdfconst import PDF_VERSION_DEFAULT
 from uc2 import _, uc2const, events
-from uc2 import libgeom, sk2const, libimg
+from uc2 import libgeom, sk2const, libimg, libpango
 from uc2.formats.sk2 import sk2_model
 
 
@@ -56,16 +65,38 @@ class UC_PDFInfo(PDFInfo):
         return PD.format(document)
 
 
+# Pixmap colorspaces which JPEG bitmaps are embedded as is for
+JPEG_COLORSPACES = {
+    uc2const.IMAGE_RGB: uc2const.COLOR_RGB,
+    uc2const.IMAGE_CMYK: uc2const.COLOR_CMYK,
+}
+
+
+class JPEGSource(object):
+    """
+    ReportLab image source which provides JPEG stream as is.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def jpeg_fh(self):
+        return StringIO(self.data)
+
+
 class PDFGenerator(object):
     canvas = None
     colorspace = None
     use_spot = True
+    use_fonts = True
     num_pages = 0
     page_count = 0
     prgs_msg = _('Saving in process...')
 
     def __init__(self, fileptr, cms, version=PDF_VERSION_DEFAULT):
         self.cms = cms
+        self.image_forms = {}
+        self.pattern_images = {}
         self.canvas = Canvas(fileptr, pdfVersion=version[0])
         self.info = UC_PDFInfo(self.canvas._doc)
         self.info.pdfxversion = version[1]
@@ -101,6 +132,13 @@ class PDFGenerator(object):
     def set_spot_usage(self, val=True):
         self.use_spot = val
 
+    def set_font_usage(self, val=True):
+        """
+        Sets text output mode: text by embedded fonts (if possible)
+        or text as curves.
+        """
+        self.use_fonts = val
+
     # ---Page processing
 
     def set_num_pages(self, num=1):
@@ -134,12 +172,12 @@ class PDFGenerator(object):
         for obj in objs:
             if obj.is_pixmap():
                 self.draw_pixmap(obj)
+            elif obj.is_text() and self.get_text_font(obj):
+                self.draw_text(obj)
             elif obj.is_primitive():
-                curve_obj = obj.to_curve()
-                if curve_obj.is_primitive():
-                    self.draw_curve(curve_obj)
-                else:
-                    self.render(curve_obj.childs)
+                for paths, trafo in obj.iter_paths():
+                    self.draw_curve(obj, libgeom.apply_trafo_to_paths(paths,
+                                                                      trafo))
             elif obj.is_container():
                 self.draw_container(obj)
             else:
@@ -155,25 +193,107 @@ class PDFGenerator(object):
             position = shift + obj_count / len(objs) * page_size
             events.emit(events.FILTER_INFO, self.prgs_msg, position)
 
-    def draw_curve(self, curve_obj):
-        paths = libgeom.apply_trafo_to_paths(curve_obj.paths, curve_obj.trafo)
+    def draw_curve(self, obj, paths):
+        """
+        Draws transformed paths by object style.
+        """
         pdfpath, closed = self.make_pdfpath(paths)
-        fill_style = curve_obj.style[0]
-        stroke_style = curve_obj.style[1]
+        fill_style = obj.style[0]
+        stroke_style = obj.style[1]
         if stroke_style and stroke_style[7]:
-            self.stroke_pdfpath(pdfpath, stroke_style, curve_obj.stroke_trafo)
+            self.stroke_pdfpath(pdfpath, stroke_style, obj.stroke_trafo)
         if fill_style and fill_style[0] & sk2const.FILL_CLOSED_ONLY and closed:
-            self.fill_pdfpath(curve_obj, pdfpath, fill_style,
-                              curve_obj.fill_trafo)
+            self.fill_pdfpath(obj, paths, pdfpath, fill_style,
+                              obj.fill_trafo)
         elif fill_style and not fill_style[0] & sk2const.FILL_CLOSED_ONLY:
-            self.fill_pdfpath(curve_obj, pdfpath, fill_style,
-                              curve_obj.fill_trafo)
+            self.fill_pdfpath(obj, paths, pdfpath, fill_style,
+                              obj.fill_trafo)
         if stroke_style and not stroke_style[7]:
-            self.stroke_pdfpath(pdfpath, stroke_style, curve_obj.stroke_trafo)
+            self.stroke_pdfpath(pdfpath, stroke_style, obj.stroke_trafo)
+
+    def get_text_font(self, obj):
+        """
+        Returns (embedded font name, font size) for text object
+        or None if text should be exported as curves.
+        """
+        if not self.use_fonts or not obj.cache_cpath:
+            return None
+        fill_style = obj.style[0]
+        if fill_style and not fill_style[1] == sk2const.FILL_SOLID:
+            return None
+        # glyphs of ligatures and complex scripts are char clusters
+        if obj.cache_clusters or \
+                not len(obj.cache_cpath) == len(obj.get_text()):
+            return None
+        fontfile = libpango.get_font_file(obj.style[2])
+        if fontfile is None or not pdffonts.get_font(fontfile[:2]):
+            return None
+        return pdffonts.get_font(fontfile[:2]), fontfile[2]
+
+    def is_marked_glyph(self, obj, index):
+        for item in obj.markup:
+            if item[1][0] <= index < item[1][1]:
+                return True
+        return False
+
+    def draw_text(self, obj):
+        """
+        Draws text glyphs by text operators of embedded font subset
+        keeping per-glyph transformations. Marked up glyphs and glyphs
+        which are missing in font are drawn as curves.
+        """
+        font, size = self.get_text_font(obj)
+        text = obj.get_text()
+        glyphs = []
+        paths = []
+        for index, glyph in enumerate(obj.cache_cpath):
+            if not glyph:
+                continue
+            glyph_paths = libgeom.get_paths_from_glyph(glyph)
+            if not glyph_paths:
+                continue
+            char = text[index]
+            if self.is_marked_glyph(obj, index) or \
+                    not pdffonts.has_char(font, char):
+                self.draw_curve(obj, glyph_paths)
+            else:
+                glyphs.append((index, char))
+                paths += glyph_paths
+        if not glyphs:
+            return
+
+        fill_style = obj.style[0]
+        stroke_style = obj.style[1]
+        pdfpath = None
+        if stroke_style:
+            pdfpath = self.make_pdfpath(paths)[0]
+        if stroke_style and stroke_style[7]:
+            self.stroke_pdfpath(pdfpath, stroke_style, obj.stroke_trafo)
+        if fill_style:
+            self.fill_text(obj, font, size, glyphs)
+        if stroke_style and not stroke_style[7]:
+            self.stroke_pdfpath(pdfpath, stroke_style, obj.stroke_trafo)
+
+    def fill_text(self, obj, font, size, glyphs):
+        text_style = obj.style[2]
+        self.canvas.setFillColor(self.get_pdfcolor(obj.style[0][2]))
+        textobj = self.canvas.beginText()
+        textobj.setFont(font, size)
+        for index, char in glyphs:
+            x, y = obj.cache_layout_data[index][:2]
+            dx, dy = libpango.get_glyph_origin(char, obj.width, text_style)
+            trafo = obj.trafos.get(index, obj.trafo)
+            trafo = libgeom.multiply_trafo(
+                [1.0, 0.0, 0.0, 1.0, x + dx, y + dy], trafo)
+            textobj.setTextTransform(*trafo)
+            textobj.textOut(char)
+        self.canvas.drawText(textobj)
 
     def draw_container(self, obj):
-        container = obj.childs[0].to_curve()
-        paths = libgeom.apply_trafo_to_paths(container.paths, container.trafo)
+        container = obj.childs[0]
+        paths = []
+        for item, trafo in container.iter_paths():
+            paths += libgeom.apply_trafo_to_paths(item, trafo)
         pdfpath, closed = self.make_pdfpath(paths)
         fill_style = container.style[0]
         stroke_style = container.style[1]
@@ -184,10 +304,10 @@ class PDFGenerator(object):
         self.canvas.clipPath(pdfpath, 0, 0)
 
         if fill_style and fill_style[0] & sk2const.FILL_CLOSED_ONLY and closed:
-            self.fill_pdfpath(container, pdfpath, fill_style,
+            self.fill_pdfpath(container, paths, pdfpath, fill_style,
                               container.fill_trafo)
         elif fill_style and not fill_style[0] & sk2const.FILL_CLOSED_ONLY:
-            self.fill_pdfpath(container, pdfpath, fill_style,
+            self.fill_pdfpath(container, paths, pdfpath, fill_style,
                               container.fill_trafo)
 
         self.render(obj.childs[1:])
@@ -299,7 +419,7 @@ class PDFGenerator(object):
         self.canvas.drawPath(pdfpath, 1, 0)
         self.canvas.setStrokeAlpha(1.0)
 
-    def fill_pdfpath(self, obj, pdfpath, fill_style, fill_trafo=None):
+    def fill_pdfpath(self, obj, paths, pdfpath, fill_style, fill_trafo=None):
         self.set_fill_rule(fill_style[0])
 
         if fill_style[1] == sk2const.FILL_SOLID:
@@ -314,19 +434,23 @@ class PDFGenerator(object):
                     transparency = True
                     break
             if transparency:
-                self.fill_tr_gradient(obj, pdfpath, fill_trafo, gradient)
+                self.fill_tr_gradient(paths, pdfpath, fill_trafo, gradient)
             else:
                 self.fill_gradient(pdfpath, fill_trafo, gradient)
 
         elif fill_style[1] == sk2const.FILL_PATTERN:
             pattern = fill_style[2]
-            self.fill_pattern(obj, pdfpath, fill_trafo, pattern)
+            self.fill_pattern(obj, paths, pdfpath, fill_trafo, pattern)
 
     def fill_gradient(self, pdfpath, fill_trafo, gradient):
         self.canvas.saveState()
         self.canvas.clipPath(pdfpath, 0, 0)
         if fill_trafo:
             self.canvas.transform(*fill_trafo)
+        self.shade_gradient(gradient)
+        self.canvas.restoreState()
+
+    def shade_gradient(self, gradient):
         grad_type = gradient[0]
         sp, ep = gradient[1]
         stops = gradient[2]
@@ -344,14 +468,34 @@ class PDFGenerator(object):
             x1, y1 = ep
             self.canvas.linearGradient(x0, y0, x1, y1, colors,
                                        positions, True)
+
+    def fill_tr_gradient(self, paths, pdfpath, fill_trafo, gradient):
+        if not self.can_set_alpha_mask():
+            if gradient[0] == sk2const.GRADIENT_RADIAL:
+                self.fill_radial_tr_gradient(paths, pdfpath, fill_trafo,
+                                             gradient)
+            else:
+                self.fill_linear_tr_gradient(paths, pdfpath, fill_trafo,
+                                             gradient)
+            return
+        self.canvas.saveState()
+        self.canvas.clipPath(pdfpath, 0, 0)
+        if fill_trafo:
+            self.canvas.transform(*fill_trafo)
+        self.set_alpha_mask(paths, fill_trafo, gradient)
+        self.shade_gradient(gradient)
         self.canvas.restoreState()
 
-    def fill_tr_gradient(self, obj, pdfpath, fill_trafo, gradient):
-        grad_type = gradient[0]
-        if grad_type == sk2const.GRADIENT_RADIAL:
-            self.fill_radial_tr_gradient(obj, pdfpath, fill_trafo, gradient)
-        else:
-            self.fill_linear_tr_gradient(obj, pdfpath, fill_trafo, gradient)
+    def can_set_alpha_mask(self):
+        """
+        Checks reportlab internals which are used for soft mask
+        (reportlab public API has no SMask setter).
+        """
+        extgstate = getattr(self.canvas, '_extgstate', None)
+        return _buildColorFunction is not None and \
+            isinstance(getattr(extgstate, '_c', None), dict) and \
+            isinstance(getattr(self.canvas, '_code', None), list) and \
+            hasattr(self.canvas, '_doc')
 
     def get_grcolor_at_point(self, stops, point=0.0):
         if not point: return self.get_pdfcolor(stops[0][1])
@@ -371,7 +515,7 @@ class PDFGenerator(object):
             color = self.cms.mix_colors(stop0[1], stop1[1], coef)
         return self.get_pdfcolor(color)
 
-    def fill_linear_tr_gradient(self, obj, pdfpath, fill_trafo, gradient):
+    def fill_linear_tr_gradient(self, paths, pdfpath, fill_trafo, gradient):
         if not fill_trafo:
             fill_trafo = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
         stops = gradient[2]
@@ -386,7 +530,6 @@ class PDFGenerator(object):
         inv_trafo = libgeom.multiply_trafo(libgeom.invert_trafo(fill_trafo),
                                            libgeom.invert_trafo(trafo))
         cv_trafo = libgeom.multiply_trafo(trafo, fill_trafo)
-        paths = libgeom.apply_trafo_to_paths(obj.paths, obj.trafo)
         paths = libgeom.apply_trafo_to_paths(paths, inv_trafo)
         bbox = libgeom.sum_bbox(libgeom.get_paths_bbox(paths),
                                 [0.0, 0.0, l, 0.0])
@@ -421,7 +564,7 @@ class PDFGenerator(object):
 
         self.canvas.restoreState()
 
-    def fill_radial_tr_gradient(self, obj, pdfpath, fill_trafo, gradient):
+    def fill_radial_tr_gradient(self, paths, pdfpath, fill_trafo, gradient):
         if not fill_trafo:
             fill_trafo = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
         stops = gradient[2]
@@ -432,7 +575,6 @@ class PDFGenerator(object):
         inv_trafo = libgeom.multiply_trafo(libgeom.invert_trafo(fill_trafo),
                                            libgeom.invert_trafo(trafo))
         cv_trafo = libgeom.multiply_trafo(trafo, fill_trafo)
-        paths = libgeom.apply_trafo_to_paths(obj.paths, obj.trafo)
         paths = libgeom.apply_trafo_to_paths(paths, inv_trafo)
         bbox = libgeom.sum_bbox(libgeom.get_paths_bbox(paths),
                                 [0.0, 0.0, l, 0.0])
@@ -473,6 +615,53 @@ class PDFGenerator(object):
 
         self.canvas.restoreState()
 
+    def set_alpha_mask(self, paths, fill_trafo, gradient):
+        """
+        Sets soft mask which is luminosity of grayscale shading
+        built from alpha values of gradient stops.
+        """
+        doc = self.canvas._doc
+        sp, ep = gradient[1]
+        stops = gradient[2]
+        function = _buildColorFunction([[stop[1][2]] for stop in stops],
+                                       [stop[0] for stop in stops])
+        if gradient[0] == sk2const.GRADIENT_RADIAL:
+            radius = libgeom.distance(sp, ep)
+            shading = PDFRadialShading(sp[0], sp[1], 0.0, sp[0], sp[1],
+                                       radius, Function=function,
+                                       ColorSpace='DeviceGray',
+                                       Extend='[true true]')
+        else:
+            shading = PDFAxialShading(sp[0], sp[1], ep[0], ep[1],
+                                      Function=function,
+                                      ColorSpace='DeviceGray',
+                                      Extend='[true true]')
+
+        if fill_trafo:
+            inv_trafo = libgeom.invert_trafo(fill_trafo)
+            paths = libgeom.apply_trafo_to_paths(paths, inv_trafo)
+        bbox = libgeom.get_paths_bbox(paths)
+
+        group = PDFDictionary({'S': PDFName('Transparency'),
+                               'CS': PDFName('DeviceGray')})
+        shadings = PDFDictionary({'Sh0': doc.Reference(shading)})
+        form = PDFStream(PDFDictionary({
+            'Type': PDFName('XObject'),
+            'Subtype': PDFName('Form'),
+            'BBox': PDFArray(bbox),
+            'Group': group,
+            'Resources': PDFDictionary({'Shading': shadings}),
+        }), '/Sh0 sh\n')
+        smask = PDFDictionary({'Type': PDFName('Mask'),
+                               'S': PDFName('Luminosity'),
+                               'G': doc.Reference(form)})
+
+        # ExtGState resources are collected by canvas for current page
+        states = self.canvas._extgstate._c
+        name = 'gRLs%d' % len(states)
+        states[('SMask', smask)] = name
+        self.canvas._code.append('/%s gs' % name)
+
     def draw_image(self, image, alpha_channel=None):
         if not image: return
         if self.colorspace == uc2const.COLOR_CMYK:
@@ -486,20 +675,88 @@ class PDFGenerator(object):
         if alpha_channel: img._dataA = ImageReader(alpha_channel)
         self.canvas.drawImage(img, 0, 0, mask='auto')
 
-    def draw_pixmap_obj(self, obj):
+    def get_image_key(self, obj):
+        key = [self.colorspace, hashlib.md5(obj.bitmap).hexdigest()]
+        if obj.alpha_channel:
+            key.append(hashlib.md5(obj.alpha_channel).hexdigest())
+        if obj.colorspace in uc2const.DUOTONES:
+            key.append(repr(obj.style[3]))
+        return tuple(key)
+
+    def get_image_form(self, obj):
+        """
+        Returns name of form XObject which draws pixmap.
+        Identical bitmaps are embedded once per document.
+        """
+        key = self.get_image_key(obj)
+        if key not in self.image_forms:
+            name = 'Img%d' % len(self.image_forms)
+            w, h = obj.size
+            self.canvas.beginForm(name, 0, 0, w, h)
+            self.draw_pixmap_image(obj)
+            self.canvas.endForm()
+            self.image_forms[key] = name
+        return self.image_forms[key]
+
+    def draw_jpeg(self, obj):
+        """
+        Embeds JPEG bitmap as DCTDecode image without decoding
+        if neither colorspace conversion nor alpha channel is required.
+        Returns False if pixmap should be drawn from decoded image.
+        """
+        cs = JPEG_COLORSPACES.get(obj.colorspace)
+        if cs is None or obj.alpha_channel or \
+                not libimg.get_bitmap_format(obj.bitmap) == 'JPEG':
+            return False
+        if self.colorspace in (uc2const.COLOR_CMYK, uc2const.COLOR_RGB,
+                               uc2const.COLOR_GRAY) and \
+                not self.colorspace == cs:
+            return False
+        try:
+            readJPEGInfo(StringIO(obj.bitmap))
+        except Exception:
+            return False
+
+        name = 'DCT' + hashlib.md5(obj.bitmap).hexdigest()
+        # reportlab has no public API for external image streams,
+        # so unsupported reportlab versions use decoded image path
+        try:
+            doc = self.canvas._doc
+            reg_name = doc.getXObjectName(name)
+            if reg_name not in doc.idToObject:
+                img_obj = PDFImageXObject(name, JPEGSource(obj.bitmap))
+                # CMYK samples are inverted by Adobe applications only
+                if not libimg.is_adobe_jpeg(obj.bitmap):
+                    img_obj._dotrans = 0
+                self.canvas._setXObjects(img_obj)
+                doc.Reference(img_obj, reg_name)
+                doc.addForm(name, img_obj)
+            code = self.canvas._code
+            forms = self.canvas._formsinuse
+        except (AttributeError, TypeError):
+            return False
+        self.canvas.saveState()
+        self.canvas.scale(*obj.size)
+        code.append('/%s Do' % reg_name)
+        self.canvas.restoreState()
+        forms.append(name)
+        return True
+
+    def draw_pixmap_image(self, obj):
         if obj.colorspace in uc2const.DUOTONES:
             fg, bg = libimg.convert_duotone_to_image(self.cms, obj)
             self.draw_image(*bg)
             self.draw_image(*fg)
-        else:
-            raw_image = Image.open(StringIO(obj.bitmap))
-            raw_image.load()
+        elif not self.draw_jpeg(obj):
+            raw_image = libimg.get_decoded_image(obj.bitmap)
             alpha_chnl = None
             if obj.alpha_channel:
-                alpha_chnl = Image.open(StringIO(obj.alpha_channel))
-                alpha_chnl.load()
+                alpha_chnl = libimg.get_decoded_image(obj.alpha_channel)
             self.draw_image(raw_image, alpha_chnl)
 
+    def draw_pixmap_obj(self, obj):
+        self.canvas.doForm(self.get_image_form(obj))
+
     def draw_pixmap(self, obj):
         self.canvas.saveState()
         self.canvas.transform(*obj.trafo)
@@ -508,24 +765,29 @@ class PDFGenerator(object):
         self.draw_pixmap_obj(obj)
         self.canvas.restoreState()
 
-    def fill_pattern(self, obj, pdfpath, fill_trafo, pattern):
+    def get_pattern_image(self, obj, pattern):
+        key = (pattern[1], repr(pattern[2:3]))
+        if key not in self.pattern_images:
+            bmpstr = b64decode(pattern[1])
+            image_obj = sk2_model.Pixmap(obj.config)
+            libimg.set_image_data(self.cms, image_obj, bmpstr)
+            if pattern[0] == sk2const.PATTERN_IMG and \
+                            len(pattern) > 2:
+                image_obj.style[3] = deepcopy(pattern[2])
+            self.pattern_images[key] = image_obj
+        return self.pattern_images[key]
+
+    def fill_pattern(self, obj, paths, pdfpath, fill_trafo, pattern):
         if not fill_trafo:
             fill_trafo = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
         inv_ptrn_trafo = libgeom.invert_trafo(pattern[3])
         inv_trafo = libgeom.multiply_trafo(libgeom.invert_trafo(fill_trafo),
                                            libgeom.invert_trafo(inv_ptrn_trafo))
-        paths = libgeom.apply_trafo_to_paths(obj.paths, obj.trafo)
         paths = libgeom.apply_trafo_to_paths(paths, inv_trafo)
         bbox = libgeom.get_paths_bbox(paths)
         cv_trafo = libgeom.multiply_trafo(pattern[3], fill_trafo)
 
-        bmpstr = b64decode(pattern[1])
-        image_obj = sk2_model.Pixmap(obj.config)
-        libimg.set_image_data(self.cms, image_obj, bmpstr)
-        if pattern[0] == sk2const.PATTERN_IMG and \
-                        len(pattern) > 2:
-            image_obj.style[3] = deepcopy(pattern[2])
-        libimg.update_image(self.cms, image_obj)
+        image_obj = self.get_pattern_image(obj, pattern)
 
         self.canvas.saveState()
         self.canvas.clipPath(pdfpath, 0, 0)
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Merging of PDF documents produced by PDFGenerator.
+
+Parallel export renders page ranges into separate documents which are
+joined here in provided order. Parser covers ReportLab output only
+(classic xref table, uncompressed object headers, direct stream lengths).
+Catalog and document info are taken from first document. Identical
+objects (fonts, images, image forms etc.) are written once.
+
+Every document names its font subsets from the same tag sequence
+(AAAAAA+Face, AAAAAB+Face...), so different subsets of a font in
+merged documents would share BaseFont name. Subset tags are replaced
+by tags made from hash of embedded font file.
+"""
+
+import hashlib
+import re
+
+OBJ_RE = re.compile(r'(\d+) 0 obj\s')
+LENGTH_RE = re.compile(r'/Length (\d+)')
+REF_RE = re.compile(r'\((?:\\.|[^\\()])*\)|<[0-9a-fA-F\s]*>|(\d+) 0 R')
+PARENT_RE = re.compile(r'/Parent \d+ 0 R')
+TYPE_PAGE_RE = re.compile(r'/Type /Page\b(?!s)')
+FONTFILE_RE = re.compile(r'/FontFile[23]? (\d+) 0 R')
+SUBSET_NAME_RE = re.compile(r'/([A-Z]{6}\+[^\s/\[\]<>(){}%]+)')
+STREAM_MARK = '\nstream\n'
+
+
+class PDFMergeError(ValueError):
+    pass
+
+
+class PDFObject(object):
+    header = ''
+    stream = None
+    refs = None
+
+    def __init__(self, header, stream=None):
+        self.header = header
+        self.stream = stream
+        self.refs = [int(mo.group(1)) for mo in REF_RE.finditer(header)
+                     if mo.group(1)]
+
+
+def _get_trailer_ref(data, name):
+    trailer = data[data.rfind('trailer'):]
+    mo = re.search(r'/%s (\d+) 0 R' % name, trailer)
+    if mo is None:
+        raise PDFMergeError('Trailer has no /%s entry' % name)
+    return int(mo.group(1))
+
+
+def _get_ref(obj, name):
+    mo = re.search(r'/%s (\d+) 0 R' % name, obj.header)
+    if mo is None:
+        raise PDFMergeError('Object has no /%s entry' % name)
+    return int(mo.group(1))
+
+
+def parse_document(data):
+    """
+    Parses ReportLab generated PDF document.
+
+    :rtype: tuple
+    :return: (objects dict, root object number, info object number)
+    """
+    startxref = data.rfind('startxref')
+    xref = int(data[startxref + 9:].split()[0])
+    if not data.startswith('xref', xref):
+        raise PDFMergeError('Cross-reference stream is not supported')
+    lines = data[xref:data.find('trailer', xref)].split('\n')[1:]
+    objs = {}
+    num = 0
+    for line in lines:
+        items = line.split()
+        if len(items) == 2:
+            num = int(items[0])
+            continue
+        if len(items) == 3 and items[2] == 'n':
+            offset = int(items[0])
+            mo = OBJ_RE.match(data, offset)
+            if mo is None or int(mo.group(1)) != num:
+                raise PDFMergeError('Wrong offset of object %d' % num)
+            objs[num] = _parse_object(data, mo.end())
+        if len(items) == 3:
+            num += 1
+    root = _get_trailer_ref(data, 'Root')
+    info = _get_trailer_ref(data, 'Info')
+    return objs, root, info
+
+
+def get_subset_names(objs):
+    """
+    Returns dict of font subset names (TAG+Face) which are replaced
+    by names with tags made from hash of embedded font file.
+    """
+    names = {}
+    for obj in objs.values():
+        mo = FONTFILE_RE.search(obj.header)
+        if mo is None or int(mo.group(1)) not in objs:
+            continue
+        for name in SUBSET_NAME_RE.findall(obj.header):
+            digest = hashlib.md5(objs[int(mo.group(1))].stream or '')
+            tag = ''.join([chr(65 + ord(char) % 26)
+                           for char in digest.digest()[:6]])
+            names[name] = tag + name[6:]
+    return names
+
+
+def _parse_object(data, start):
+    end = data.find('endobj', start)
+    stream = data.find(STREAM_MARK, start, end)
+    if stream < 0:
+        return PDFObject(data[start:end].strip())
+    header = data[start:stream].strip()
+    mo = LENGTH_RE.search(header)
+    if mo is None:
+        raise PDFMergeError('Stream length is not found')
+    stream += len(STREAM_MARK)
+    return PDFObject(header, data[stream:stream + int(mo.group(1))])
+
+
+class PDFMerger(object):
+    def __init__(self):
+        self.objs = []
+        self.hashes = {}
+        self.page_nums = []
+        self.pages_num = None
+        self.root = None
+        self.info = None
+        self.version = '%PDF-1.4'
+        self.subset_names = {}
+
+    def _add_object(self, header, stream=None, shared=True):
+        if shared:
+            key = hashlib.md5(header + '\0' + (stream or '')).digest()
+            key = (key, stream is None)
+            if key in self.hashes:
+                return self.hashes[key]
+        self.objs.append((header, stream))
+        num = len(self.objs)
+        if shared:
+            self.hashes[key] = num
+        return num
+
+    def _reserve(self):
+        self.objs.append(None)
+        return len(self.objs)
+
+    def _renumber(self, header, mapping):
+        def replace(mo):
+            if mo.group(1) is None:
+                return mo.group(0)
+            return '%d 0 R' % mapping[int(mo.group(1))]
+
+        return REF_RE.sub(replace, header)
+
+    def _rename_subsets(self, header):
+        def replace(mo):
+            return '/' + self.subset_names.get(mo.group(1), mo.group(1))
+
+        return SUBSET_NAME_RE.sub(replace, header)
+
+    def _copy(self, objs, num, mapping, pending):
+        """
+        Copies object with its dependencies (depth first, so dependent
+        objects are already deduplicated when object is hashed).
+        """
+        if num in mapping:
+            return mapping[num]
+        if num in pending:
+            # reference cycle, object cannot be shared
+            mapping[num] = self._reserve()
+            return mapping[num]
+        obj = objs[num]
+        pending.add(num)
+        for ref in obj.refs:
+            self._copy(objs, ref, mapping, pending)
+        pending.discard(num)
+        header = self._renumber(obj.header, mapping)
+        if self.subset_names:
+            header = self._rename_subsets(header)
+        if num in mapping:
+            self.objs[mapping[num] - 1] = (header, obj.stream)
+        else:
+            mapping[num] = self._add_object(header, obj.stream)
+        return mapping[num]
+
+    def append(self, data):
+        """
+        Appends all pages of provided document.
+        """
+        objs, root, info = parse_document(data)
+        self.subset_names = get_subset_names(objs)
+        pages = _get_ref(objs[root], 'Pages')
+        kids = objs[pages].header
+        kids = kids[kids.find('/Kids'):]
+        kids = [int(item) for item in re.findall(r'(\d+) 0 R',
+                                                 kids[:kids.find(']')])]
+        if self.root is None:
+            self.version = data[:data.find('\n')]
+            self.pages_num = self._reserve()
+        mapping = {pages: self.pages_num}
+        for kid in kids:
+            page = objs[kid]
+            if not TYPE_PAGE_RE.search(page.header):
+                raise PDFMergeError('Nested page trees are not supported')
+            page.header = PARENT_RE.sub('', page.header)
+            page.refs = PDFObject(page.header).refs
+            for ref in page.refs:
+                self._copy(objs, ref, mapping, set())
+            header = self._renumber(page.header, mapping)
+            header = header.replace('<<', '<< /Parent %d 0 R' %
+                                    self.pages_num, 1)
+            self.page_nums.append(self._add_object(header, shared=False))
+        if self.root is None:
+            self.root = self._copy(objs, root, mapping, set())
+            self.info = self._copy(objs, info, mapping, set())
+
+    def write(self, fileptr):
+        if self.root is None:
+            raise PDFMergeError('There are no documents to merge')
+        kids = ' '.join(['%d 0 R' % num for num in self.page_nums])
+        self.objs[self.pages_num - 1] = (
+            '<<\n/Count %d /Kids [ %s ] /Type /Pages\n>>' %
+            (len(self.page_nums), kids), None)
+
+        md5 = hashlib.md5()
+        offsets = []
+        position = [0]
+
+        def write(data):
+            fileptr.write(data)
+            md5.update(data)
+            position[0] += len(data)
+
+        write(self.version + '\n%\x93\x8c\x8b\x9e\n')
+        for num, (header, stream) in enumerate(self.objs, 1):
+            offsets.append(position[0])
+            write('%d 0 obj\n%s\n' % (num, header))
+            if stream is not None:
+                write('stream\n%sendstream\n' % stream)
+            write('endobj\n')
+        startxref = position[0]
+        write('xref\n0 %d\n0000000000 65535 f \n' % (len(self.objs) + 1))
+        write(''.join(['%010d 00000 n \n' % item for item in offsets]))
+        doc_id = md5.hexdigest()
+        fileptr.write('trailer\n<<\n/ID \n[<%s><%s>]\n/Info %d 0 R\n'
+                      '/Root %d 0 R\n/Size %d\n>>\nstartxref\n%d\n%%%%EOF\n'
+                      % (doc_id, doc_id, self.info, self.root,
+                         len(self.objs) + 1, startxref))
+
+
+def merge_documents(documents, fileptr):
+    """
+    Writes pages of all provided PDF documents (as strings)
+    into single PDF document.
+    """
+    merger = PDFMerger()
+    for data in documents:
+        merger.append(data)
+    merger.write(fileptr)
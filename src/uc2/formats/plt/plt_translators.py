@@ -63,11 +63,7 @@ class SK2_to_PLT_Translator(object):
     def recursive_processing(self, objs):
         for obj in objs:
             if obj.is_primitive():
-                curve = obj.to_curve()
-                if not curve.is_primitive():
-                    self.recursive_processing(curve.childs)
-                else:
-                    self.obj_stack.append(curve)
+                self.obj_stack += list(obj.iter_paths())
             else:
                 self.recursive_processing(obj.childs)
 
@@ -77,9 +73,11 @@ class SK2_to_PLT_Translator(object):
 
             if self.plt_doc.config.force_zero:
                 bbox = []
-                bbox += self.obj_stack[0].cache_bbox
-                for obj in self.obj_stack:
-                    bbox = libgeom.sum_bbox(bbox, obj.cache_bbox)
+                for paths, obj_trafo in self.obj_stack:
+                    paths = libgeom.apply_trafo_to_paths(paths, obj_trafo)
+                    obj_bbox = libgeom.get_paths_bbox(paths)
+                    bbox = libgeom.sum_bbox(bbox, obj_bbox) if bbox \
+                        else obj_bbox
 
                 dx = -bbox[0] * m11
                 dy = -bbox[1] * m22
@@ -87,7 +85,7 @@ class SK2_to_PLT_Translator(object):
             trafo = [m11, m21, m12, m22, dx, dy]
 
             obj_num = len(self.obj_stack)
-            for obj in self.obj_stack:
+            for obj_paths, obj_trafo in self.obj_stack:
 
                 self.counter += 1
                 position = float(self.counter) / obj_num
@@ -96,10 +94,10 @@ class SK2_to_PLT_Translator(object):
                     events.emit(events.FILTER_INFO, msg, position)
                     self.position = position
 
-                paths = libgeom.get_flattened_path(obj, trafo,
-                                                   self.plt_doc.config.tolerance)
-                if paths is None:
-                    continue
+                paths = libgeom.flat_paths(obj_paths,
+                                           self.plt_doc.config.tolerance)
+                paths = libgeom.apply_trafo_to_paths(
+                    paths, libgeom.multiply_trafo(obj_trafo, trafo))
 
                 for path in paths:
                     if path and path[1]:
@@ -17,7 +17,7 @@
 
 from uc2 import _
 from uc2.formats.sk2.sk2_presenter import SK2_Presenter
-from uc2.sk2const import SK2DOC_ID, SK2XML_ID, SK2VER
+from uc2.sk2const import SK2DOC_ID, SK2XML_ID, SK2BIN_ID, SK2VER
 from uc2.utils.fsutils import get_fileptr
 from uc2.utils.mixutils import merge_cnf
 
@@ -33,14 +33,26 @@ def sk2_loader(appdata, filename=None, fileptr=None, translate=True, cnf=None,
 def sk2_saver(sk2_doc, filename=None, fileptr=None, translate=True, cnf=None,
               **kw):
     cnf = merge_cnf(cnf, kw)
-    sk2_doc.save(filename, fileptr)
+    binary_format = sk2_doc.config.binary_format
+    if cnf and 'binary_format' in cnf:
+        sk2_doc.config.binary_format = cnf['binary_format']
+    try:
+        sk2_doc.save(filename, fileptr)
+    finally:
+        sk2_doc.config.binary_format = binary_format
 
 
 def check_sk2(path):
     ret = False
     fileptr = get_fileptr(path)
     ln = fileptr.readline()
-    if ln[:len(SK2DOC_ID)] == SK2DOC_ID:
+    if ln[:len(SK2BIN_ID)] == SK2BIN_ID:
+        if int(ln[len(SK2BIN_ID):]) <= int(SK2VER):
+            ret = True
+        else:
+            fileptr.close()
+            raise RuntimeError(_('Newer version of SK2 format is found!'))
+    elif ln[:len(SK2DOC_ID)] == SK2DOC_ID:
         if int(ln[len(SK2DOC_ID):]) <= int(SK2VER):
             ret = True
         else:
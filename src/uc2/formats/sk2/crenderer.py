@@ -16,11 +16,13 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import cairo
+import math
 from base64 import b64decode
 from copy import deepcopy
 
 from uc2 import libimg, libcairo, libgeom, sk2const
 from uc2.formats.sk2 import sk2_model
+from uc2.libimg import pyramid
 
 CAIRO_BLACK = [0.0, 0.0, 0.0]
 CAIRO_GRAY = [0.5, 0.5, 0.5]
@@ -53,6 +55,15 @@ class CairoRenderer:
     stroke_style = []
     for_display = False
 
+    # level-of-detail rendering: objects smaller than lod_pixel_size
+    # (in device pixels) are drawn as dots, curves which have more nodes
+    # than device pixels are simplified with lod_tolerance (in pixels)
+    lod_flag = False
+    lod_build = True
+    lod_pixel_size = 1.0
+    lod_tolerance = 0.5
+    lod_zoom = 1.0
+
     def __init__(self, cms):
         self.cms = cms
 
@@ -111,6 +122,8 @@ class CairoRenderer:
 
     def render(self, ctx, objs=None):
         objs = objs or []
+        if self.lod_flag:
+            self.lod_zoom = self.get_zoom(ctx)
         if self.antialias_flag:
             ctx.set_antialias(cairo.ANTIALIAS_DEFAULT)
         else:
@@ -120,6 +133,79 @@ class CairoRenderer:
             for obj in objs:
                 self.render_object(ctx, obj)
 
+    def get_zoom(self, ctx):
+        xx, yx, xy, yy = libcairo.get_trafo_from_matrix(ctx.get_matrix())[:4]
+        return math.sqrt(abs(xx * yy - xy * yx))
+
+    def get_lod_level(self, obj):
+        """
+        Returns LOD level (power of two scale bucket) for dense curves
+        or None if object should be rendered with full details.
+        """
+        if obj.is_text() or not obj.cache_bbox:
+            return None
+        x0, y0, x1, y1 = obj.cache_bbox
+        if obj.get_nodes_count() < max(x1 - x0, y1 - y0) * self.lod_zoom:
+            return None
+        return int(math.floor(math.log(self.lod_zoom, 2)))
+
+    def get_cpath(self, obj):
+        """
+        Returns object cairo path for rendering, simplified one
+        in LOD mode for dense curves.
+        """
+        if not self.lod_flag:
+            return obj.cache_cpath
+        level = self.get_lod_level(obj)
+        if level is None:
+            return obj.cache_cpath
+        tolerance = self.lod_tolerance / 2.0 ** (level + 1)
+        cpath = obj.get_lod_cpath(level, tolerance, self.lod_build)
+        return obj.cache_cpath if cpath is None else cpath
+
+    def prepare_lod(self, objs, zoom):
+        """
+        Creates simplified paths of objects for provided zoom,
+        so rendering with lod_build flag off uses them.
+        """
+        self.lod_zoom = zoom
+        for obj in objs:
+            if obj.is_primitive():
+                if not obj.is_pixmap():
+                    self.get_cpath(obj)
+            elif obj.childs:
+                self.prepare_lod(obj.childs, zoom)
+
+    def get_lod_color(self, obj):
+        if self.contour_flag:
+            return self.stroke_style[1][2] if self.stroke_style[1] else None
+        fill, stroke = obj.style[:2]
+        if fill and fill[1] == sk2const.FILL_SOLID:
+            return fill[2]
+        if fill and fill[1] == sk2const.FILL_GRADIENT:
+            return fill[2][2][0][1]
+        return stroke[2] if stroke else None
+
+    def render_dot(self, ctx, obj):
+        """
+        Draws object smaller than lod_pixel_size as single pixel dot.
+        Returns False if object is larger.
+        """
+        if not obj.cache_bbox:
+            return False
+        x0, y0, x1, y1 = obj.cache_bbox
+        if max(x1 - x0, y1 - y0) * self.lod_zoom >= self.lod_pixel_size:
+            return False
+        color = self.get_lod_color(obj)
+        if color:
+            size = 1.0 / self.lod_zoom
+            ctx.new_path()
+            ctx.rectangle((x0 + x1 - size) / 2.0, (y0 + y1 - size) / 2.0,
+                          size, size)
+            ctx.set_source_rgba(*self.get_color(color))
+            ctx.fill()
+        return True
+
     def render_object(self, ctx, obj):
         if obj.is_primitive():
             self.render_primitives(ctx, obj)
@@ -184,14 +270,24 @@ class CairoRenderer:
         if self.contour_flag:
             if not obj.cache_gray_cdata:
                 libimg.update_gray_image(self.cms, obj)
-            ctx.set_source_surface(obj.cache_gray_cdata)
-            if zoom * abs(m11) > .98:
-                ctx.get_source().set_filter(cairo.FILTER_NEAREST)
+            surface = obj.cache_gray_cdata
+        else:
+            surface = self.get_image(obj)
+
+        if self.for_display:
+            scale = zoom * math.sqrt(abs(m11 * m22 - m12 * m21))
+            level = pyramid.get_pyramid_surface(obj, surface, scale)
+            if level is not surface:
+                ctx.scale(float(surface.get_width()) / level.get_width(),
+                          float(surface.get_height()) / level.get_height())
+                surface = level
+
+        ctx.set_source_surface(surface)
+        if zoom * abs(m11) > .98:
+            ctx.get_source().set_filter(cairo.FILTER_NEAREST)
+        if self.contour_flag:
             ctx.paint_with_alpha(0.3)
         else:
-            ctx.set_source_surface(self.get_image(obj))
-            if zoom * abs(m11) > .98:
-                ctx.get_source().set_filter(cairo.FILTER_NEAREST)
             ctx.paint()
 
         ctx.set_matrix(canvas_matrix)
@@ -202,6 +298,8 @@ class CairoRenderer:
         if obj.is_pixmap():
             self.render_image(ctx, obj)
             return
+        if self.lod_flag and self.render_dot(ctx, obj):
+            return
         if obj.is_text():
             if self.contour_flag:
                 self.process_stroke(ctx, None, self.stroke_style)
@@ -222,7 +320,7 @@ class CairoRenderer:
         if self.contour_flag:
             ctx.new_path()
             self.process_stroke(ctx, None, self.stroke_style)
-            ctx.append_path(obj.cache_cpath)
+            ctx.append_path(self.get_cpath(obj))
             ctx.stroke()
         else:
             if obj.style[1] and obj.style[1][7]:
@@ -236,7 +334,7 @@ class CairoRenderer:
         if obj.style[0]:
             ctx.new_path()
             self.process_fill(ctx, obj)
-            ctx.append_path(obj.cache_cpath)
+            ctx.append_path(self.get_cpath(obj))
             ctx.fill()
 
     def fill_text_obj(self, ctx, obj):
@@ -252,7 +350,7 @@ class CairoRenderer:
         if obj.style[1]:
             ctx.new_path()
             self.process_stroke(ctx, obj)
-            ctx.append_path(obj.cache_cpath)
+            ctx.append_path(self.get_cpath(obj))
             ctx.stroke()
 
     def stroke_text_obj(self, ctx, obj):
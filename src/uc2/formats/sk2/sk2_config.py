@@ -28,6 +28,11 @@ class SK2_Config(XmlConfigParser):
     preview_size = (300.0, 300.0)
     preview_transparent = False
 
+    # --- DOCUMENT FORMAT
+    # Binary container with lazy page and bitmap loading.
+    # Preview is not embedded into binary files.
+    binary_format = False
+
     # --- DOCUMENT PROPERTIES
     doc_origin = sk2const.DOC_ORIGIN_LL
     doc_units = uc2const.UNIT_MM
@@ -17,28 +17,96 @@
 
 import cairo
 import logging
+import struct
+import zlib
 from base64 import b64encode, b64decode
 from cStringIO import StringIO
+from functools import partial
 
 from uc2 import libgeom, sk2const
 from uc2.formats.generic_filters import AbstractLoader, AbstractSaver
-from uc2.formats.sk2 import sk2_model
+from uc2.formats.sk2 import sk2_model, sk2_parser
 from uc2.formats.sk2.crenderer import CairoRenderer
 
 LOG = logging.getLogger(__name__)
 
 
+class SK2_Container(object):
+    """
+    Provides access to binary SK2 chunks.
+    Index is a dict: {'doc': [offset, size],
+                      'pages': [[offset, size, object count], ...],
+                      'blobs': [[offset, size], ...]}
+    Document chunk contains records of whole model except page content.
+    Page content and bitmaps are decoded on first access.
+    """
+    data = ''
+    index = None
+
+    def __init__(self, data):
+        self.data = data
+        trailer_size = struct.calcsize(sk2const.SK2BIN_TRAILER)
+        if len(data) < trailer_size:
+            raise IOError('Binary SK2 container is truncated')
+        offset, size = struct.unpack(sk2const.SK2BIN_TRAILER,
+                                     data[-trailer_size:])
+        if offset + size > len(data) - trailer_size:
+            raise IOError('Binary SK2 container index is corrupted')
+        self.index = sk2_parser.parse_literal(
+            zlib.decompress(self.data[offset:offset + size]))
+
+    def get_chunk(self, offset, size):
+        return self.data[offset:offset + size]
+
+    def get_records(self, offset, size):
+        return zlib.decompress(self.get_chunk(offset, size)).split('\n')
+
+    def get_doc_records(self):
+        return self.get_records(*self.index['doc'])
+
+    def get_page_count(self, index):
+        return self.index['pages'][index][2]
+
+    def get_blob(self, index):
+        return self.get_chunk(*self.index['blobs'][index])
+
+    def get_blob_loader(self, index):
+        return partial(self.get_blob, index)
+
+    def get_page_loader(self, index):
+        return partial(self.load_page, index)
+
+    def load_page(self, index, page):
+        offset, size = self.index['pages'][index][:2]
+        loader = SK2_Loader()
+        loader.config = page.config
+        loader.container = self
+        loader.model = page
+        loader.parent_stack = [page, ]
+        loader.process_records(self.get_records(offset, size))
+        for child in page.childs:
+            child.parent = page
+            child.config = page.config
+            child.do_update()
+
+
 class SK2_Loader(AbstractLoader):
     name = 'SK2_Loader'
     parent_stack = []
     break_flag = False
     line = None
+    container = None
+    page_index = 0
 
     def do_load(self):
         self.model = None
         self.break_flag = False
         self.parent_stack = []
+        self.container = None
         line = self.fileptr.readline()
+        if line[:len(sk2const.SK2BIN_ID)] == sk2const.SK2BIN_ID:
+            self.load_binary(line)
+            return
         if not line[:len(sk2const.SK2DOC_ID)] == sk2const.SK2DOC_ID:
             while self.fileptr.readline().rstrip('\n') != sk2const.SK2DOC_START:
                 pass
@@ -46,19 +114,52 @@ class SK2_Loader(AbstractLoader):
             if self.break_flag:
                 break
             self.line = self.fileptr.readline()
+            if not self.line:
+                break
             self.line = self.line.rstrip('\n')
 
             self.check_loading()
 
             if self.line:
                 try:
-                    code = compile('self.' + self.line, '<string>', 'exec')
-                    exec code
-                except Exception as e:
-                    msg = 'Parsing error in "%s"', self.line
+                    self.process_record(self.line)
+                except Exception:
+                    msg = 'Parsing error in "%s"' % self.line[:256]
                     self.send_error(msg)
                     raise
 
+    def load_binary(self, header):
+        self.container = SK2_Container(header + self.fileptr.read())
+        self.page_index = 0
+        self.parsing_msg(0.5)
+        self.process_records(self.container.get_doc_records())
+
+    def process_records(self, lines):
+        for line in lines:
+            if line:
+                try:
+                    self.process_record(line)
+                except Exception:
+                    msg = 'Parsing error in "%s"' % line[:256]
+                    self.send_error(msg)
+                    raise
+
+    def process_record(self, line):
+        kind, args = sk2_parser.parse_record(line)
+        if kind == sk2_parser.SET_FIELD:
+            item, val = args
+            if item in ('bitmap', 'alpha_channel'):
+                val = sk2_parser.parse_string(val)
+                if self.container is not None and isinstance(val, int):
+                    val = self.container.get_blob_loader(val)
+            else:
+                val = sk2_parser.parse_literal(val)
+            self.set_field(item, val)
+        elif kind == sk2_parser.OBJ:
+            self.obj(*args)
+        else:
+            self.obj_end()
+
     def obj(self, tag):
         obj_cid = sk2_model.TAGNAME_TO_CID[tag]
         obj = sk2_model.CID_TO_CLASS[obj_cid](self.config)
@@ -71,11 +172,17 @@ class SK2_Loader(AbstractLoader):
 
     def set_field(self, item, val):
         obj = self.parent_stack[-1]
-        if item in ('bitmap', 'alpha_channel'):
+        if item in ('bitmap', 'alpha_channel') and not callable(val):
             val = b64decode(val)
         obj.__dict__[item] = val
 
     def obj_end(self):
+        obj = self.parent_stack[-1]
+        if self.container is not None and obj.cid == sk2_model.PAGE \
+                and obj is not self.model:
+            obj.cache_count = self.container.get_page_count(self.page_index)
+            obj.cache_loader = self.container.get_page_loader(self.page_index)
+            self.page_index += 1
         self.parent_stack = self.parent_stack[:-1]
         if not self.parent_stack:
             self.break_flag = True
@@ -83,12 +190,18 @@ class SK2_Loader(AbstractLoader):
 
 class SK2_Saver(AbstractSaver):
     name = 'SK2_Saver'
+    pages = None
+    blobs = None
+    blob_ids = None
 
     def __init__(self):
         super(SK2_Saver, self).__init__()
 
     def do_save(self):
         self.presenter.update()
+        if self.config.binary_format:
+            self.save_binary()
+            return
         if self.config.preview:
             preview = self.generate_preview()
             w, h = self.config.preview_size
@@ -115,14 +228,68 @@ class SK2_Saver(AbstractSaver):
             if item not in sk2_model.GENERIC_FIELDS and \
                     not item.startswith('cache'):
                 if item in ['bitmap', 'alpha_channel']:
-                    item_str = "'%s'" % b64encode(props[item])
+                    item_str = self.bitmap_to_str(getattr(obj, item))
                 else:
                     item_str = self.field_to_str(props[item])
                 self.writeln("set_field('%s',%s)" % (item, item_str))
-        for child in obj.childs:
-            self.save_obj(child)
+        if self.pages is not None and obj.cid == sk2_model.PAGE:
+            self.pages.append(obj)
+        else:
+            for child in obj.childs:
+                self.save_obj(child)
         self.writeln("obj_end()")
 
+    def bitmap_to_str(self, bitmap):
+        if self.blobs is None or not bitmap:
+            return "'%s'" % b64encode(bitmap)
+        # copied pixmaps share bitmap string, so store it once
+        if id(bitmap) not in self.blob_ids:
+            self.blob_ids[id(bitmap)] = len(self.blobs)
+            self.blobs.append(bitmap)
+        return str(self.blob_ids[id(bitmap)])
+
+    def save_records(self, objs):
+        fileptr = self.fileptr
+        self.fileptr = StringIO()
+        for obj in objs:
+            self.save_obj(obj)
+        data = zlib.compress(self.fileptr.getvalue())
+        self.fileptr = fileptr
+        return data
+
+    def save_binary(self):
+        self.pages = []
+        self.blobs = []
+        self.blob_ids = {}
+        index = {'pages': [], 'blobs': []}
+        header = sk2const.SK2BIN_ID + sk2const.SK2VER + '\n'
+        self.write(header)
+        offset = len(header)
+        try:
+            chunk = self.save_records([self.model, ])
+            pages = self.pages
+            self.pages = None
+            self.write(chunk)
+            index['doc'] = [offset, len(chunk)]
+            offset += len(chunk)
+            for page in pages:
+                chunk = self.save_records(page.childs)
+                self.write(chunk)
+                index['pages'].append([offset, len(chunk), page.count()])
+                offset += len(chunk)
+                self.saving_msg(0.95 * len(index['pages']) / len(pages))
+            for blob in self.blobs:
+                self.write(blob)
+                index['blobs'].append([offset, len(blob)])
+                offset += len(blob)
+        finally:
+            self.pages = None
+            self.blobs = None
+            self.blob_ids = None
+        chunk = zlib.compress(repr(index))
+        self.write(chunk)
+        self.write(struct.pack(sk2const.SK2BIN_TRAILER, offset, len(chunk)))
+
     def generate_preview(self):
         wp, hp = self.config.preview_size
         surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, int(wp), int(hp))
@@ -25,6 +25,10 @@ from sk2_cids import *
 
 GENERIC_FIELDS = ['cid', 'childs', 'parent', 'config']
 
+# Layers with less childs are rendered without spatial index
+INDEX_MIN_SIZE = 64
+DAMAGE_LIMIT = 256
+
 
 class DocumentObject(TextModelObject):
     """
@@ -55,7 +59,7 @@ class DocumentObject(TextModelObject):
         props = self.__dict__
         for item in props.keys():
             if item not in GENERIC_FIELDS and not item.startswith('cache'):
-                obj_copy.__dict__[item] = deepcopy(props[item])
+                obj_copy.__dict__[item] = deepcopy(getattr(self, item))
         for child in self.childs:
             obj_copy.childs.append(child.copy())
         return obj_copy
@@ -218,6 +222,9 @@ class Page(StructuralObject):
 
     layer_counter = 0
 
+    cache_loader = None
+    cache_count = 0
+
     def __init__(self, config, parent=None, name=''):
         self.cid = PAGE
         self.childs = []
@@ -244,6 +251,40 @@ class Page(StructuralObject):
     def resolve(self, name=''):
         return StructuralObject.resolve(self, '%s' % self.name)
 
+    # Page content can be loaded on demand (see binary SK2 loader).
+    # In this case 'cache_loader' is a callable which fills childs list
+    # on first access.
+
+    def _get_childs(self):
+        loader = self.cache_loader
+        if loader is not None:
+            self.cache_loader = None
+            loader(self)
+        return self.__dict__.get('childs')
+
+    def _set_childs(self, childs):
+        self.__dict__['childs'] = childs
+
+    childs = property(_get_childs, _set_childs)
+
+    def is_loaded(self):
+        return self.cache_loader is None
+
+    def count(self):
+        if not self.is_loaded():
+            return self.cache_count
+        return StructuralObject.count(self)
+
+    def do_update(self, presenter=None, action=False):
+        if self.is_loaded():
+            StructuralObject.do_update(self, presenter, action)
+        else:
+            self.update()
+
+    def destroy(self):
+        self.cache_loader = None
+        StructuralObject.destroy(self)
+
 
 class Layer(StructuralObject):
     """
@@ -256,6 +297,8 @@ class Layer(StructuralObject):
     properties = []
     name = ''
 
+    cache_index = None
+
     def __init__(self, config, parent=None, name=''):
         self.cid = LAYER
         self.childs = []
@@ -282,6 +325,39 @@ class Layer(StructuralObject):
     def resolve(self, name=''):
         return StructuralObject.resolve(self, '%s' % self.name)
 
+    # Layer childs are stored in ObjectList which reports modifications
+    # to spatial index (if the index is created).
+
+    def _get_childs(self):
+        return self.__dict__.get('childs')
+
+    def _set_childs(self, childs):
+        if childs is not None and not isinstance(childs, ObjectList):
+            childs = ObjectList(self, childs)
+        self.__dict__['childs'] = childs
+        if self.cache_index is not None:
+            self.cache_index.reset()
+
+    childs = property(_get_childs, _set_childs)
+
+    def get_index(self):
+        if self.cache_index is None:
+            self.cache_index = LayerIndex(self)
+        return self.cache_index
+
+    def query_bbox(self, bbox):
+        """
+        Returns layer childs which can be visible in provided
+        bounding box. Z-order of childs is preserved.
+        """
+        if len(self.childs) < INDEX_MIN_SIZE:
+            return self.childs
+        return self.get_index().query(bbox)
+
+    def destroy(self):
+        self.cache_index = None
+        StructuralObject.destroy(self)
+
     def update(self):
         if isinstance(self.color, str):
             try:
@@ -408,6 +484,239 @@ class Guide(StructuralObject):
     def is_guide(self): return True
 
 
+# ================Spatial Index==================
+class ObjectList(list):
+    """
+    List of layer childs. Reports list modifications to the layer
+    spatial index.
+    """
+    owner = None
+
+    def __init__(self, owner, items=None):
+        list.__init__(self, items or [])
+        self.owner = owner
+
+    def _index(self):
+        return self.owner.cache_index if self.owner is not None else None
+
+    def _added(self, objs):
+        index = self._index()
+        if index is not None:
+            index.add(objs)
+
+    def _removed(self, objs):
+        index = self._index()
+        if index is not None:
+            index.discard(objs)
+
+    def _reset(self):
+        index = self._index()
+        if index is not None:
+            index.reset()
+
+    def append(self, obj):
+        list.append(self, obj)
+        self._added([obj, ])
+
+    def extend(self, objs):
+        objs = list(objs)
+        list.extend(self, objs)
+        self._added(objs)
+
+    def __iadd__(self, objs):
+        self.extend(objs)
+        return self
+
+    def insert(self, index, obj):
+        list.insert(self, index, obj)
+        self._added([obj, ])
+
+    def remove(self, obj):
+        list.remove(self, obj)
+        self._removed([obj, ])
+
+    def pop(self, index=-1):
+        obj = list.pop(self, index)
+        self._removed([obj, ])
+        return obj
+
+    def __setitem__(self, index, obj):
+        if isinstance(index, slice):
+            list.__setitem__(self, index, obj)
+            self._reset()
+        else:
+            old_obj = self[index]
+            list.__setitem__(self, index, obj)
+            self._removed([old_obj, ])
+            self._added([obj, ])
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self._reset()
+
+    def __setslice__(self, i, j, objs):
+        list.__setslice__(self, i, j, objs)
+        self._reset()
+
+    def __delslice__(self, i, j):
+        list.__delslice__(self, i, j)
+        self._reset()
+
+    def __imul__(self, val):
+        list.__imul__(self, val)
+        self._reset()
+        return self
+
+    def sort(self, *args, **kw):
+        list.sort(self, *args, **kw)
+        self._reset()
+
+    def reverse(self):
+        list.reverse(self)
+        self._reset()
+
+
+def get_visual_bbox(obj):
+    """
+    Returns object bounding box enlarged by stroke width.
+    """
+    if not obj.is_selectable():
+        return []
+    if obj.is_container():
+        return get_visual_bbox(obj.childs[0]) if obj.childs else []
+    if obj.is_group():
+        bbox = []
+        for child in obj.childs:
+            child_bbox = get_visual_bbox(child)
+            if child_bbox:
+                bbox = libgeom.sum_bbox(bbox, child_bbox) \
+                    if bbox else child_bbox
+        return bbox
+    bbox = obj.cache_bbox
+    stroke = obj.style[1] if obj.is_primitive() else []
+    if not bbox or not stroke:
+        return bbox
+    width = stroke[1]
+    if stroke[8] and obj.stroke_trafo:
+        points = [[0.0, 0.0], [1.0, 0.0]]
+        points = libgeom.apply_trafo_to_points(points, obj.stroke_trafo)
+        width *= libgeom.distance(*points)
+    if stroke[5] == sk2const.JOIN_MITER:
+        width *= max(1.0, stroke[6])
+    return libgeom.enlarge_bbox(bbox, width, width)
+
+
+class LayerIndex(object):
+    """
+    R-tree of layer childs (by stroke enlarged cache_bbox).
+    The index is updated lazily: list modifications and bbox changes
+    mark objects as dirty and dirty objects are reindexed on next query.
+    Objects without bbox are always reported as visible.
+    Old and new bboxes of changed objects are collected as damaged
+    area which is consumed by canvas renderer (see pop_damage).
+    """
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.tree = libgeom.RTree()
+        self.members = set()
+        self.unbounded = set()
+        self.dirty = set()
+        self.order = None
+        self.valid = False
+        self.damage = []
+        self.full_damage = True
+
+    def reset(self):
+        self.valid = False
+        self.order = None
+        self.dirty = set()
+
+    def rebuild(self):
+        self.members = set(self.layer.childs)
+        self.unbounded = set()
+        self.dirty = set()
+        items = []
+        for obj in self.layer.childs:
+            bbox = get_visual_bbox(obj)
+            if bbox:
+                items.append((obj, bbox))
+            else:
+                self.unbounded.add(obj)
+        self.tree.load(items)
+        self.valid = True
+        self.damage = []
+        self.full_damage = True
+
+    def add_damage(self, bbox):
+        if not bbox or self.full_damage:
+            return
+        if len(self.damage) < DAMAGE_LIMIT:
+            self.damage.append(bbox)
+        else:
+            self.damage = []
+            self.full_damage = True
+
+    def pop_damage(self):
+        """
+        Returns list of bboxes changed since previous call
+        or None if whole layer should be repainted.
+        """
+        self.flush()
+        damage = None if self.full_damage else self.damage
+        self.damage = []
+        self.full_damage = False
+        return damage
+
+    def add(self, objs):
+        if self.valid:
+            self.members.update(objs)
+            self.dirty.update(objs)
+        self.order = None
+
+    def discard(self, objs):
+        if self.valid:
+            for obj in objs:
+                self.add_damage(self.tree.get_bbox(obj))
+                self.members.discard(obj)
+                self.dirty.discard(obj)
+                self.unbounded.discard(obj)
+                self.tree.remove(obj)
+        self.order = None
+
+    def touch(self, obj):
+        if self.valid and obj in self.members:
+            if obj not in self.dirty:
+                self.add_damage(self.tree.get_bbox(obj))
+            self.dirty.add(obj)
+
+    def flush(self):
+        if not self.valid:
+            self.rebuild()
+            return
+        for obj in self.dirty:
+            bbox = get_visual_bbox(obj)
+            if bbox:
+                self.unbounded.discard(obj)
+                self.tree.insert(obj, bbox)
+                self.add_damage(bbox)
+            else:
+                self.tree.remove(obj)
+                self.unbounded.add(obj)
+        self.dirty = set()
+
+    def query(self, bbox):
+        self.flush()
+        childs = self.layer.childs
+        hits = set(self.tree.query(bbox))
+        hits.update(self.unbounded)
+        if 2 * len(hits) > len(childs):
+            return [obj for obj in childs if obj in hits]
+        if self.order is None:
+            self.order = dict([(obj, i) for i, obj in enumerate(childs)])
+        return sorted(hits, key=self.order.get)
+
+
 # ================Selectable Objects==================
 class SelectableObject(DocumentObject):
     """
@@ -418,7 +727,30 @@ class SelectableObject(DocumentObject):
     trafo = []
     style = [[], [], [], []]
 
-    cache_bbox = []
+    def _get_cache_bbox(self):
+        return self.__dict__.get('cache_bbox', [])
+
+    def _set_cache_bbox(self, bbox):
+        self.__dict__['cache_bbox'] = bbox
+        self.bbox_changed()
+
+    cache_bbox = property(_get_cache_bbox, _set_cache_bbox)
+
+    def bbox_changed(self):
+        obj = self
+        parent = self.parent
+        while parent is not None and not parent.is_layer():
+            obj = parent
+            parent = parent.parent
+        if parent is not None and parent.cache_index is not None:
+            parent.cache_index.touch(obj)
+
+    def mark_changed(self):
+        """
+        Reports appearance change (style, bitmap etc.) which is not
+        followed by update() call, so canvas repaints object area.
+        """
+        self.bbox_changed()
 
     def to_curve(self): return None
 
@@ -556,6 +888,8 @@ class PrimitiveObject(SelectableObject):
     cache_pattern_img = None
     cache_ps_pattern_img = None
     cache_gray_pattern_img = None
+    cache_hit_paths = None
+    cache_lod = None
 
     def get_initial_paths(self):
         pass
@@ -579,10 +913,26 @@ class PrimitiveObject(SelectableObject):
         curve.update()
         return curve
 
+    def iter_paths(self):
+        """
+        Iterates object geometry as (paths, trafo) pairs, pair per
+        curve which to_curve() creates. Unlike to_curve() it does not
+        copy object, so paths are shared with object and should
+        not be modified. Object style is applicable to every pair.
+        """
+        if self.is_curve():
+            yield self.paths, self.trafo
+        else:
+            if self.cache_paths is None:
+                self.update()
+            yield self.cache_paths, self.trafo
+
     def update(self):
         self.cache_pattern_img = None
         self.cache_ps_pattern_img = None
         self.cache_gray_pattern_img = None
+        self.cache_hit_paths = None
+        self.cache_lod = None
         self.cache_paths = self.get_initial_paths()
         self.cache_cpath = libgeom.create_cpath(self.cache_paths)
         libgeom.apply_trafo(self.cache_cpath, self.trafo)
@@ -596,7 +946,45 @@ class PrimitiveObject(SelectableObject):
     def update_bbox(self):
         self.cache_bbox = libgeom.get_cpath_bbox(self.cache_cpath)
 
+    def get_hit_paths(self):
+        """
+        Returns flattened object paths prepared for hit-testing
+        (see libgeom.hittest). Result is cached till geometry change.
+        """
+        if self.cache_hit_paths is None:
+            if self.cache_cpath is None:
+                self.update()
+            paths = libgeom.get_flattened_paths(self.cache_cpath)
+            self.cache_hit_paths = libgeom.get_hit_paths(paths)
+        return self.cache_hit_paths
+
+    def get_nodes_count(self):
+        """
+        Returns number of path nodes. Result is cached
+        together with LOD paths.
+        """
+        if self.cache_lod is None:
+            paths = self.cache_paths or []
+            self.cache_lod = {None: sum([len(path[1]) for path in paths])}
+        return self.cache_lod[None]
+
+    def get_lod_cpath(self, level, tolerance, build=True):
+        """
+        Returns cairo path simplified with provided tolerance
+        (in document units) for LOD level. Result is cached per level
+        till geometry change. If build flag is not set, missing path
+        is not created and None is returned.
+        """
+        self.get_nodes_count()
+        cpath = self.cache_lod.get(level)
+        if cpath is None and build:
+            cpath = libgeom.get_simplified_cpath(self.cache_cpath, tolerance)
+            self.cache_lod[level] = cpath
+        return cpath
+
     def apply_trafo(self, trafo):
+        self.cache_hit_paths = None
+        self.cache_lod = None
         self.cache_cpath = libgeom.apply_trafo(self.cache_cpath, trafo)
         self.trafo = libgeom.multiply_trafo(self.trafo, trafo)
         if self.fill_trafo:
@@ -611,6 +999,8 @@ class PrimitiveObject(SelectableObject):
                 libgeom.copy_cpath(self.cache_cpath))
 
     def set_trafo_snapshot(self, snapshot):
+        self.cache_hit_paths = None
+        self.cache_lod = None
         self.trafo, self.fill_trafo, self.stroke_trafo = snapshot[1:4]
         self.cache_bbox, self.cache_cpath = snapshot[4:]
 
@@ -988,6 +1378,14 @@ class Text(PrimitiveObject):
         group.update()
         return group
 
+    def iter_paths(self):
+        if self.cache_cpath is None:
+            self.update()
+        for item in self.cache_cpath:
+            paths = libgeom.get_paths_from_glyph(item) if item else None
+            if paths:
+                yield paths, sk2const.NORMAL_TRAFO
+
     def get_transformed_paths(self):
         ret = []
         for item in self.cache_cpath:
@@ -1066,8 +1464,9 @@ class Pixmap(PrimitiveObject):
     """
     Represents pixmap object. 
     Raster graphics is stored as a TIFF bitmaps for CMYK colorspace and as 
-    a PNG bitmap for others. 'bitmap' field contains raster info, but
-    transparency data is stored as a grayscale image in 'alpha_channel'.
+    a PNG bitmap for others. Imported PNG and JPEG images which pixels are
+    not changed on import are stored as is. 'bitmap' field contains raster
+    info, but transparency data is stored as a grayscale image in 'alpha_channel'.
     Images are stored as a base64 encoded string to resolve EOL and other 
     special character issues. 'colorspace' describes 'bitmap' type. 
     Possible types are: monochrome, grayscale, RGB and CMYK.
@@ -1079,8 +1478,6 @@ class Pixmap(PrimitiveObject):
 
     cid = PIXMAP
 
-    bitmap = ''
-    alpha_channel = ''
     size = (100, 100)
     colorspace = None
 
@@ -1089,6 +1486,7 @@ class Pixmap(PrimitiveObject):
     cache_cdata = None
     cache_ps_cdata = None
     cache_gray_cdata = None
+    cache_pyramid = None
 
     def __init__(self, config, parent=None,
                  bitmap='',
@@ -1105,6 +1503,31 @@ class Pixmap(PrimitiveObject):
         self.trafo = trafo
         self.style = style
 
+    # Bitmap data can be decoded on demand (see binary SK2 loader).
+    # In this case field contains a callable which returns bitmap string.
+
+    def _get_bitmap(self):
+        val = self.__dict__.get('bitmap', '')
+        if callable(val):
+            val = self.__dict__['bitmap'] = val()
+        return val
+
+    def _set_bitmap(self, val):
+        self.__dict__['bitmap'] = val
+
+    bitmap = property(_get_bitmap, _set_bitmap)
+
+    def _get_alpha_channel(self):
+        val = self.__dict__.get('alpha_channel', '')
+        if callable(val):
+            val = self.__dict__['alpha_channel'] = val()
+        return val
+
+    def _set_alpha_channel(self, val):
+        self.__dict__['alpha_channel'] = val
+
+    alpha_channel = property(_get_alpha_channel, _set_alpha_channel)
+
     def is_pixmap(self): return True
 
     def get_size(self):
@@ -1132,12 +1555,14 @@ class Pixmap(PrimitiveObject):
         self.cache_cdata = None
         self.cache_ps_cdata = None
         self.cache_gray_cdata = None
+        self.cache_pyramid = None
         PrimitiveObject.update(self)
 
     def clear_color_cache(self):
         self.cache_cdata = None
         self.cache_ps_cdata = None
         self.cache_gray_cdata = None
+        self.cache_pyramid = None
 
 
 CID_TO_CLASS = {
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+SK2 record parser.
+
+SK2 document body is a sequence of three kinds of records:
+obj('tag'), set_field('name',literal) and obj_end(). Records are
+recognized directly and field literals are decoded by a small tokenizer
+which covers everything SK2_Saver writes (numbers, plain strings,
+None/True/False, lists, tuples and dicts). Less common literals (escaped
+or unicode strings, long integers) are decoded by ast.literal_eval,
+so loader never executes document content.
+"""
+
+import ast
+import re
+
+OBJ = 0
+SET_FIELD = 1
+OBJ_END = 2
+
+RECORD_NAMES = {'obj': OBJ, 'set_field': SET_FIELD, 'obj_end': OBJ_END}
+
+OBJ_PREFIX = "obj('"
+FIELD_PREFIX = "set_field('"
+OBJ_END_RECORD = 'obj_end()'
+
+CACHE_SIZE = 4096
+CACHE_MAX_LITERAL = 512
+
+TOKEN_RE = re.compile(r"""\s*(?:
+    ([\[\](){},:])|
+    '([^'\\\n]*)'|
+    "([^"\\\n]*)"|
+    ([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(?![\w.])|
+    (None|True|False)(?!\w)
+    )""", re.VERBOSE)
+
+KEYWORDS = {'None': None, 'True': True, 'False': False}
+
+LITERAL_CACHE = {}
+
+
+class ParseError(ValueError):
+    pass
+
+
+def _clone(val):
+    if isinstance(val, list):
+        return [_clone(item) for item in val]
+    if isinstance(val, dict):
+        return dict([(key, _clone(item)) for key, item in val.items()])
+    if isinstance(val, tuple):
+        return tuple([_clone(item) for item in val])
+    return val
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+    size = len(text.rstrip())
+    match = TOKEN_RE.match
+    while pos < size:
+        mo = match(text, pos)
+        if mo is None:
+            raise ParseError('Unsupported literal')
+        punct, sq_str, dq_str, number, keyword = mo.groups()
+        if punct is not None:
+            tokens.append((0, punct))
+        elif sq_str is not None:
+            tokens.append((1, sq_str))
+        elif dq_str is not None:
+            tokens.append((1, dq_str))
+        elif number is not None:
+            if '.' in number or 'e' in number or 'E' in number:
+                tokens.append((1, float(number)))
+            else:
+                tokens.append((1, int(number)))
+        else:
+            tokens.append((1, KEYWORDS[keyword]))
+        pos = mo.end()
+    return tokens
+
+
+def _build(tokens, index):
+    kind, val = tokens[index]
+    if kind:
+        return val, index + 1
+    if val == '[' or val == '(':
+        closing = ']' if val == '[' else ')'
+        items = []
+        index += 1
+        trailing_comma = False
+        while tokens[index] != (0, closing):
+            item, index = _build(tokens, index)
+            items.append(item)
+            trailing_comma = False
+            if tokens[index] == (0, ','):
+                index += 1
+                trailing_comma = True
+            elif tokens[index] != (0, closing):
+                raise ParseError('Malformed sequence')
+        if val == '(':
+            if len(items) == 1 and not trailing_comma:
+                return items[0], index + 1
+            return tuple(items), index + 1
+        return items, index + 1
+    if val == '{':
+        ret = {}
+        index += 1
+        while tokens[index] != (0, '}'):
+            key, index = _build(tokens, index)
+            if tokens[index] != (0, ':'):
+                raise ParseError('Malformed dictionary')
+            ret[key], index = _build(tokens, index + 1)
+            if tokens[index] == (0, ','):
+                index += 1
+            elif tokens[index] != (0, '}'):
+                raise ParseError('Malformed dictionary')
+        return ret, index + 1
+    raise ParseError('Unexpected token %s' % val)
+
+
+def _parse_literal(text):
+    try:
+        tokens = _tokenize(text)
+        if not tokens:
+            raise ParseError('Empty literal')
+        val, index = _build(tokens, 0)
+        if index != len(tokens):
+            raise ParseError('Extra data after literal')
+        return val
+    except (ParseError, IndexError, TypeError):
+        return ast.literal_eval(text.strip())
+
+
+def parse_literal(text):
+    """
+    Decodes Python literal string as SK2_Saver.field_to_str() writes it.
+    Returned value is never shared with previous calls.
+    """
+    if len(text) > CACHE_MAX_LITERAL:
+        return _parse_literal(text)
+    if text in LITERAL_CACHE:
+        return _clone(LITERAL_CACHE[text])
+    val = _parse_literal(text)
+    if len(LITERAL_CACHE) >= CACHE_SIZE:
+        LITERAL_CACHE.clear()
+    LITERAL_CACHE[text] = val
+    return _clone(val)
+
+
+def parse_string(text):
+    """
+    Decodes quoted string literal. Simple strings skip the tokenizer
+    which is important for base64 encoded bitmaps.
+    """
+    quote = text[:1]
+    if quote in ('"', "'") and text[-1:] == quote and \
+            '\\' not in text and quote not in text[1:-1]:
+        return text[1:-1]
+    return parse_literal(text)
+
+
+def _parse_call(line):
+    try:
+        node = ast.parse(line.strip(), mode='eval').body
+    except SyntaxError:
+        raise ParseError('Malformed record')
+    if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Name) \
+            or node.func.id not in RECORD_NAMES or node.keywords \
+            or node.starargs or node.kwargs:
+        raise ParseError('Unknown record')
+    args = [ast.literal_eval(item) for item in node.args]
+    return RECORD_NAMES[node.func.id], args
+
+
+def parse_record(line):
+    """
+    Parses single SK2 record line.
+    Returns (record_kind, args) tuple where args are:
+    OBJ - (tag,), SET_FIELD - (name, literal string), OBJ_END - ().
+    Field value is returned undecoded so caller can choose decoder.
+    """
+    if line.startswith(FIELD_PREFIX):
+        index = line.find("',", len(FIELD_PREFIX))
+        if index > 0 and line.endswith(')'):
+            name = line[len(FIELD_PREFIX):index]
+            return SET_FIELD, (name, line[index + 2:-1])
+    elif line == OBJ_END_RECORD:
+        return OBJ_END, ()
+    elif line.startswith(OBJ_PREFIX) and line.endswith("')"):
+        tag = line[len(OBJ_PREFIX):-2]
+        if "'" not in tag:
+            return OBJ, (tag,)
+    kind, args = _parse_call(line)
+    if kind == SET_FIELD:
+        if len(args) != 2:
+            raise ParseError('Malformed set_field record')
+        # value is already decoded, return its canonical repr
+        return kind, (args[0], repr(args[1]))
+    return kind, tuple(args)
@@ -1163,15 +1163,10 @@ class SK2_to_SVG_Translator(object):
             elif source_obj.is_primitive():
                 if source_obj.style[0] and source_obj.style[1] \
                         and source_obj.style[1][7]:
-                    stroke_obj = source_obj.copy()
-                    stroke_obj.update()
-                    stroke_obj.style[0] = []
-                    self.translate_primitive(dest_parent, stroke_obj)
-
-                    fill_obj = source_obj.copy()
-                    fill_obj.update()
-                    fill_obj.style[1] = []
-                    self.translate_primitive(dest_parent, fill_obj)
+                    self.translate_primitive(dest_parent, source_obj,
+                                             fill=False)
+                    self.translate_primitive(dest_parent, source_obj,
+                                             stroke=False)
                 else:
                     self.translate_primitive(dest_parent, source_obj)
         self.ident_level -= 1
@@ -1190,15 +1185,9 @@ class SK2_to_SVG_Translator(object):
             clip_id = self.make_clippath(clip)
 
             if clip.style[1] and clip.style[1][7]:
-                stroke_obj = clip.copy()
-                stroke_obj.update()
-                stroke_obj.style[0] = []
-                self.translate_primitive(dest_parent, stroke_obj)
+                self.translate_primitive(dest_parent, clip, fill=False)
             if clip.style[0]:
-                fill_obj = clip.copy()
-                fill_obj.update()
-                fill_obj.style[1] = []
-                self.translate_primitive(dest_parent, fill_obj)
+                self.translate_primitive(dest_parent, clip, stroke=False)
 
             group = svglib.create_xmlobj('g')
             group.attrs['clip-path'] = 'url(#%s)' % clip_id
@@ -1207,10 +1196,7 @@ class SK2_to_SVG_Translator(object):
             self.append_obj(dest_parent, group)
 
             if clip.style[1] and not clip.style[1][7]:
-                stroke_obj = clip.copy()
-                stroke_obj.update()
-                stroke_obj.style[0] = []
-                self.translate_primitive(dest_parent, stroke_obj)
+                self.translate_primitive(dest_parent, clip, fill=False)
         else:
             group = svglib.create_xmlobj('g')
             self.translate_objs(group, source_obj.childs)
@@ -1231,19 +1217,24 @@ class SK2_to_SVG_Translator(object):
         self.ident_level = lvl
         return clippath.attrs['id']
 
-    def translate_primitive(self, dest_parent, source_obj):
-        curve = source_obj.to_curve()
-        if curve.is_group():
-            self.translate_group(dest_parent, curve)
-            return
-        curve.update()
-        style = self.translate_style(source_obj)
-        trafo = libgeom.multiply_trafo(curve.trafo, self.trafo)
-        paths = libgeom.apply_trafo_to_paths(curve.paths, trafo)
-        pth = svglib.create_xmlobj('path')
-        pth.attrs['style'] = style
-        pth.attrs['d'] = svglib.translate_paths_to_d(paths)
-        self.append_obj(dest_parent, pth)
+    def translate_primitive(self, dest_parent, source_obj, fill=True,
+                            stroke=True):
+        style = self.translate_style(source_obj, fill, stroke)
+        parent = dest_parent
+        if source_obj.is_text():
+            parent = svglib.create_xmlobj('g')
+            self.ident_level += 1
+        for paths, trafo in source_obj.iter_paths():
+            trafo = libgeom.multiply_trafo(trafo, self.trafo)
+            paths = libgeom.apply_trafo_to_paths(paths, trafo)
+            pth = svglib.create_xmlobj('path')
+            pth.attrs['style'] = style
+            pth.attrs['d'] = svglib.translate_paths_to_d(paths)
+            self.append_obj(parent, pth)
+        if source_obj.is_text():
+            self.ident_level -= 1
+            self.add_spacer(parent)
+            self.append_obj(dest_parent, parent)
 
     def translate_pixmap(self, dest_parent, source_obj):
         image_stream = StringIO()
@@ -1264,10 +1255,14 @@ class SK2_to_SVG_Translator(object):
         image.attrs['height'] = str(h)
         self.append_obj(dest_parent, image)
 
-    def translate_style(self, obj):
+    def translate_style(self, obj, fill=True, stroke=True):
         style = {}
-        self.set_fill(style, obj)
-        self.set_stroke(style, obj)
+        if fill:
+            self.set_fill(style, obj)
+        else:
+            style['fill'] = 'none'
+        if stroke:
+            self.set_stroke(style, obj)
         return svglib.translate_style_dict(style)
 
     def set_stroke(self, svg_style, obj):
@@ -836,15 +836,11 @@ class SK2_to_WMF_Translator(object):
         self.translate_objs(obj.childs)
 
     def translate_primitive(self, obj):
-        curve = obj.to_curve()
-        if curve.is_group():
-            self.translate_group(curve)
-            return
-        curve.update()
-        trafo = libgeom.multiply_trafo(curve.trafo, self.trafo)
-        paths = libgeom.apply_trafo_to_paths(curve.paths, trafo)
-        paths = libgeom.flat_paths(paths)
-        self.translate_paths(obj.style, paths)
+        for paths, trafo in obj.iter_paths():
+            trafo = libgeom.multiply_trafo(trafo, self.trafo)
+            paths = libgeom.apply_trafo_to_paths(paths, trafo)
+            paths = libgeom.flat_paths(paths)
+            self.translate_paths(obj.style, paths)
 
     def translate_paths(self, style, paths):
         if style[1] and style[1][7]:
@@ -20,8 +20,13 @@ from bezier_ops import *
 from contour import stroke_to_curve
 from cwrap import *
 from flattering import get_flattened_path, flat_paths, flat_path
+from hittest import get_flattened_paths, get_hit_paths, \
+    is_point_in_hit_paths, is_point_on_hit_paths
 from objs import *
+from packed import PackedPaths
 from points import *
+from rtree import RTree
+from simplify import get_simplified_paths, get_simplified_cpath
 from shaping import intersect_paths, fuse_paths, trim_paths, excluse_paths
 from text_on_path import set_text_on_path
 from trafo import *
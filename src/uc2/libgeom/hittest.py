@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Analytic hit-testing over flattened paths.
+
+Hit paths are prepared once from paths which contain line points only
+(see get_flattened_paths) and stored as [bbox, points, closed] entries,
+where points list starts from path start point. Subpath bounding boxes
+allow skipping most of subpaths for compound curves.
+"""
+
+from uc2 import libcairo
+
+FLAT_TOLERANCE = 0.1
+
+
+def get_flattened_paths(cpath, tolerance=FLAT_TOLERANCE):
+    """
+    Returns paths of cairo path flattened into line segments.
+
+    :type tolerance: float
+    :param tolerance: maximal deviation from curve in path units
+    """
+    if cpath is None:
+        return []
+    flat_cpath = libcairo.get_flattened_cpath(cpath, tolerance)
+    return libcairo.get_path_from_cpath(flat_cpath)
+
+
+def get_hit_paths(paths):
+    """
+    Prepares flattened paths for hit-testing.
+
+    :type paths: list
+    :param paths: flattened paths (line points only)
+
+    :rtype: list
+    :return: list of [bbox, points, closed] entries
+    """
+    ret = []
+    for path in paths:
+        points = [path[0], ] + [point for point in path[1]
+                                if len(point) == 2]
+        xs = [point[0] for point in points]
+        ys = [point[1] for point in points]
+        bbox = [min(xs), min(ys), max(xs), max(ys)]
+        ret.append([bbox, points, bool(path[2])])
+    return ret
+
+
+def _get_winding(x, y, points):
+    winding = 0
+    x0, y0 = points[-1]
+    for x1, y1 in points:
+        if y0 <= y:
+            if y1 > y and (x1 - x0) * (y - y0) - (x - x0) * (y1 - y0) > 0:
+                winding += 1
+        elif y1 <= y and (x1 - x0) * (y - y0) - (x - x0) * (y1 - y0) < 0:
+            winding -= 1
+        x0, y0 = x1, y1
+    return winding
+
+
+def _get_crossings(x, y, points):
+    crossings = 0
+    x0, y0 = points[-1]
+    for x1, y1 in points:
+        if (y0 > y) != (y1 > y) and \
+                x < (x1 - x0) * (y - y0) / (y1 - y0) + x0:
+            crossings += 1
+        x0, y0 = x1, y1
+    return crossings
+
+
+def is_point_in_hit_paths(point, hit_paths, evenodd=True, closed_only=False):
+    """
+    Checks is point inside of filled area. All subpaths are considered
+    as implicitly closed like for fill operation.
+
+    :type evenodd: bool
+    :param evenodd: even-odd fill rule if True, nonzero winding otherwise
+    :type closed_only: bool
+    :param closed_only: if True, open subpaths are not filled
+
+    :rtype: bool
+    """
+    x, y = point
+    count = 0
+    for bbox, points, closed in hit_paths:
+        if closed_only and not closed:
+            continue
+        if bbox[0] <= x <= bbox[2] and bbox[1] <= y <= bbox[3] \
+                and len(points) > 2:
+            if evenodd:
+                count += _get_crossings(x, y, points)
+            else:
+                count += _get_winding(x, y, points)
+    return bool(count % 2) if evenodd else bool(count)
+
+
+def _get_segment_distance2(x, y, x0, y0, x1, y1):
+    dx = x1 - x0
+    dy = y1 - y0
+    length2 = dx * dx + dy * dy
+    if length2:
+        t = ((x - x0) * dx + (y - y0) * dy) / length2
+        if t > 1.0:
+            x0, y0 = x1, y1
+        elif t > 0.0:
+            x0 += t * dx
+            y0 += t * dy
+    return (x - x0) * (x - x0) + (y - y0) * (y - y0)
+
+
+def is_point_on_hit_paths(point, hit_paths, distance):
+    """
+    Checks is point not farther than distance from path lines.
+    Closing segments are considered for closed subpaths only.
+
+    :type distance: float
+    :param distance: maximal distance (i.e. half of stroke width)
+
+    :rtype: bool
+    """
+    x, y = point
+    distance2 = distance * distance
+    for bbox, points, closed in hit_paths:
+        if not bbox[0] - distance <= x <= bbox[2] + distance or \
+                not bbox[1] - distance <= y <= bbox[3] + distance:
+            continue
+        x0, y0 = points[-1] if closed else points[0]
+        for x1, y1 in points:
+            if _get_segment_distance2(x, y, x0, y0, x1, y1) <= distance2:
+                return True
+            x0, y0 = x1, y1
+    return False
+
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Packed paths storage.
+
+Paths are kept in flat arrays instead of nested lists:
+
+ops      - array('b'), opcode of every node (OP_MOVE, OP_LINE, OP_CURVE)
+markers  - array('b'), node marker of every node, NO_MARKER for path
+           start, line nodes and curve nodes without marker
+points   - array('d'), x, y of every node
+controls - array('d'), x1, y1, x2, y2 of every curve node
+closed   - array('b'), end marker of every path
+
+PackedPaths is converted to and from paths lists (see PATHS DEFINITION
+in trafo.py) without losses. Coordinates are processed by array
+slices and map() calls, so operations do not walk nodes in Python
+where it is possible.
+"""
+
+import math
+from array import array
+from itertools import repeat
+from operator import add, mul
+
+from flattering import flat_segment
+
+OP_MOVE = 0
+OP_LINE = 1
+OP_CURVE = 2
+
+NO_MARKER = -1
+
+
+def _combine(xs, ys, kx, ky, d):
+    # kx * x + ky * y + d for every coordinate pair
+    size = len(xs)
+    ret = xs if kx == 1.0 else map(mul, xs, repeat(kx, size))
+    if ky:
+        ret = map(add, ret, map(mul, ys, repeat(ky, size)))
+    if d:
+        ret = map(add, ret, repeat(d, size))
+    return ret if isinstance(ret, array) else array('d', ret)
+
+
+def _reverse_pairs(coords):
+    ret = array('d', coords)
+    ret[0::2] = coords[-2::-2]
+    ret[1::2] = coords[::-2]
+    return ret
+
+
+def _curve_extremes(p0, p1, p2, p3):
+    # coordinates of cubic Bezier segment at derivative roots
+    a = 3.0 * (p3 - p0 + 3.0 * (p1 - p2))
+    b = 6.0 * (p0 - 2.0 * p1 + p2)
+    c = 3.0 * (p1 - p0)
+    if abs(a) < 1e-12:
+        roots = [-c / b] if abs(b) > 1e-12 else []
+    else:
+        disc = b * b - 4.0 * a * c
+        if disc < 0.0:
+            return []
+        disc = math.sqrt(disc)
+        roots = [(-b + disc) / (2.0 * a), (-b - disc) / (2.0 * a)]
+    ret = []
+    for t in roots:
+        if 0.0 < t < 1.0:
+            mt = 1.0 - t
+            ret.append(mt * mt * mt * p0 + 3.0 * mt * mt * t * p1 +
+                       3.0 * mt * t * t * p2 + t * t * t * p3)
+    return ret
+
+
+class PackedPaths(object):
+    __slots__ = ('ops', 'markers', 'points', 'controls', 'closed')
+
+    def __init__(self, paths=None):
+        self.ops = array('b')
+        self.markers = array('b')
+        self.points = array('d')
+        self.controls = array('d')
+        self.closed = array('b')
+        if paths:
+            self.append_paths(paths)
+
+    def append_paths(self, paths):
+        ops = []
+        markers = []
+        points = []
+        controls = []
+        for path in paths:
+            ops.append(OP_MOVE)
+            markers.append(NO_MARKER)
+            points += path[0]
+            for point in path[1]:
+                if len(point) == 2:
+                    ops.append(OP_LINE)
+                    markers.append(NO_MARKER)
+                    points += point
+                else:
+                    ops.append(OP_CURVE)
+                    markers.append(point[3] if len(point) > 3 else NO_MARKER)
+                    controls += point[0] + point[1]
+                    points += point[2]
+            self.closed.append(path[2])
+        self.ops.fromlist(ops)
+        self.markers.fromlist(markers)
+        self.points.fromlist(points)
+        self.controls.fromlist(controls)
+
+    def to_paths(self):
+        paths = []
+        path_points = None
+        points = self.points
+        controls = self.controls
+        markers = self.markers
+        ctrl = 0
+        for index, op in enumerate(self.ops):
+            x, y = points[2 * index], points[2 * index + 1]
+            if op == OP_MOVE:
+                path_points = []
+                paths.append([[x, y], path_points, self.closed[len(paths)]])
+            elif op == OP_LINE:
+                path_points.append([x, y])
+            else:
+                point = [[controls[ctrl], controls[ctrl + 1]],
+                         [controls[ctrl + 2], controls[ctrl + 3]], [x, y]]
+                if markers[index] != NO_MARKER:
+                    point.append(markers[index])
+                path_points.append(point)
+                ctrl += 4
+        return paths
+
+    def copy(self):
+        ret = PackedPaths()
+        ret.ops = self.ops[:]
+        ret.markers = self.markers[:]
+        ret.points = self.points[:]
+        ret.controls = self.controls[:]
+        ret.closed = self.closed[:]
+        return ret
+
+    def get_ranges(self):
+        """
+        Returns list of (first node, end node, first control,
+        end control) array indexes for every path.
+        """
+        ops = self.ops.tostring()
+        move = chr(OP_MOVE)
+        curve = chr(OP_CURVE)
+        ranges = []
+        start = 0
+        ctrl = 0
+        while start < len(ops):
+            end = ops.find(move, start + 1)
+            if end < 0:
+                end = len(ops)
+            ctrl_end = ctrl + 4 * ops.count(curve, start, end)
+            ranges.append((start, end, ctrl, ctrl_end))
+            start = end
+            ctrl = ctrl_end
+        return ranges
+
+    def get_memory_size(self):
+        return sum([len(item) * item.itemsize for item in
+                    (self.ops, self.markers, self.points, self.controls,
+                     self.closed)])
+
+    def apply_trafo(self, trafo):
+        """
+        Returns new transformed PackedPaths.
+        """
+        m11, m21, m12, m22, dx, dy = trafo
+        ret = self.copy()
+        for coords in (ret.points, ret.controls):
+            if coords:
+                xs = coords[0::2]
+                ys = coords[1::2]
+                coords[0::2] = _combine(xs, ys, m11, m12, dx)
+                coords[1::2] = _combine(ys, xs, m22, m21, dy)
+        return ret
+
+    def get_bbox(self):
+        """
+        Returns bounding box of curves (not of control points)
+        or None for empty paths.
+        """
+        if not self.points:
+            return None
+        xs = self.points[0::2]
+        ys = self.points[1::2]
+        bbox = [min(xs), min(ys), max(xs), max(ys)]
+        if not self.controls:
+            return bbox
+        cxs = self.controls[0::2]
+        cys = self.controls[1::2]
+        if min(cxs) >= bbox[0] and min(cys) >= bbox[1] and \
+                max(cxs) <= bbox[2] and max(cys) <= bbox[3]:
+            return bbox
+        # segments with control points outside of nodes bbox only
+        ops = self.ops.tostring()
+        curve = chr(OP_CURVE)
+        points = self.points
+        controls = self.controls
+        index = ops.find(curve)
+        ctrl = 0
+        x0, y0, x1, y1 = bbox
+        while index >= 0:
+            cx1, cy1, cx2, cy2 = controls[ctrl:ctrl + 4]
+            if min(cx1, cx2) < x0 or max(cx1, cx2) > x1:
+                for x in _curve_extremes(points[2 * index - 2], cx1, cx2,
+                                         points[2 * index]):
+                    x0 = min(x0, x)
+                    x1 = max(x1, x)
+            if min(cy1, cy2) < y0 or max(cy1, cy2) > y1:
+                for y in _curve_extremes(points[2 * index - 1], cy1, cy2,
+                                         points[2 * index + 1]):
+                    y0 = min(y0, y)
+                    y1 = max(y1, y)
+            ctrl += 4
+            index = ops.find(curve, index + 1)
+        return [x0, y0, x1, y1]
+
+    def reverse(self):
+        """
+        Returns new PackedPaths with reversed direction of every path
+        like bezier_ops.reverse_paths() does (curve node markers
+        are dropped).
+        """
+        ret = PackedPaths()
+        ret.closed = self.closed[:]
+        ret.markers = array('b', [NO_MARKER]) * len(self.markers)
+        for start, end, ctrl, ctrl_end in self.get_ranges():
+            ret.ops.append(OP_MOVE)
+            ret.ops.extend(self.ops[end - 1:start:-1])
+            ret.points.extend(_reverse_pairs(self.points[2 * start:2 * end]))
+            ret.controls.extend(
+                _reverse_pairs(self.controls[ctrl:ctrl_end]))
+        return ret
+
+    def flat(self, tlr=0.1):
+        """
+        Returns new PackedPaths with curves replaced by lines
+        like flattering.flat_paths() does.
+        """
+        ret = PackedPaths()
+        ret.closed = self.closed[:]
+        points = self.points
+        controls = self.controls
+        for path_index, ranges in enumerate(self.get_ranges()):
+            start, end, ctrl, ctrl_end = ranges
+            first = [points[2 * start], points[2 * start + 1]]
+            if ctrl == ctrl_end:
+                path_points = points[2 * start:2 * end]
+            else:
+                path_points = array('d', first)
+                prev = first
+                for index in xrange(start + 1, end):
+                    point = [points[2 * index], points[2 * index + 1]]
+                    if self.ops[index] == OP_CURVE:
+                        point = [[controls[ctrl], controls[ctrl + 1]],
+                                 [controls[ctrl + 2], controls[ctrl + 3]],
+                                 point, 0]
+                        ctrl += 4
+                        for item in flat_segment(prev, point, tlr)[1:]:
+                            path_points.fromlist(item)
+                    else:
+                        path_points.fromlist(point)
+                    prev = point
+            if self.closed[path_index] and \
+                    path_points[-2:].tolist() != first:
+                path_points.fromlist(first)
+            size = len(path_points) // 2
+            ret.ops.append(OP_MOVE)
+            ret.ops.extend(array('b', [OP_LINE]) * (size - 1))
+            ret.points.extend(path_points)
+        ret.markers = array('b', [NO_MARKER]) * len(ret.ops)
+        return ret
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+
+# ------------- R-tree spatial index -------------
+
+MAX_ENTRIES = 16
+
+
+class _Node(object):
+    __slots__ = ('leaf', 'entries', 'bbox', 'parent')
+
+    def __init__(self, leaf=True, entries=None, parent=None):
+        self.leaf = leaf
+        self.entries = entries or []
+        self.parent = parent
+        self.bbox = None
+        if not leaf:
+            for entry in self.entries:
+                entry[1].parent = self
+        self.update_bbox()
+
+    def update_bbox(self):
+        if not self.entries:
+            self.bbox = None
+            return
+        x0, y0, x1, y1 = self.entries[0][0]
+        for bbox, item in self.entries:
+            if bbox[0] < x0:
+                x0 = bbox[0]
+            if bbox[1] < y0:
+                y0 = bbox[1]
+            if bbox[2] > x1:
+                x1 = bbox[2]
+            if bbox[3] > y1:
+                y1 = bbox[3]
+        self.bbox = [x0, y0, x1, y1]
+
+
+def _area(bbox):
+    return (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+
+
+def _union(bbox1, bbox2):
+    return [min(bbox1[0], bbox2[0]), min(bbox1[1], bbox2[1]),
+            max(bbox1[2], bbox2[2]), max(bbox1[3], bbox2[3])]
+
+
+def _str_pack(entries, max_entries):
+    """Sort-Tile-Recursive packing of entries into groups."""
+    size = len(entries)
+    if size <= max_entries:
+        return [entries, ]
+    groups = int(math.ceil(size / float(max_entries)))
+    slices = int(math.ceil(math.sqrt(groups)))
+    slice_size = slices * max_entries
+    entries = sorted(entries, key=lambda x: x[0][0] + x[0][2])
+    ret = []
+    for i in range(0, size, slice_size):
+        strip = sorted(entries[i:i + slice_size],
+                       key=lambda x: x[0][1] + x[0][3])
+        for j in range(0, len(strip), max_entries):
+            ret.append(strip[j:j + max_entries])
+    return ret
+
+
+class RTree(object):
+    """
+    R-tree over normalized bounding boxes [x0,y0,x1,y1].
+    Stored items must be hashable and unique. Tree can be bulk loaded
+    (Sort-Tile-Recursive) and then updated by insert/remove calls.
+    """
+
+    def __init__(self, items=None, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.root = _Node()
+        self.leafs = {}
+        self.bboxes = {}
+        if items:
+            self.load(items)
+
+    def __len__(self):
+        return len(self.bboxes)
+
+    def __contains__(self, item):
+        return item in self.bboxes
+
+    def clear(self):
+        self.root = _Node()
+        self.leafs = {}
+        self.bboxes = {}
+
+    def load(self, items):
+        """Bulk loads (item, bbox) pairs replacing current tree content.
+
+        :type items: list
+        :param items: list of (item, bbox) pairs
+        """
+        self.clear()
+        entries = []
+        for item, bbox in items:
+            self.bboxes[item] = bbox
+            entries.append((bbox, item))
+        if not entries:
+            return
+        nodes = []
+        for group in _str_pack(entries, self.max_entries):
+            node = _Node(True, list(group))
+            for bbox, item in group:
+                self.leafs[item] = node
+            nodes.append(node)
+        while len(nodes) > 1:
+            entries = [(node.bbox, node) for node in nodes]
+            nodes = [_Node(False, list(group)) for group in
+                     _str_pack(entries, self.max_entries)]
+        self.root = nodes[0]
+
+    def get_bbox(self, item):
+        return self.bboxes.get(item)
+
+    def insert(self, item, bbox):
+        """Inserts item with provided bounding box.
+        If item is already indexed, its bounding box is updated.
+
+        :type bbox: list
+        :param bbox: normalized bounding box
+        """
+        if item in self.bboxes:
+            self.remove(item)
+        self.bboxes[item] = bbox
+        node = self.root
+        while not node.leaf:
+            node = self._choose_subtree(node, bbox)
+        node.entries.append((bbox, item))
+        self.leafs[item] = node
+        self._adjust(node)
+
+    def _choose_subtree(self, node, bbox):
+        best = None
+        best_enl = best_area = None
+        for entry_bbox, child in node.entries:
+            area = _area(entry_bbox)
+            enl = _area(_union(entry_bbox, bbox)) - area
+            if best is None or enl < best_enl or \
+                    (enl == best_enl and area < best_area):
+                best, best_enl, best_area = child, enl, area
+        return best
+
+    def _adjust(self, node):
+        while node is not None:
+            if len(node.entries) > self.max_entries:
+                node = self._split(node)
+            else:
+                node.update_bbox()
+                parent = node.parent
+                if parent is not None:
+                    for i, entry in enumerate(parent.entries):
+                        if entry[1] is node:
+                            parent.entries[i] = (node.bbox, node)
+                            break
+                node = parent
+
+    def _split(self, node):
+        bbox = node.bbox or node.entries[0][0]
+        for entry_bbox, item in node.entries:
+            bbox = _union(bbox, entry_bbox)
+        axis = 0 if bbox[2] - bbox[0] >= bbox[3] - bbox[1] else 1
+        entries = sorted(node.entries,
+                         key=lambda x: x[0][axis] + x[0][axis + 2])
+        half = len(entries) // 2
+        node.entries = entries[:half]
+        sibling = _Node(node.leaf, entries[half:])
+        if node.leaf:
+            for entry_bbox, item in sibling.entries:
+                self.leafs[item] = sibling
+        node.update_bbox()
+        parent = node.parent
+        if parent is None:
+            parent = _Node(False, [(node.bbox, node), (sibling.bbox, sibling)])
+            self.root = parent
+            return None
+        for i, entry in enumerate(parent.entries):
+            if entry[1] is node:
+                parent.entries[i] = (node.bbox, node)
+                break
+        sibling.parent = parent
+        parent.entries.append((sibling.bbox, sibling))
+        return parent
+
+    def remove(self, item):
+        """Removes item from the tree. Unknown items are ignored."""
+        if item not in self.bboxes:
+            return
+        del self.bboxes[item]
+        node = self.leafs.pop(item)
+        for i, entry in enumerate(node.entries):
+            if entry[1] is item:
+                del node.entries[i]
+                break
+        while node.parent is not None and not node.entries:
+            parent = node.parent
+            for i, entry in enumerate(parent.entries):
+                if entry[1] is node:
+                    del parent.entries[i]
+                    break
+            node = parent
+        if node.parent is None and not node.entries:
+            self.root = _Node()
+            return
+        self._adjust(node)
+
+    def query(self, bbox):
+        """Returns items which bounding boxes intersect provided one.
+        Result order is undefined.
+
+        :type bbox: list
+        :param bbox: normalized bounding box
+
+        :rtype: list
+        :return: list of items
+        """
+        ret = []
+        if self.root.bbox is None:
+            return ret
+        x0, y0, x1, y1 = bbox
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for ebbox, child in node.entries:
+                if ebbox[0] <= x1 and ebbox[2] >= x0 and \
+                        ebbox[1] <= y1 and ebbox[3] >= y0:
+                    if node.leaf:
+                        ret.append(child)
+                    else:
+                        stack.append(child)
+        return ret
+
+    def query_point(self, point, tolerance=0.0):
+        """Returns items which bounding boxes contain provided point."""
+        x, y = point
+        return self.query([x - tolerance, y - tolerance,
+                           x + tolerance, y + tolerance])
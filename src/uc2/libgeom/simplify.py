@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Path simplification for level-of-detail rendering.
+
+Paths are flattened into line segments and polylines are reduced
+by Douglas-Peucker algorithm, so result deviates from source path
+not more than tolerance (plus flattening tolerance).
+"""
+
+from uc2 import libcairo
+from hittest import get_flattened_paths
+
+
+def _get_distance2(point, start, end):
+    x, y = point
+    x0, y0 = start
+    dx = end[0] - x0
+    dy = end[1] - y0
+    length2 = dx * dx + dy * dy
+    if not length2:
+        return (x - x0) ** 2 + (y - y0) ** 2
+    t = ((x - x0) * dx + (y - y0) * dy) / length2
+    t = min(1.0, max(0.0, t))
+    return (x - x0 - t * dx) ** 2 + (y - y0 - t * dy) ** 2
+
+
+def reduce_points(points, tolerance):
+    """
+    Returns polyline points which deviate from provided polyline
+    more than tolerance. First and last points are always kept.
+    """
+    if len(points) < 3:
+        return points
+    tolerance2 = tolerance * tolerance
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        index = None
+        max_dist = tolerance2
+        start, end = points[first], points[last]
+        for i in range(first + 1, last):
+            dist = _get_distance2(points[i], start, end)
+            if dist > max_dist:
+                index = i
+                max_dist = dist
+        if index is not None:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, flag in zip(points, keep) if flag]
+
+
+def get_simplified_paths(cpath, tolerance):
+    """
+    Returns paths of cairo path flattened and reduced with provided
+    tolerance (in path units). Subpaths which are smaller than
+    tolerance are replaced by single segment.
+    """
+    ret = []
+    for path in get_flattened_paths(cpath, tolerance / 2.0):
+        points = [path[0], ] + [point for point in path[1]
+                                if len(point) == 2]
+        if path[2] and len(points) > 2 and points[0] != points[-1]:
+            points.append(points[0])
+        points = reduce_points(points, tolerance / 2.0)
+        ret.append([points[0], points[1:], path[2]])
+    return ret
+
+
+def get_simplified_cpath(cpath, tolerance):
+    """
+    Returns simplified cairo path (see get_simplified_paths).
+    """
+    return libcairo.create_cpath(get_simplified_paths(cpath, tolerance))
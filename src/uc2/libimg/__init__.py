@@ -16,11 +16,13 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import sys
 import cairo
+from collections import OrderedDict
 from copy import deepcopy
 from base64 import b64encode
 from cStringIO import StringIO
-from PIL import Image, ImageOps
+from PIL import Image, ImageChops, ImageOps
 
 from uc2.cms import val_255
 from uc2.libimg import magickwand
@@ -42,6 +44,66 @@ def check_image(path):
     return magickwand.check_image_file(path)
 
 
+# Decoded bitmaps are shared between pixmaps and cache rebuilds.
+# Cache is keyed by encoded bitmap string and limited by decoded size.
+DECODED_CACHE = OrderedDict()
+DECODED_CACHE_LIMIT = 128 * 1024 * 1024
+DECODED_CACHE_STATE = {'size': 0}
+
+
+def _get_image_size(image):
+    return image.size[0] * image.size[1] * len(image.getbands())
+
+
+def clear_decoded_cache():
+    DECODED_CACHE.clear()
+    DECODED_CACHE_STATE['size'] = 0
+
+
+def get_decoded_image(bmpstr):
+    """
+    Returns decoded PIL image for encoded bitmap string.
+    Returned image is shared, so it must not be modified in place.
+    """
+    image = DECODED_CACHE.pop(bmpstr, None)
+    if image is None:
+        image = Image.open(StringIO(bmpstr))
+        image.load()
+        size = _get_image_size(image)
+        if size > DECODED_CACHE_LIMIT:
+            return image
+        DECODED_CACHE_STATE['size'] += size
+        while DECODED_CACHE and \
+                DECODED_CACHE_STATE['size'] > DECODED_CACHE_LIMIT:
+            item = DECODED_CACHE.popitem(last=False)[1]
+            DECODED_CACHE_STATE['size'] -= _get_image_size(item)
+    DECODED_CACHE[bmpstr] = image
+    return image
+
+
+def image_to_surface(image):
+    """
+    Creates cairo image surface from RGB or RGBA PIL image.
+    Pixels are written directly into surface buffer (premultiplied
+    ARGB32 or RGB24 in native byte order) without PNG encoding.
+    """
+    if image.mode not in (IMAGE_RGB, IMAGE_RGBA):
+        image = image.convert(IMAGE_RGBA)
+    if image.mode == IMAGE_RGB:
+        fmt = cairo.FORMAT_RGB24
+        r, g, b = image.split()
+        a = Image.new(IMAGE_GRAY, image.size, 255)
+    else:
+        fmt = cairo.FORMAT_ARGB32
+        r, g, b, a = image.split()
+        r, g, b = [ImageChops.multiply(band, a) for band in (r, g, b)]
+    bands = (b, g, r, a) if sys.byteorder == 'little' else (a, r, g, b)
+    data = bytearray(Image.merge(IMAGE_RGBA, bands).tobytes())
+    width, height = image.size
+    return cairo.ImageSurface.create_for_data(data, fmt, width, height,
+                                              width * 4)
+
+
 def _get_saver_fmt(img):
     if img.mode == IMAGE_CMYK:
         return 'TIFF'
@@ -81,8 +143,7 @@ def convert_image(cms, pixmap, colorspace, raw=False):
         raw_image.load()
         raw_image = raw_image.convert("RGB")
     else:
-        raw_image = Image.open(StringIO(pixmap.bitmap))
-        raw_image.load()
+        raw_image = get_decoded_image(pixmap.bitmap)
     raw_image = cms.convert_image(raw_image, colorspace)
     if raw:
         return raw_image
@@ -94,8 +155,7 @@ def convert_duotone_to_image(cms, pixmap, cs=None):
     update_image(cms, pixmap)
     fg = pixmap.style[3][0]
     bg = pixmap.style[3][1]
-    raw_image = Image.open(StringIO(pixmap.bitmap))
-    raw_image.load()
+    raw_image = get_decoded_image(pixmap.bitmap).copy()
     fg_img = bg_img = None
     fg_cs = bg_cs = uc2const.IMAGE_RGB
     if pixmap.colorspace == uc2const.IMAGE_MONO:
@@ -128,8 +188,7 @@ def convert_duotone_to_image(cms, pixmap, cs=None):
     fg_alpha = ImageOps.invert(raw_image)
     bg_alpha = raw_image
     if pixmap.alpha_channel:
-        alpha_chnl = Image.open(StringIO(pixmap.alpha_channel))
-        alpha_chnl.load()
+        alpha_chnl = get_decoded_image(pixmap.alpha_channel)
         alpha_chnl = ImageOps.invert(alpha_chnl)
         comp_img = Image.new('L', size, 0)
         fg_alpha.paste(comp_img, (0, 0), alpha_chnl)
@@ -137,10 +196,11 @@ def convert_duotone_to_image(cms, pixmap, cs=None):
     return (fg_img, fg_alpha), (bg_img, bg_alpha)
 
 
+BITMAP_EXTENSIONS = {'PNG': '.png', 'JPEG': '.jpg', 'TIFF': '.tiff'}
+
+
 def extract_bitmap(pixmap, filepath):
-    ext = '.png'
-    if pixmap.colorspace == IMAGE_CMYK:
-        ext = '.tiff'
+    ext = BITMAP_EXTENSIONS[get_bitmap_format(pixmap.bitmap)]
     if not os.path.splitext(filepath)[1] == ext:
         filepath = os.path.splitext(filepath)[0] + ext
     fileptr = fsutils.get_fileptr(filepath, True)
@@ -154,10 +214,7 @@ def extract_bitmap(pixmap, filepath):
 
 
 def update_image(cms, pixmap, force_proofing=False):
-    png_stream = StringIO()
-
-    raw_image = Image.open(StringIO(pixmap.bitmap))
-    raw_image.load()
+    raw_image = get_decoded_image(pixmap.bitmap)
 
     if pixmap.colorspace in DUOTONES:
         if pixmap.colorspace == IMAGE_MONO:
@@ -187,8 +244,7 @@ def update_image(cms, pixmap, force_proofing=False):
         cache_image = cms.get_display_image(raw_image)
 
     if pixmap.alpha_channel:
-        raw_alpha = pixmap.alpha_channel
-        raw_alpha = Image.open(StringIO(raw_alpha))
+        raw_alpha = get_decoded_image(pixmap.alpha_channel).copy()
         if cache_image.mode == IMAGE_RGB:
             cache_image = cache_image.convert(IMAGE_RGBA)
         elif cache_image.mode == IMAGE_RGBA:
@@ -197,18 +253,11 @@ def update_image(cms, pixmap, force_proofing=False):
             raw_alpha.paste(cache_alpha, (0, 0), mask)
         cache_image.putalpha(raw_alpha)
 
-    if cache_image:
-        cache_image.save(png_stream, format='PNG')
-
-    png_stream.seek(0)
-    pixmap.cache_cdata = cairo.ImageSurface.create_from_png(png_stream)
+    pixmap.cache_cdata = image_to_surface(cache_image)
 
 
 def update_gray_image(cms, pixmap):
-    png_stream = StringIO()
-
-    raw_image = Image.open(StringIO(pixmap.bitmap))
-    raw_image.load()
+    raw_image = get_decoded_image(pixmap.bitmap)
 
     if pixmap.colorspace in DUOTONES:
         if pixmap.colorspace == IMAGE_MONO:
@@ -228,8 +277,7 @@ def update_gray_image(cms, pixmap):
         cache_image.paste(bg_image, (0, 0), raw_image)
         rgb_image = cache_image.convert(IMAGE_GRAY).convert(IMAGE_RGBA)
         if pixmap.alpha_channel:
-            raw_alpha = pixmap.alpha_channel
-            raw_alpha = Image.open(StringIO(raw_alpha))
+            raw_alpha = get_decoded_image(pixmap.alpha_channel).copy()
             cache_alpha = Image.new(IMAGE_GRAY, pixmap.size)
             mask = ImageOps.invert(cache_image.split()[3])
             raw_alpha.paste(cache_alpha, (0, 0), mask)
@@ -239,77 +287,136 @@ def update_gray_image(cms, pixmap):
     else:
         raw_image = raw_image.convert(IMAGE_GRAY)
         if pixmap.alpha_channel:
-            raw_alpha = pixmap.alpha_channel
-            raw_alpha = Image.open(StringIO(raw_alpha))
+            raw_alpha = get_decoded_image(pixmap.alpha_channel)
             rgb_image = raw_image.convert(IMAGE_RGBA)
             rgb_image.putalpha(raw_alpha)
         else:
             rgb_image = raw_image.convert(IMAGE_RGB)
 
-    rgb_image.save(png_stream, format='PNG')
+    pixmap.cache_gray_cdata = image_to_surface(rgb_image)
+
+
+# Formats which are decoded by PIL in the same way as by MagickWand
+PIL_FORMATS = ('PNG', 'JPEG', 'TIFF', 'BMP')
+PIL_MODES = (IMAGE_MONO, IMAGE_GRAY, 'LA', 'P', IMAGE_RGB, IMAGE_RGBA,
+             IMAGE_CMYK)
+# Imported images in these formats are stored as is
+# if their pixels are not changed
+PASSTHROUGH_FORMATS = ('PNG', 'JPEG')
 
-    png_stream.seek(0)
-    pixmap.cache_gray_cdata = cairo.ImageSurface.create_from_png(png_stream)
 
+def get_bitmap_format(bmpstr):
+    """
+    Returns format of pixmap bitmap string: PNG, JPEG or TIFF.
+    """
+    if bmpstr[:3] == '\xff\xd8\xff':
+        return 'JPEG'
+    if bmpstr[:8] == '\x89PNG\r\n\x1a\n':
+        return 'PNG'
+    return 'TIFF'
 
-def extract_profile(raw_content):
-    profile = None
-    mode = None
+
+def is_adobe_jpeg(bmpstr):
+    """
+    Checks is JPEG bitmap written by Adobe application
+    (CMYK samples of such JPEG are inverted).
+    """
     try:
-        img = Image.open(StringIO(raw_content))
-        if 'icc_profile' in img.info:
-            profile = img.info.get('icc_profile')
-            mode = img.mode
+        return 'adobe' in Image.open(StringIO(bmpstr)).info
+    except Exception:
+        return False
+
+
+def _open_image(raw_content):
+    # returns None if image should be decoded by MagickWand
+    try:
+        image = Image.open(StringIO(raw_content))
+        if image.format in PIL_FORMATS and image.mode in PIL_MODES and \
+                getattr(image, 'n_frames', 1) == 1:
+            image.load()
+            return image
     except Exception:
         pass
-    return profile, mode
+    return None
+
+
+def _split_alpha(image):
+    transparency = 'transparency' in image.info
+    if image.mode == 'P':
+        image = image.convert(IMAGE_RGBA if transparency else IMAGE_RGB)
+    elif transparency and image.mode in (IMAGE_MONO, IMAGE_GRAY):
+        image = image.convert('LA')
+    elif transparency and image.mode == IMAGE_RGB:
+        image = image.convert(IMAGE_RGBA)
+    if image.mode in ('LA', IMAGE_RGBA):
+        return image.convert(image.mode[:-1]), image.split()[-1]
+    return image, None
+
+
+def decode_image(raw_content):
+    """
+    Decodes imported image once: by PIL for common formats and
+    by MagickWand for others. Returns (image, alpha image or None,
+    ICC profile or None, mode of source image, stored flag) where
+    stored flag means that raw content can be stored as pixmap
+    bitmap if image pixels are not changed.
+    """
+    image = _open_image(raw_content)
+    if image is None:
+        mode, size, pixels, alpha, profile = \
+            magickwand.decode_image(raw_content)
+        if mode == IMAGE_MONO:
+            image = Image.frombytes(IMAGE_GRAY, size, pixels)
+            image = image.convert(IMAGE_MONO)
+        else:
+            image = Image.frombytes(mode, size, pixels)
+        if alpha is not None:
+            alpha = Image.frombytes(IMAGE_GRAY, size, alpha)
+        return image, alpha, profile, mode, False
 
+    base_image, alpha = _split_alpha(image)
+    stored = image.format in PASSTHROUGH_FORMATS and base_image is image
+    return base_image, alpha, image.info.get('icc_profile'), image.mode, \
+           stored
 
-def set_image_data(cms, pixmap, raw_content):
-    alpha = ''
-    profile, mode = extract_profile(raw_content)
 
-    base_stream, alpha_stream = magickwand.process_image(raw_content)
-    base_image = Image.open(base_stream)
-    base_image.load()
+def set_image_data(cms, pixmap, raw_content):
+    base_image, alpha_image, profile, mode, stored = \
+        decode_image(raw_content)
 
     pixmap.size = () + base_image.size
     if base_image.mode not in SUPPORTED_CS:
         base_image = base_image.convert(IMAGE_RGB)
+        stored = False
 
     if base_image.mode not in SUPPORTED_CS[1:]:
-        profile = mode = None
+        profile = None
 
     if profile and base_image.mode == mode:
         try:
             base_image = cms.adjust_image(base_image, profile)
+            stored = False
         except Exception:
             pass
 
     pixmap.colorspace = base_image.mode
 
-    fobj = StringIO()
-    base_image = base_image.copy()
-    base_image.save(fobj, format=_get_saver_fmt(base_image))
-    bmp = fobj.getvalue()
+    if stored:
+        bmp = raw_content
+    else:
+        fobj = StringIO()
+        base_image.save(fobj, format=_get_saver_fmt(base_image))
+        bmp = fobj.getvalue()
 
     style = deepcopy(pixmap.config.default_image_style)
     if base_image.mode in [IMAGE_RGB, IMAGE_LAB]:
         style[3] = deepcopy(pixmap.config.default_rgb_image_style)
 
-    if alpha_stream:
-        alpha_image = Image.open(alpha_stream)
-        alpha_image.load()
-        if alpha_image.mode == 'P':
-            alpha_image = alpha_image.convert(IMAGE_RGBA)
-        if alpha_image.mode in ['LA', IMAGE_RGBA]:
-            if alpha_image.mode == 'LA':
-                band = alpha_image.split()[1]
-            else:
-                band = alpha_image.split()[3]
-            fobj = StringIO()
-            band.save(fobj, format=_get_saver_fmt(band))
-            alpha = fobj.getvalue()
+    alpha = ''
+    if alpha_image is not None:
+        fobj = StringIO()
+        alpha_image.save(fobj, format=_get_saver_fmt(alpha_image))
+        alpha = fobj.getvalue()
 
     pixmap.bitmap = bmp
     pixmap.alpha_channel = alpha
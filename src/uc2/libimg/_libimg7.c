@@ -513,6 +513,92 @@ im_RemoveAlpaChannel(PyObject *self, PyObject *args) {
 	return Py_None;
 }
 
+static PyObject *
+im_ClearImage(PyObject *self, PyObject *args) {
+
+	void *magick_pointer;
+	MagickWand *magick_wand;
+
+	if (!PyArg_ParseTuple(args, "O", &magick_pointer)){
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	magick_wand = (MagickWand *) PyCObject_AsVoidPtr(magick_pointer);
+	ClearMagickWand(magick_wand);
+
+	Py_INCREF(Py_None);
+	return Py_None;
+}
+
+static PyObject *
+im_GetImagePixels(PyObject *self, PyObject *args) {
+
+	void *magick_pointer;
+	MagickWand *magick_wand;
+	char *map = NULL;
+	size_t width, height;
+	PyObject *pixels;
+	MagickBooleanType status;
+
+	if (!PyArg_ParseTuple(args, "Os", &magick_pointer, &map)){
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	magick_wand = (MagickWand *) PyCObject_AsVoidPtr(magick_pointer);
+	width = MagickGetImageWidth(magick_wand);
+	height = MagickGetImageHeight(magick_wand);
+
+	pixels = PyString_FromStringAndSize(NULL, width * height * strlen(map));
+	if (pixels == NULL){
+		return NULL;
+	}
+
+	Py_BEGIN_ALLOW_THREADS
+	status = MagickExportImagePixels(magick_wand, 0, 0, width, height, map,
+			CharPixel, (void *)PyString_AS_STRING(pixels));
+	Py_END_ALLOW_THREADS
+
+	if (status == MagickFalse){
+		Py_DECREF(pixels);
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	return Py_BuildValue("(kkN)", (unsigned long)width,
+			(unsigned long)height, pixels);
+}
+
+static PyObject *
+im_GetImageProfile(PyObject *self, PyObject *args) {
+
+	void *magick_pointer;
+	MagickWand *magick_wand;
+	char *name = NULL;
+	unsigned char *profile;
+	size_t length;
+	PyObject *ret;
+
+	if (!PyArg_ParseTuple(args, "Os", &magick_pointer, &name)){
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	magick_wand = (MagickWand *) PyCObject_AsVoidPtr(magick_pointer);
+	profile = MagickGetImageProfile(magick_wand, name, &length);
+
+	if (profile == NULL || !length){
+		if (profile != NULL) MagickRelinquishMemory(profile);
+		Py_INCREF(Py_None);
+		return Py_None;
+	}
+
+	ret = Py_BuildValue("s#", profile, length);
+	MagickRelinquishMemory(profile);
+	return ret;
+}
+
 static PyObject *
 im_GetVersion(PyObject *self, PyObject *args) {
 
@@ -545,6 +631,9 @@ PyMethodDef im_methods[] = {
 		{"set_image_type", im_SetImageType, METH_VARARGS},
 		{"remove_alpha_channel", im_RemoveAlpaChannel, METH_VARARGS},
 		{"get_version", im_GetVersion, METH_VARARGS},
+		{"clear_image", im_ClearImage, METH_VARARGS},
+		{"get_image_pixels", im_GetImagePixels, METH_VARARGS},
+		{"get_image_profile", im_GetImageProfile, METH_VARARGS},
 
 	{NULL, NULL}
 };
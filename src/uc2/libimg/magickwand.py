@@ -15,8 +15,10 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from cStringIO import StringIO
+import atexit
 import logging
+import threading
+from cStringIO import StringIO
 
 UNDEFINED_TYPE = 'UndefinedType'
 BILEVEL_TYPE = 'BilevelType'
@@ -44,59 +46,119 @@ def get_magickwand_version():
     return ' '.join(ver[0].split(' ')[1:-1]), ver[1]
 
 
+class WandPool(object):
+    """
+    Long-lived MagickWand environment with reusable wands.
+    Environment is initialized by first request and terminated
+    at exit, returned wands are cleared and reused.
+    """
+
+    size = 4
+
+    def __init__(self):
+        self.wands = []
+        self.lock = threading.Lock()
+        self.initialized = False
+
+    def get(self):
+        import _libimg
+        with self.lock:
+            if not self.initialized:
+                _libimg.init_magick()
+                atexit.register(self.terminate)
+                self.initialized = True
+            if self.wands:
+                return self.wands.pop()
+        return _libimg.new_image()
+
+    def release(self, *wands):
+        import _libimg
+        for wand in wands:
+            _libimg.clear_image(wand)
+            with self.lock:
+                if len(self.wands) < self.size:
+                    self.wands.append(wand)
+
+    def terminate(self):
+        import _libimg
+        with self.lock:
+            # wands must be destroyed before environment
+            self.wands = []
+            if self.initialized:
+                _libimg.terminate_magick()
+                self.initialized = False
+
+
+POOL = WandPool()
+
+
 def check_image_file(filepath):
     import _libimg
-    _libimg.init_magick()
-    wand = _libimg.new_image()
+    wand = POOL.get()
     ret = _libimg.load_image(wand, filepath)
-    _libimg.terminate_magick()
+    POOL.release(wand)
     LOG.debug('MagickWand check: %s', ret == 1)
     return ret == 1
 
 
-def process_image(raw_content):
+def decode_image(raw_content):
+    """
+    Decodes image by MagickWand without intermediate encoding.
+    Returns (mode, size, pixels, alpha pixels, ICC profile)
+    where mode is PIL image mode (RGB, CMYK, L or 1), pixels are
+    8-bit samples (bilevel images are returned as grayscale ones)
+    and alpha pixels is None for images without alpha channel.
+    """
     import _libimg
-    LOG.debug('MagickWand processing started')
-    alpha = None
-    _libimg.init_magick()
-    wand = _libimg.new_image()
-    _libimg.load_image_blob(wand, raw_content)
-    if _libimg.get_number_images(wand) > 1:
-        LOG.debug('Wand merging.')
-        wand = _libimg.merge_layers(wand)
-
-    image_type = _libimg.get_image_type(wand)
-    LOG.debug('Wand image type: %s', image_type)
-
-    if image_type in ALPHA_TYPES:
-        alpha_wand = _libimg.clone_image(wand)
-        _libimg.remove_alpha_channel(wand)
-        _libimg.set_image_format(alpha_wand, 'png')
-        _libimg.set_image_type(alpha_wand, RGBA_TYPE)
-        alpha = StringIO(_libimg.get_image_blob(alpha_wand))
-        alpha.seek(0)
-
-    if image_type in CMYK_TYPES:
-        _libimg.set_image_format(wand, 'tiff')
-        _libimg.set_image_type(wand, CMYK_TYPE)
-    else:
-        _libimg.set_image_format(wand, 'png')
-
-    base = StringIO(_libimg.get_image_blob(wand))
-    base.seek(0)
-    _libimg.terminate_magick()
-    return base, alpha
+    LOG.debug('MagickWand decoding started')
+    wand = merged = POOL.get()
+    try:
+        if not _libimg.load_image_blob(wand, raw_content):
+            raise IOError('Cannot decode image')
+        if _libimg.get_number_images(wand) > 1:
+            LOG.debug('Wand merging.')
+            merged = _libimg.merge_layers(wand)
+
+        image_type = _libimg.get_image_type(merged)
+        LOG.debug('Wand image type: %s', image_type)
+        mode, pixel_map = 'RGB', 'RGB'
+        if image_type in CMYK_TYPES:
+            mode, pixel_map = 'CMYK', 'CMYK'
+        elif image_type == BILEVEL_TYPE:
+            mode, pixel_map = '1', 'I'
+        elif image_type in DUOTONES:
+            mode, pixel_map = 'L', 'I'
+
+        ret = _libimg.get_image_pixels(merged, pixel_map)
+        if ret is None:
+            raise IOError('Cannot decode image')
+        width, height, pixels = ret
+        alpha = None
+        if image_type in ALPHA_TYPES:
+            ret = _libimg.get_image_pixels(merged, 'A')
+            if ret is None:
+                raise IOError('Cannot decode image')
+            alpha = ret[2]
+        profile = _libimg.get_image_profile(merged, 'icc')
+    finally:
+        # merged wand is a new one, it is cleared and pooled as well
+        if merged is wand:
+            POOL.release(wand)
+        else:
+            POOL.release(wand, merged)
+    return mode, (width, height), pixels, alpha, profile
 
 
 def process_pattern(raw_content):
     import _libimg
     LOG.debug('MagickWand duotone processing started')
-    _libimg.init_magick()
-    wand = _libimg.new_image()
-    _libimg.load_image_blob(wand, raw_content)
-    image_type = _libimg.get_image_type(wand)
-    _libimg.set_image_format(wand, 'tiff')
-    base = StringIO(_libimg.get_image_blob(wand))
+    wand = POOL.get()
+    try:
+        _libimg.load_image_blob(wand, raw_content)
+        image_type = _libimg.get_image_type(wand)
+        _libimg.set_image_format(wand, 'tiff')
+        base = StringIO(_libimg.get_image_blob(wand))
+    finally:
+        POOL.release(wand)
     base.seek(0)
-    _libimg.terminate_magick()
     return base, image_type in DUOTONES
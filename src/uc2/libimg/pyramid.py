@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Image pyramids (mipmaps) for pixmap rendering.
+
+Level N of pyramid is source surface downsampled 2^N times. Levels are
+built on demand by background worker; till requested level is ready
+the nearest finer level is used. All levels share common memory budget
+and least recently used levels are evicted first.
+"""
+
+import cairo
+import logging
+import math
+import threading
+import weakref
+from Queue import Queue
+from collections import OrderedDict
+
+LOG = logging.getLogger(__name__)
+
+MIN_LEVEL_SIZE = 16
+MEMORY_LIMIT = 256 * 1024 * 1024
+
+
+def get_surface_size(surface):
+    return surface.get_stride() * surface.get_height()
+
+
+def downsample(surface):
+    """
+    Returns new surface which is half of provided one.
+    """
+    width, height = surface.get_width(), surface.get_height()
+    new_width = max(1, (width + 1) // 2)
+    new_height = max(1, (height + 1) // 2)
+    ret = cairo.ImageSurface(surface.get_format(), new_width, new_height)
+    ctx = cairo.Context(ret)
+    ctx.scale(float(new_width) / width, float(new_height) / height)
+    ctx.set_source_surface(surface)
+    ctx.get_source().set_filter(cairo.FILTER_GOOD)
+    ctx.get_source().set_extend(cairo.EXTEND_PAD)
+    ctx.set_operator(cairo.OPERATOR_SOURCE)
+    ctx.paint()
+    return ret
+
+
+class ImagePyramid(object):
+    surface = None
+    levels = None
+    pending = None
+    max_level = 0
+
+    def __init__(self, surface):
+        self.surface = surface
+        self.levels = {}
+        self.pending = set()
+        size = min(surface.get_width(), surface.get_height())
+        while size // 2 >= MIN_LEVEL_SIZE:
+            size //= 2
+            self.max_level += 1
+
+    def get_level_index(self, scale):
+        """
+        Returns pyramid level suitable for provided image scale.
+        """
+        if scale >= 0.5 or not self.max_level or scale <= 0.0:
+            return 0
+        index = int(math.floor(math.log(1.0 / scale, 2)))
+        return min(self.max_level, index)
+
+    def get_level(self, scale):
+        """
+        Returns best ready surface for provided image scale.
+        Missing level is scheduled for background build.
+        """
+        index = self.get_level_index(scale)
+        if not index:
+            return self.surface
+        surface = self.levels.get(index)
+        if surface is not None:
+            BUILDER.touch(self, index)
+            return surface
+        BUILDER.request(self, index)
+        for item in range(index - 1, 0, -1):
+            surface = self.levels.get(item)
+            if surface is not None:
+                return surface
+        return self.surface
+
+    def build(self, index):
+        start = 0
+        for item in range(index, 0, -1):
+            if self.levels.get(item) is not None:
+                start = item
+                break
+        surface = self.levels.get(start) if start else self.surface
+        for item in range(start + 1, index + 1):
+            surface = downsample(surface)
+            BUILDER.add(self, item, surface)
+
+
+class PyramidBuilder(object):
+    """
+    Background worker which builds pyramid levels
+    and keeps levels memory under limit.
+    """
+
+    callback = None
+    memory_limit = MEMORY_LIMIT
+
+    def __init__(self):
+        self.queue = Queue()
+        self.thread = None
+        self.lock = threading.RLock()
+        self.lru = OrderedDict()
+        self.refs = {}
+        self.size = 0
+
+    def request(self, pyramid, index):
+        if index in pyramid.pending:
+            return
+        pyramid.pending.add(index)
+        self.queue.put((weakref.ref(pyramid), index))
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            ref, index = self.queue.get()
+            pyramid = ref()
+            if pyramid is None:
+                continue
+            try:
+                pyramid.build(index)
+            except Exception as e:
+                LOG.error('Cannot build image pyramid level %s', e)
+            finally:
+                pyramid.pending.discard(index)
+            pyramid = None
+            if self.callback is not None and self.queue.empty():
+                self.callback()
+
+    def _forget(self, ref):
+        with self.lock:
+            for key in [key for key in self.lru if key[0] is ref]:
+                self.size -= self.lru.pop(key)
+            for key, value in self.refs.items():
+                if value is ref:
+                    del self.refs[key]
+
+    def add(self, pyramid, index, surface):
+        with self.lock:
+            ref = self.refs.get(id(pyramid))
+            if ref is None:
+                ref = weakref.ref(pyramid, self._forget)
+                self.refs[id(pyramid)] = ref
+            pyramid.levels[index] = surface
+            key = (ref, index)
+            self.size -= self.lru.pop(key, 0)
+            self.lru[key] = get_surface_size(surface)
+            self.size += self.lru[key]
+            self._evict()
+
+    def touch(self, pyramid, index):
+        with self.lock:
+            ref = self.refs.get(id(pyramid))
+            if ref is not None and (ref, index) in self.lru:
+                self.lru[(ref, index)] = self.lru.pop((ref, index))
+
+    def _evict(self):
+        while self.size > self.memory_limit and len(self.lru) > 1:
+            (ref, index), size = self.lru.popitem(last=False)
+            self.size -= size
+            pyramid = ref()
+            if pyramid is not None:
+                pyramid.levels.pop(index, None)
+
+    def set_memory_limit(self, limit):
+        with self.lock:
+            self.memory_limit = limit
+            self._evict()
+
+
+BUILDER = PyramidBuilder()
+
+
+def set_memory_limit(limit):
+    """
+    Sets memory limit (in bytes) for all pyramid levels.
+    """
+    BUILDER.set_memory_limit(limit)
+
+
+def set_ready_callback(callback):
+    """
+    Sets callback which is called (from worker thread)
+    when all requested pyramid levels are built.
+    """
+    BUILDER.callback = callback
+
+
+def get_pyramid_surface(pixmap, surface, scale):
+    """
+    Returns pyramid level of pixmap surface for provided image scale.
+    """
+    pyramid = pixmap.cache_pyramid
+    if pyramid is None or pyramid.surface is not surface:
+        pyramid = pixmap.cache_pyramid = ImagePyramid(surface)
+    return pyramid.get_level(scale)
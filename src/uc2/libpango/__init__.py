@@ -16,6 +16,7 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from core import get_version
+from core import get_version, clear_glyph_cache, get_glyph_cache_stats, \
+    reset_glyph_cache_stats, get_font_file
 from fonts import get_fonts, get_sample_size, render_sample
-from paths import get_text_paths
\ No newline at end of file
+from paths import get_text_paths, get_glyph_origin, clear_paragraph_cache
\ No newline at end of file
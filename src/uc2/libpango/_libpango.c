@@ -17,8 +17,14 @@
  */
 
 #include <Python.h>
+#ifndef _WIN32
+#define PANGO_ENABLE_BACKEND
+#endif
 #include <pango/pango.h>
 #include <pango/pangocairo.h>
+#ifndef _WIN32
+#include <pango/pangofc-font.h>
+#endif
 #include <cairo.h>
 #include <pycairo.h>
 
@@ -265,6 +271,39 @@ pango_GetLayoutPixelSize(PyObject *self, PyObject *args) {
 	return pixel_size;
 }
 
+static PyObject *
+pango_GetLayoutExtents(PyObject *self, PyObject *args) {
+
+	void *LayoutObj;
+	PangoLayout *layout;
+	PangoRectangle rect;
+	PyObject *extents;
+
+	if (!PyArg_ParseTuple(args, "O", &LayoutObj)) {
+		return NULL;
+	}
+
+	layout = PyCObject_AsVoidPtr(LayoutObj);
+
+	pango_layout_get_extents(layout, NULL, &rect);
+
+	//Logical extents: (x,y,width,height,first_baseline)
+	extents = PyTuple_New(5);
+	PyTuple_SetItem(extents, 0,
+			PyFloat_FromDouble(((double) rect.x) / PANGO_SCALE));
+	PyTuple_SetItem(extents, 1,
+			PyFloat_FromDouble(((double) rect.y) / PANGO_SCALE));
+	PyTuple_SetItem(extents, 2,
+			PyFloat_FromDouble(((double) rect.width) / PANGO_SCALE));
+	PyTuple_SetItem(extents, 3,
+			PyFloat_FromDouble(((double) rect.height) / PANGO_SCALE));
+	PyTuple_SetItem(extents, 4,
+			PyFloat_FromDouble(((double) pango_layout_get_baseline(layout))
+			/ PANGO_SCALE));
+
+	return extents;
+}
+
 static PyObject *
 pango_LayoutPath(PyObject *self, PyObject *args) {
 
@@ -553,6 +592,77 @@ pango_GetLayoutClusterPos(PyObject *self, PyObject *args) {
 	return ret;
 }
 
+static PyObject *
+pango_GetFontFile(PyObject *self, PyObject *args) {
+
+	void *FontDescObj;
+	PangoFontDescription *fd;
+	PangoFontMap *fm;
+	PangoContext *ctx;
+	PangoFont *font;
+	PyObject *ret = NULL;
+#ifndef _WIN32
+	FcPattern *pattern;
+	FcChar8 *filename;
+	FcMatrix *matrix;
+	FcBool embolden;
+	double size;
+	int index, synthetic;
+#endif
+
+	if (!PyArg_ParseTuple(args, "O", &FontDescObj)) {
+		return NULL;
+	}
+
+	fd = PyCObject_AsVoidPtr(FontDescObj);
+	fm = pango_cairo_font_map_get_default();
+	ctx = pango_font_map_create_context(fm);
+	font = pango_font_map_load_font(fm, ctx, fd);
+
+#ifndef _WIN32
+	if (font && PANGO_IS_FC_FONT(font)) {
+		pattern = PANGO_FC_FONT(font)->font_pattern;
+		/* synthetic bold and oblique faces differ from font file */
+		synthetic = 0;
+		if (FcPatternGetBool(pattern, FC_EMBOLDEN, 0,
+				&embolden) == FcResultMatch && embolden) {
+			synthetic = 1;
+		}
+		if (FcPatternGetMatrix(pattern, FC_MATRIX, 0,
+				&matrix) == FcResultMatch) {
+			if (matrix->xx != 1.0 || matrix->xy != 0.0 ||
+					matrix->yx != 0.0 || matrix->yy != 1.0) {
+				synthetic = 1;
+			}
+		}
+		if (FcPatternGetInteger(pattern, FC_INDEX, 0,
+				&index) != FcResultMatch) {
+			index = 0;
+		}
+		/* em size in layout units (font size scaled by resolution) */
+		if (FcPatternGetDouble(pattern, FC_PIXEL_SIZE, 0,
+				&size) != FcResultMatch) {
+			synthetic = 1;
+		}
+		if (!synthetic && FcPatternGetString(pattern, FC_FILE, 0,
+				&filename) == FcResultMatch) {
+			ret = Py_BuildValue("sid", (char *) filename, index, size);
+		}
+	}
+#endif
+
+	if (font) {
+		g_object_unref(font);
+	}
+	g_object_unref(ctx);
+
+	if (!ret) {
+		Py_INCREF(Py_None);
+		ret = Py_None;
+	}
+	return ret;
+}
+
 static
 PyMethodDef pango_methods[] = {
 	{"get_version", pango_GetVersion, METH_VARARGS},
@@ -566,10 +676,12 @@ PyMethodDef pango_methods[] = {
 	{"set_layout_alignment", pango_SetLayoutAlignment, METH_VARARGS},
 	{"set_layout_markup", pango_SetLayoutMarkup, METH_VARARGS},
 	{"get_layout_pixel_size", pango_GetLayoutPixelSize, METH_VARARGS},
+	{"get_layout_extents", pango_GetLayoutExtents, METH_VARARGS},
 	{"layout_path", pango_LayoutPath, METH_VARARGS},
 	{"get_layout_line_positions", pango_GetLayoutLinePos, METH_VARARGS},
 	{"get_layout_char_positions", pango_GetLayoutCharPos, METH_VARARGS},
 	{"get_layout_cluster_positions", pango_GetLayoutClusterPos, METH_VARARGS},
+	{"get_font_file", pango_GetFontFile, METH_VARARGS},
 	{NULL, NULL}
 };
 
@@ -18,7 +18,7 @@
 import _libpango
 import cairo
 import os
-from copy import deepcopy
+from collections import OrderedDict
 
 from markup import apply_markup, apply_glyph_markup
 
@@ -39,18 +39,54 @@ def get_version():
 
 # --- Glyph caching
 
-GLYPH_CACHE = {}
+# Glyph outlines (cairo paths in layout coordinates, before positioning)
+# keyed by font description, layout width and alignment, and glyph
+# markup (cluster text with applied markup tags).
+GLYPH_CACHE = OrderedDict()
+GLYPH_CACHE_SIZE = 20000
+GLYPH_CACHE_STATE = {'hits': 0, 'misses': 0}
 
 
-def get_glyph_cache(font_name, char):
-    char = str(char)
-    if font_name in GLYPH_CACHE and char in GLYPH_CACHE[font_name]:
-        return deepcopy(GLYPH_CACHE[font_name][char])
+def get_glyph_key(text_style, width, markuped_text):
+    return tuple(text_style[:4]) + (width, markuped_text)
 
 
-def set_glyph_cache(font_name, char, glyph):
-    GLYPH_CACHE[font_name] = GLYPH_CACHE.get(font_name, {})
-    GLYPH_CACHE[font_name][str(char)] = deepcopy(glyph)
+def get_glyph_cache(key):
+    """
+    Returns cached glyph outline or None. Returned path is shared,
+    so it should be copied before modification.
+    """
+    cpath = GLYPH_CACHE.pop(key, None)
+    if cpath is None:
+        GLYPH_CACHE_STATE['misses'] += 1
+        return None
+    GLYPH_CACHE_STATE['hits'] += 1
+    GLYPH_CACHE[key] = cpath
+    return cpath
+
+
+def set_glyph_cache(key, cpath):
+    GLYPH_CACHE[key] = cpath
+    while len(GLYPH_CACHE) > GLYPH_CACHE_SIZE:
+        GLYPH_CACHE.popitem(last=False)
+
+
+def clear_glyph_cache():
+    GLYPH_CACHE.clear()
+
+
+def reset_glyph_cache_stats():
+    GLYPH_CACHE_STATE['hits'] = 0
+    GLYPH_CACHE_STATE['misses'] = 0
+
+
+def get_glyph_cache_stats():
+    """
+    Returns dict of glyph cache hits, misses and current size.
+    """
+    return {'hits': GLYPH_CACHE_STATE['hits'],
+            'misses': GLYPH_CACHE_STATE['misses'],
+            'size': len(GLYPH_CACHE)}
 
 
 # --- Pango context functionality
@@ -80,15 +116,20 @@ def set_layout(text, width, text_style, markup, layout=PANGO_LAYOUT):
 def set_glyph_layout(text, width, text_style, markup, text_range=None,
                      check_nt=False, layout=PANGO_LAYOUT):
     text_range = text_range or []
+    markuped_text, vpos = apply_glyph_markup(text, text_range, markup, check_nt)
+    set_glyph_markup(markuped_text, width, text_style, check_nt, layout)
+    return vpos
+
+
+def set_glyph_markup(markuped_text, width, text_style, check_nt=False,
+                     layout=PANGO_LAYOUT):
     if not width == -1:
         width *= PANGO_UNITS
     _libpango.set_layout_width(layout, width)
     fnt_descr = get_font_description(text_style, check_nt)
     _libpango.set_layout_font_description(layout, fnt_descr)
     _libpango.set_layout_alignment(layout, text_style[3])
-    markuped_text, vpos = apply_glyph_markup(text, text_range, markup, check_nt)
     _libpango.set_layout_markup(layout, markuped_text)
-    return vpos
 
 
 def layout_path(ctx=CTX, layout=PANGO_LAYOUT):
@@ -111,6 +152,33 @@ def get_layout_size(layout=PANGO_LAYOUT):
     return _libpango.get_layout_pixel_size(layout)
 
 
+def get_layout_extents(layout=PANGO_LAYOUT):
+    """
+    Returns exact logical extents (x, y, width, height) and
+    first line baseline of layout.
+    """
+    return _libpango.get_layout_extents(layout)
+
+
 def get_layout_bbox(layout=PANGO_LAYOUT):
     w, h = get_layout_size(layout)
     return [0.0, 0.0, float(w), float(-h)]
+
+
+# --- Font files
+
+FONT_FILES = {}
+
+
+def get_font_file(text_style):
+    """
+    Returns (font file path, face index, em size) of font which is
+    resolved by Pango for text style. Em size is font size in layout
+    units. Returns None if font file is unknown or face is synthesized
+    (artificial bold or oblique).
+    """
+    key = tuple(text_style[:3])
+    if key not in FONT_FILES:
+        fnt_descr = get_font_description(text_style)
+        FONT_FILES[key] = _libpango.get_font_file(fnt_descr)
+    return FONT_FILES[key]
@@ -16,15 +16,18 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import math
 import os
 import cairo
+from collections import OrderedDict
 from copy import deepcopy
 
-from uc2 import libcairo
+from uc2 import libcairo, sk2const
 
 import core
 from core import NONPRINTING_CHARS
 from langs import check_maynmar, check_arabic
+from markup import apply_glyph_markup, intersect_ranges
 
 
 def cluster_text(text, clusters):
@@ -201,6 +204,60 @@ def get_log_layout_data(layout_data, byte_dict, rtl_regs):
     return log_layout_data
 
 
+def get_glyph_path(ctx, text, text_range, width, text_style, markup):
+    """
+    Returns (glyph outline, vertical shift factor) for text cluster.
+    Outlines are taken from glyph cache if possible, so returned
+    path is shared and should be placed by place_glyph().
+    """
+    markuped_text, vpos = apply_glyph_markup(text, text_range, markup, True)
+    key = core.get_glyph_key(text_style, width, markuped_text)
+    cpath = core.get_glyph_cache(key)
+    if cpath is None:
+        ctx.new_path()
+        ctx.move_to(0, 0)
+        layout = core.create_layout(ctx)
+        core.set_glyph_markup(markuped_text, width, text_style, True, layout)
+        core.layout_path(ctx, layout)
+        cpath = ctx.copy_path()
+        core.set_glyph_cache(key, cpath)
+    return cpath, vpos
+
+
+def place_glyph(cpath, x, y):
+    m00 = 1.0
+    m11 = -1.0
+    if os.name == 'nt':
+        m00 *= 0.1
+        m11 *= 0.1
+    return libcairo.apply_trafo(cpath, [m00, 0.0, 0.0, m11, x, y], True)
+
+
+# Pen origins of unmarked glyphs keyed like glyph outlines
+GLYPH_ORIGINS = {}
+
+
+def get_glyph_origin(text, width, text_style):
+    """
+    Returns pen origin of unmarked glyph outline relative to its
+    placement point (see place_glyph), so glyph can be drawn by font
+    at the same position as outline.
+    """
+    markuped_text = apply_glyph_markup(text, [], [], True)[0]
+    key = core.get_glyph_key(text_style, width, markuped_text)
+    origin = GLYPH_ORIGINS.get(key)
+    if origin is None:
+        layout = core.create_layout()
+        core.set_glyph_markup(markuped_text, width, text_style, True, layout)
+        x, y, w, h, baseline = core.get_layout_extents(layout)
+        scale = 0.1 if os.name == 'nt' else 1.0
+        origin = (scale * x, -scale * baseline)
+        if len(GLYPH_ORIGINS) >= core.GLYPH_CACHE_SIZE:
+            GLYPH_ORIGINS.clear()
+        GLYPH_ORIGINS[key] = origin
+    return origin
+
+
 def get_glyphs(ctx, layout_data, text, width, text_style, markup):
     glyphs = []
     i = -1
@@ -219,29 +276,17 @@ def get_glyphs(ctx, layout_data, text, width, text_style, markup):
                 glyphs.append(None)
                 continue
 
-        ctx.new_path()
-        ctx.move_to(0, 0)
-        layout = core.create_layout(ctx)
         text_range = [i, i + len(item)]
-        vpos = core.set_glyph_layout(item, width, text_style, markup,
-                                     text_range, True, layout)
+        cpath, vpos = get_glyph_path(ctx, item, text_range, width,
+                                     text_style, markup)
         if vpos:
             for index in range(*text_range):
                 x, y, w, h, base_line, byte_index = layout_data[index]
                 dh = (y - base_line) * vpos
                 layout_data[index] = (x, y + dh, w, h,
                                       base_line + dh, byte_index)
-        core.layout_path(ctx, layout)
-        cpath = ctx.copy_path()
-        m00 = 1.0
-        m11 = -1.0
-        if os.name == 'nt':
-            m00 *= 0.1
-            m11 *= 0.1
-        matrix = cairo.Matrix(m00, 0.0, 0.0, m11,
-                              layout_data[i][0], layout_data[i][1])
-        libcairo.apply_cmatrix(cpath, matrix)
-        glyphs.append(cpath)
+        glyphs.append(place_glyph(cpath, layout_data[i][0],
+                                  layout_data[i][1]))
     return glyphs
 
 
@@ -264,36 +309,26 @@ def get_rtl_glyphs(ctx, layout_data, log_layout_data, byte_dict, rtl_regs,
             glyphs.append(None)
             continue
 
-        ctx.new_path()
-        ctx.move_to(0, 0)
-        layout = core.create_layout(ctx)
-        vpos = core.set_glyph_layout(txt, width, text_style,
-                                     markup, text_range, True, layout)
+        cpath, vpos = get_glyph_path(ctx, txt, text_range, width,
+                                     text_style, markup)
         if vpos:
             for index in range(*text_range):
                 x, y, w, h, base_line, byte_index = log_layout_data[index]
                 dh = (y - base_line) * vpos
                 log_layout_data[index] = (x, y + dh, w, h,
                                           base_line + dh, byte_index)
-        core.layout_path(ctx, layout)
-        cpath = ctx.copy_path()
-        m00 = 1.0
-        m11 = -1.0
-        if os.name == 'nt':
-            m00 *= 0.1
-            m11 *= 0.1
-        matrix = cairo.Matrix(m00, 0.0, 0.0, m11, item[0], item[1])
-        libcairo.apply_cmatrix(cpath, matrix)
-        glyphs.append(cpath)
+        glyphs.append(place_glyph(cpath, item[0], item[1]))
     return glyphs
 
 
-def get_text_paths(orig_text, width, text_style, markup):
-    if not orig_text:
-        orig_text = NONPRINTING_CHARS[0]
-        markup = []
+def layout_paragraph(orig_text, width, text_style, markup):
+    """
+    Lays out single paragraph (text without line breaks).
+    Returns glyphs, line points, logical layout data and clusters
+    in paragraph coordinates with exact paragraph layout extents.
+    """
     core.set_layout(orig_text, width, text_style, markup)
-    w, h = core.get_layout_size()
+    extents = core.get_layout_extents()
 
     surf = cairo.ImageSurface(cairo.FORMAT_RGB24, 100, 100)
     ctx = cairo.Context(surf)
@@ -342,7 +377,129 @@ def get_text_paths(orig_text, width, text_style, markup):
         glyphs = get_glyphs(ctx, layout_data, text,
                             width, text_style, markup)
 
+    return glyphs, line_points, log_layout_data, clusters, extents
+
+
+# --- Paragraph runs caching
+
+# Paragraph layouts keyed by paragraph text, layout width, text style
+# and paragraph markup. Editing of text relays out changed paragraph
+# only, other paragraphs are shifted into new positions.
+PARAGRAPH_CACHE = OrderedDict()
+PARAGRAPH_CACHE_SIZE = 1000
+
+
+def clear_paragraph_cache():
+    PARAGRAPH_CACHE.clear()
+
+
+def get_paragraphs(text, markup):
+    """
+    Splits text into paragraph runs.
+
+    :rtype: list
+    :return: list of (start index, paragraph text, paragraph markup)
+    """
+    ret = []
+    start = 0
+    for item in text.split('\n'):
+        # empty line is sized by markup of its line break
+        rng = [start, start + (len(item) or 1)]
+        local_markup = intersect_ranges(rng, markup) if markup else []
+        ret.append((start, item, local_markup))
+        start += len(item) + 1
+    return ret
+
+
+def get_paragraph_layout(text, width, text_style, markup):
+    key = (text, width, repr(text_style), repr(markup))
+    layout = PARAGRAPH_CACHE.pop(key, None)
+    if layout is None:
+        layout = layout_paragraph(text or NONPRINTING_CHARS[0], width,
+                                  text_style, markup)
+        while len(PARAGRAPH_CACHE) >= PARAGRAPH_CACHE_SIZE:
+            PARAGRAPH_CACHE.popitem(last=False)
+    PARAGRAPH_CACHE[key] = layout
+    return layout
+
+
+def shift_layout_data(item, dx, dy, byte_shift):
+    if not item:
+        return item
+    ret = (item[0] + dx, item[1] + dy, item[2], item[3], item[4] + dy)
+    if len(item) > 5:
+        ret += (item[5] + byte_shift,)
+    return ret
+
+
+def get_text_paths(orig_text, width, text_style, markup):
+    if not orig_text:
+        orig_text = NONPRINTING_CHARS[0]
+        markup = []
+
+    runs = []
+    for start, text, local_markup in get_paragraphs(orig_text, markup):
+        runs.append((start, text, get_paragraph_layout(
+            text, width, text_style, local_markup)))
+
+    # Fixed width paragraph layouts already contain alignment offsets
+    # of lines, point text paragraphs are aligned to widest paragraph
+    x0 = min([run[2][4][0] for run in runs])
+    x1 = max([run[2][4][0] + run[2][4][2] for run in runs])
+    factor = 0.0
+    if width == -1:
+        if text_style[3] == sk2const.TEXT_ALIGN_CENTER:
+            factor = 0.5
+        elif text_style[3] == sk2const.TEXT_ALIGN_RIGHT:
+            factor = 1.0
+
+    glyphs = []
+    line_points = []
+    layout_data = []
+    clusters = []
+    top = 0.0
+    byte_shift = 0
+    first_baseline = runs[0][2][4][4]
+    for index, (start, text, layout) in enumerate(runs):
+        run_glyphs, run_points, run_data, run_clusters, extents = layout
+        dx = factor * ((x1 - x0) - extents[2])
+        dy = first_baseline - extents[4] - top
+        last = None
+        trafo = [1.0, 0.0, 0.0, 1.0, dx, dy]
+
+        for item in run_points:
+            line_points.append([0.0, item[1] + dy])
+        if text:
+            for item in run_glyphs:
+                if item:
+                    item = libcairo.apply_trafo(item, trafo, True)
+                glyphs.append(item)
+            for item in run_data:
+                item = shift_layout_data(item, dx, dy, byte_shift)
+                layout_data.append(item)
+                last = item or last
+            for item in run_clusters:
+                clusters.append((item[0] + start, item[1] + start))
+
+        byte_shift += len(text.encode('utf-8'))
+        if index < len(runs) - 1:
+            # line break is placed at the end of paragraph
+            if text and last:
+                item = last
+                x = item[0] + item[2]
+            else:
+                item = shift_layout_data(run_data[0], dx, dy, byte_shift)
+                x = item[0]
+            item = (x, item[1], 0.0, item[3], item[4]) + \
+                   ((byte_shift,) if len(item) > 5 else ())
+            glyphs.append(None)
+            layout_data.append(item)
+            byte_shift += 1
+        top += extents[3]
+
+    w = math.ceil(x1) - math.floor(x0)
+    h = math.ceil(top)
     layout_bbox = [0.0, layout_data[0][1],
                    float(w), layout_data[0][1] - float(h)]
 
-    return glyphs, line_points, log_layout_data, layout_bbox, clusters
+    return glyphs, line_points, layout_data, layout_bbox, clusters
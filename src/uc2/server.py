@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright (C) 2018 by Igor E. Novikov
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Resident conversion server.
+
+Server keeps initialized application (config, color management and
+format modules) and converts documents posted over HTTP on localhost
+TCP port or Unix socket:
+
+POST /convert?to=<saver id>[&from=<loader id>]
+    Request body is source document, response body is converted
+    document. Loader is detected by content (which takes extra time)
+    if it is not provided.
+GET /status
+    JSON statistics of worker process which serves request.
+
+X-Load-Time, X-Save-Time and X-Conversion-Time response headers
+report request timing in milliseconds.
+
+Requests are served by pre-forked worker processes which share
+listening socket, so every worker keeps its color transforms and
+caches warm between requests. Worker which dies is replaced.
+"""
+
+import BaseHTTPServer
+import SocketServer
+import httplib
+import inspect
+import json
+import logging
+import multiprocessing
+import os
+import select
+import signal
+import socket
+import tempfile
+import time
+import urllib
+import urlparse
+from StringIO import StringIO
+
+from uc2 import events, msgconst, uc2const
+from uc2.formats import get_loader, get_loader_by_id, get_saver_by_id
+
+LOG = logging.getLogger(__name__)
+
+HOST = '127.0.0.1'
+PORT = 8765
+
+# idle keep-alive connection is closed after timeout (in seconds)
+KEEP_ALIVE_TIMEOUT = 2.0
+
+
+class ConversionError(Exception):
+    """
+    Conversion failure with HTTP status code.
+    """
+
+    def __init__(self, code, msg):
+        Exception.__init__(self, msg)
+        self.code = code
+
+
+class OutputBuffer(StringIO):
+    """
+    Output stream which keeps data after closing by saver.
+    """
+
+    def close(self):
+        pass
+
+
+def accepts_fileptr(func):
+    """
+    Checks that loader or saver can work with file object
+    (some of them work with file names only).
+    """
+    try:
+        return 'fileptr' in inspect.getargspec(func).args
+    except TypeError:
+        return False
+
+
+def write_temp_file(data, ext=''):
+    fd, path = tempfile.mkstemp(suffix=ext and '.' + ext)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+    return path
+
+
+class StreamConverter(object):
+    """
+    Converts documents from strings using loaders and savers of
+    initialized application.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.messages = []
+        self.requests = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        events.connect(events.MESSAGES, self.collect)
+
+    def collect(self, msg_type, msg):
+        if msg_type == msgconst.ERROR:
+            self.messages.append(msg)
+
+    def detect_loader(self, data):
+        path = write_temp_file(data)
+        try:
+            return get_loader(path, return_id=True)
+        finally:
+            os.remove(path)
+
+    def load(self, loader, loader_id, data, temp_files, **kw):
+        if accepts_fileptr(loader):
+            return loader(self.app.appdata, None, fileptr=StringIO(data),
+                          **kw)
+        ext = uc2const.FORMAT_EXTENSION[loader_id][0]
+        path = write_temp_file(data, ext)
+        temp_files.append(path)
+        return loader(self.app.appdata, path, **kw)
+
+    def save(self, saver, saver_id, doc, temp_files, **kw):
+        if accepts_fileptr(saver):
+            fileptr = OutputBuffer()
+            saver(doc, None, fileptr=fileptr, **kw)
+            return fileptr.getvalue()
+        ext = uc2const.FORMAT_EXTENSION[saver_id][0]
+        path = write_temp_file('', ext)
+        temp_files.append(path)
+        saver(doc, path, **kw)
+        with open(path, 'rb') as fileptr:
+            return fileptr.read()
+
+    def convert(self, data, saver_id, loader_id=None):
+        """
+        Returns (output data, load seconds, save seconds).
+        """
+        saver_ids = uc2const.PALETTE_SAVERS + uc2const.MODEL_SAVERS + \
+                    uc2const.BITMAP_SAVERS
+        if saver_id not in saver_ids:
+            raise ConversionError(400, 'Unknown output format "%s"' % saver_id)
+        if loader_id is None:
+            loader, loader_id = self.detect_loader(data)
+            if loader is None:
+                raise ConversionError(415, 'Input format is unsupported')
+        elif loader_id in uc2const.LOADER_FORMATS:
+            loader = get_loader_by_id(loader_id)
+        else:
+            raise ConversionError(400, 'Unknown input format "%s"' % loader_id)
+
+        start = time.time()
+        del self.messages[:]
+        # loaders and savers without file object support use temp files
+        temp_files = []
+        try:
+            saver = get_saver_by_id(saver_id)
+            palettes = loader_id in uc2const.PALETTE_LOADERS and \
+                       saver_id in uc2const.PALETTE_SAVERS
+            if palettes:
+                doc = self.load(loader, loader_id, data, temp_files,
+                                convert=True)
+            else:
+                doc = self.load(loader, loader_id, data, temp_files)
+            if doc is None:
+                raise ValueError('Error creating model')
+            loaded = time.time()
+            try:
+                if palettes:
+                    output = self.save(saver, saver_id, doc, temp_files,
+                                       translate=False, convert=True)
+                else:
+                    output = self.save(saver, saver_id, doc, temp_files)
+            finally:
+                doc.close()
+        except Exception as e:
+            LOG.error('Cannot convert %s into %s %s', loader_id, saver_id, e)
+            self.update_stats(time.time() - start, True)
+            msg = '; '.join(self.messages + [str(e) or e.__class__.__name__])
+            raise ConversionError(422, msg)
+        finally:
+            for path in temp_files:
+                if os.path.exists(path):
+                    os.remove(path)
+        saved = time.time()
+        self.update_stats(saved - start)
+        return output, loaded - start, saved - loaded
+
+    def update_stats(self, seconds, error=False):
+        self.requests += 1
+        self.errors += int(error)
+        self.total_time += seconds
+        self.max_time = max(self.max_time, seconds)
+
+    def get_status(self):
+        mean = self.total_time / self.requests if self.requests else 0.0
+        return {'pid': os.getpid(),
+                'requests': self.requests,
+                'errors': self.errors,
+                'mean_ms': round(mean * 1000.0, 3),
+                'max_ms': round(self.max_time * 1000.0, 3)}
+
+
+class ConversionHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    server_version = 'UniConvertor/%s' % uc2const.VERSION
+    protocol_version = 'HTTP/1.1'
+    # worker serves one connection at a time, so idle keep-alive
+    # connection cannot hold it longer than timeout
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    def address_string(self):
+        if isinstance(self.client_address, tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def log_message(self, fmt, *args):
+        LOG.info('%s %s', self.address_string(), fmt % args)
+
+    def send_data(self, code, data, content_type, headers=None):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        # keep-alive connection is closed if other clients are waiting
+        if self.server.has_pending():
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if not urlparse.urlparse(self.path).path == '/status':
+            self.send_data(404, 'Not found', 'text/plain')
+            return
+        status = json.dumps(self.server.converter.get_status())
+        self.send_data(200, status, 'application/json')
+
+    def do_POST(self):
+        url = urlparse.urlparse(self.path)
+        data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not url.path == '/convert':
+            self.send_data(404, 'Not found', 'text/plain')
+            return
+        query = dict(urlparse.parse_qsl(url.query))
+        start = time.time()
+        try:
+            data, load_time, save_time = self.server.converter.convert(
+                data, query.get('to', ''), query.get('from'))
+        except ConversionError as e:
+            self.send_data(e.code, str(e), 'text/plain')
+            return
+        headers = {
+            'X-Load-Time': '%.3f' % (load_time * 1000.0),
+            'X-Save-Time': '%.3f' % (save_time * 1000.0),
+            'X-Conversion-Time': '%.3f' % ((time.time() - start) * 1000.0),
+        }
+        self.send_data(200, data, 'application/octet-stream', headers)
+
+
+def has_pending(server):
+    """
+    Checks that listening socket has connections waiting for accept.
+    """
+    try:
+        return bool(select.select([server.socket], [], [], 0)[0])
+    except (select.error, socket.error):
+        return False
+
+
+class TCPServer(BaseHTTPServer.HTTPServer):
+    allow_reuse_address = True
+    has_pending = has_pending
+
+
+class UnixServer(SocketServer.UnixStreamServer):
+    has_pending = has_pending
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        SocketServer.UnixStreamServer.server_bind(self)
+
+
+def create_server(app, address):
+    """
+    Creates server for (host, port) pair or Unix socket path.
+    """
+    if isinstance(address, tuple):
+        server = TCPServer(address, ConversionHandler)
+    else:
+        server = UnixServer(address, ConversionHandler)
+    server.converter = StreamConverter(app)
+    return server
+
+
+def serve(app, address, workers=0):
+    """
+    Serves requests till process is interrupted.
+    workers - number of worker processes: 0 - requests are served
+    by current process, -1 - one worker per CPU
+    """
+    server = create_server(app, address)
+    if workers < 0:
+        workers = multiprocessing.cpu_count()
+    if not hasattr(os, 'fork'):
+        workers = 0
+    LOG.info('Conversion server is listening on %s', address)
+    if not workers:
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+        return
+
+    children = set()
+    try:
+        while True:
+            while len(children) < workers:
+                pid = os.fork()
+                if not pid:
+                    signal.signal(signal.SIGINT, signal.SIG_DFL)
+                    try:
+                        server.serve_forever()
+                    finally:
+                        os._exit(0)
+                children.add(pid)
+            pid, status = os.wait()
+            if pid in children:
+                children.remove(pid)
+                LOG.warn('Server worker %d is exited (%d), restarting',
+                         pid, status)
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        server.server_close()
+
+
+class UnixHTTPConnection(httplib.HTTPConnection):
+
+    def __init__(self, path, timeout=None):
+        httplib.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class ConversionClient(object):
+    """
+    Client of conversion server for (host, port) pair or Unix socket
+    path. Connection is kept open between requests.
+    """
+
+    def __init__(self, address=(HOST, PORT), timeout=None):
+        self.address = address
+        self.timeout = timeout
+        self.conn = None
+
+    def get_connection(self):
+        if self.conn is None:
+            if isinstance(self.address, tuple):
+                self.conn = httplib.HTTPConnection(
+                    self.address[0], self.address[1], timeout=self.timeout)
+            else:
+                self.conn = UnixHTTPConnection(self.address, self.timeout)
+        return self.conn
+
+    def request(self, method, url, data=None):
+        # server closes idle keep-alive connections, so request failed
+        # on reused connection is repeated on new one
+        reused = self.conn is not None and self.conn.sock is not None
+        try:
+            return self.send_request(method, url, data)
+        except (httplib.HTTPException, socket.error):
+            if not reused:
+                raise
+        return self.send_request(method, url, data)
+
+    def send_request(self, method, url, data=None):
+        conn = self.get_connection()
+        try:
+            conn.request(method, url, data)
+            response = conn.getresponse()
+            return response, response.read()
+        except (httplib.HTTPException, socket.error):
+            self.close()
+            raise
+
+    def convert(self, data, saver_id, loader_id=None):
+        """
+        Returns (output data, timing dict) where timing contains
+        'load', 'save' and 'conversion' server times in milliseconds.
+        Raises ConversionError if document is not converted.
+        """
+        query = {'to': saver_id}
+        if loader_id:
+            query['from'] = loader_id
+        url = '/convert?' + urllib.urlencode(query)
+        response, output = self.request('POST', url, data)
+        if not response.status == 200:
+            raise ConversionError(response.status, output)
+        timing = {}
+        for name in ('load', 'save', 'conversion'):
+            value = response.getheader('X-%s-Time' % name.capitalize())
+            timing[name] = float(value) if value else 0.0
+        return output, timing
+
+    def get_status(self):
+        return json.loads(self.request('GET', '/status')[1])
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -29,6 +29,11 @@ SK2IMG_TAG = '<image y="0.0"  x="0.0" xlink:href="data:image/png;base64,'
 SK2IMG_TAG_END = '"  height="%d" width="%d" />'
 SK2DOC_START = '<!-- Encapsulated SK2'
 
+# Binary SK2 container: header line, zlib compressed record chunks,
+# raw bitmap chunks, chunk index and trailer with index offset/size.
+SK2BIN_ID = '##sK1 2 binary '
+SK2BIN_TRAILER = '<QQ'
+
 DOC_ORIGIN_CENTER = 0
 DOC_ORIGIN_LL = 1
 DOC_ORIGIN_LU = 2
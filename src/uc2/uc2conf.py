@@ -35,6 +35,7 @@ class UCData:
     app_config = ''
     app_config_dir = ''
     app_color_profile_dir = ''
+    app_proof_cache_dir = ''
 
     def __init__(self, app, cfgdir='~', check=True):
 
@@ -58,6 +59,12 @@ class UCData:
         if not fsutils.lexists(self.app_color_profile_dir):
             fsutils.makedirs(self.app_color_profile_dir)
 
+        # Check compiled proofing transforms directory
+        self.app_proof_cache_dir = os.path.join(self.app_config_dir,
+                                                'proof_cache')
+        if not fsutils.lexists(self.app_proof_cache_dir):
+            fsutils.makedirs(self.app_proof_cache_dir)
+
         from uc2.cms import libcms
 
         for item in uc2const.COLORSPACES + [uc2const.COLOR_DISPLAY, ]:
@@ -100,6 +107,32 @@ class UCConfig(SerializedConfig):
     cms_proof_for_spot = False
     cms_bpc_flag = False
     cms_bpt_flag = False
+    # threads for bitmap color transforms: 0 - per CPU core
+    cms_bitmap_threads = 0
+    # compiled proofing transforms are saved into config directory
+    cms_proof_cache = True
+
+    # ============== EXPORT SECTION ===================
+
+    # processes for multi-page PDF export: 0 - disabled, -1 - per CPU core
+    # (command line conversion only)
+    pdf_export_workers = 0
+    # text in PDF: True - embedded font subsets, False - curves
+    pdf_embed_fonts = True
+
+    # ============== BATCH SECTION ===================
+
+    # processes for batch conversion: 0 - disabled, -1 - per CPU core
+    batch_workers = -1
+    # per-file conversion timeout in seconds, 0 - no limit
+    batch_timeout = 0
+    # files converted by worker process before restart, 0 - no limit
+    batch_worker_files = 500
+
+    # ============== SERVER SECTION ===================
+
+    # processes serving conversions: 0 - main process, -1 - per CPU core
+    server_workers = -1
 
     def __init__(self): pass
 
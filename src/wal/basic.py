@@ -38,6 +38,11 @@ def stock_cursor(cursor_id):
     return wx.StockCursor(cursor_id)
 
 
+def call_after(callback, *args):
+    """Schedules callback in main loop. Can be used from any thread."""
+    wx.CallAfter(callback, *args)
+
+
 class Application(wx.App):
     app_name = None
 
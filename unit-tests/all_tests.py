@@ -19,10 +19,18 @@ import unittest
 import cms_testsuite
 import _libimg_testsuite
 import image_testsuite
+import libgeom_testsuite
+import libpango_testsuite
+import pdf_testsuite
+import sk2_testsuite
 
 suite = unittest.TestSuite()
 suite.addTest(cms_testsuite.get_suite())
 suite.addTest(_libimg_testsuite.get_suite())
 suite.addTest(image_testsuite.get_suite())
+suite.addTest(libgeom_testsuite.get_suite())
+suite.addTest(libpango_testsuite.get_suite())
+suite.addTest(pdf_testsuite.get_suite())
+suite.addTest(sk2_testsuite.get_suite())
 
 unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Performance benchmarks runner.
+Usage: python benchmark.py [benchmark_name ...]
+Without arguments all benchmarks are executed.
+"""
+
+import sys
+from importlib import import_module
+
+BENCHMARKS = [
+	'sk2_loading',
+	'pdf_export',
+	'text_layout',
+	'canvas_pan',
+	'lod_rendering',
+	'batch_conversion',
+	'conversion_server',
+	'image_import',
+	'cms_bitmap_transform',
+	'packed_paths',
+]
+
+names = sys.argv[1:] or BENCHMARKS
+for name in names:
+	print '=== %s' % name
+	import_module('benchmarks.' + name).run()
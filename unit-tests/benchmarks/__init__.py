@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+def timeit(func, *args, **kw):
+	"""Returns (best time in seconds, result) of several func calls."""
+	repeat = kw.pop('repeat', 3)
+	best = None
+	ret = None
+	for i in range(repeat):
+		start = time.time()
+		ret = func(*args, **kw)
+		elapsed = time.time() - start
+		if best is None or elapsed < best:
+			best = elapsed
+	return best, ret
+
+def report(name, *columns):
+	print '%-40s' % name + ''.join(['%16s' % item for item in columns])
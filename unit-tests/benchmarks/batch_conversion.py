@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares conversion of many small SVG drawings by separate
+uniconvertor process per file with batch conversion in current
+process and by worker pool.
+"""
+
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from uc2 import cms
+from uc2.application import UCApplication
+from uc2.batch import BatchConverter, get_jobs
+
+from benchmarks import timeit, report
+
+FILES = 50
+SHAPES = 200
+WORKERS = [0, -1]
+LAUNCHER = 'import sys; sys.path.insert(0, %r); import uc2; uc2.uc2_run()'
+
+def generate_svg(rnd):
+	items = []
+	for i in range(SHAPES):
+		items.append('<rect x="%.2f" y="%.2f" width="%.2f" height="%.2f" '
+			'fill="#%06x"/>' % (rnd.uniform(0, 500), rnd.uniform(0, 500),
+			rnd.uniform(1, 50), rnd.uniform(1, 50), rnd.randint(0, 0xffffff)))
+	return '<?xml version="1.0" encoding="UTF-8"?>\n' \
+		'<svg xmlns="http://www.w3.org/2000/svg" width="500" ' \
+		'height="500">\n%s\n</svg>\n' % '\n'.join(items)
+
+def convert_by_processes(jobs):
+	path = os.path.dirname(os.path.dirname(os.path.abspath(
+		sys.modules['uc2'].__file__)))
+	for src, dst in jobs:
+		subprocess.call([sys.executable, '-c', LAUNCHER % path, src, dst])
+
+def run():
+	app = UCApplication()
+	app.default_cms = cms.ColorManager()
+	dirpath = tempfile.mkdtemp()
+	rnd = random.Random(1)
+	for i in range(FILES):
+		filepath = os.path.join(dirpath, 'drawing%d.svg' % i)
+		open(filepath, 'wb').write(generate_svg(rnd))
+	jobs = get_jobs([os.path.join(dirpath, '*.svg')],
+		output_dir=dirpath, saver_id='pdf')
+	report('mode', 's', 'ms/file')
+	elapsed = timeit(convert_by_processes, jobs, repeat=1)[0]
+	report('process per file', '%.2f' % elapsed,
+		'%.1f' % (elapsed * 1000.0 / FILES))
+	for workers in WORKERS:
+		converter = BatchConverter(app, 'pdf', workers)
+		elapsed = timeit(converter.run, jobs)[0]
+		report('batch, %d workers' % workers, '%.2f' % elapsed,
+			'%.1f' % (elapsed * 1000.0 / FILES))
+	shutil.rmtree(dirpath)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measures canvas frame time for pan sequences on large documents:
+full document redraw on every frame against reuse of already
+rendered backing surface.
+"""
+
+import cairo
+import random
+
+import sk1
+from sk1.app_conf import get_app_config
+from uc2 import cms, sk2const, uc2const
+from uc2.application import UCApplication
+from uc2.formats.sk2 import sk2_model
+from uc2.formats.sk2.sk2_presenter import SK2_Presenter
+
+from benchmarks import timeit, report
+
+SIZES = [10000, 50000]
+WINDOW = (1200, 800)
+ZOOM = 4.0
+STEPS = 40
+STEP = 7
+
+class View(object):
+	"""Canvas subset used by document renderer."""
+
+	draft_view = False
+	stroke_view = False
+
+	def __init__(self, presenter, size):
+		self.presenter = presenter
+		self.width, self.height = size
+		self.zoom = ZOOM
+		self.set_trafo([ZOOM, 0.0, 0.0, -ZOOM,
+			self.width / 2.0, self.height / 2.0])
+
+	def get_size(self):
+		return self.width, self.height
+
+	@property
+	def dc(self):
+		return self
+
+	def set_trafo(self, trafo):
+		self.trafo = trafo
+		self.matrix = cairo.Matrix(*trafo)
+
+	def scroll(self, dx, dy):
+		m11, m12, m21, m22, x0, y0 = self.trafo
+		self.set_trafo([m11, m12, m21, m22, x0 + dx, y0 + dy])
+
+	def doc_to_win(self, point):
+		m11, m12, m21, m22, dx, dy = self.trafo
+		return [m11 * point[0] + dx, m22 * point[1] + dy]
+
+	def win_to_doc(self, point):
+		m11, m12, m21, m22, dx, dy = self.trafo
+		return [(point[0] - dx) / m11, (point[1] - dy) / m22]
+
+	def point_doc_to_win(self, point):
+		return self.doc_to_win(point)
+
+	def bbox_doc_to_win(self, bbox):
+		x0, y0 = self.doc_to_win(bbox[:2])
+		x1, y1 = self.doc_to_win(bbox[2:])
+		return [min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)]
+
+	def bbox_win_to_doc(self, bbox):
+		x0, y0 = self.win_to_doc(bbox[:2])
+		x1, y1 = self.win_to_doc(bbox[2:])
+		return [min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)]
+
+class Presenter(SK2_Presenter):
+
+	def get_page_size(self, page=None):
+		return (page or self.active_page).page_format[1]
+
+def random_paths(rnd, x, y):
+	points = []
+	for j in range(rnd.randint(3, 12)):
+		points.append([x + rnd.uniform(0, 20), y + rnd.uniform(0, 20)])
+	return [[[x, y], points, sk2const.CURVE_CLOSED]]
+
+def generate_document(app, size, seed=1):
+	rnd = random.Random(seed)
+	doc = Presenter(app.appdata)
+	config = doc.config
+	doc.active_page = doc.methods.get_page()
+	layer = doc.methods.get_layer(doc.active_page)
+	w, h = doc.active_page.page_format[1]
+	for i in range(size):
+		color = [uc2const.COLOR_RGB, [rnd.random() for k in range(3)],
+			1.0, '']
+		style = [[sk2const.FILL_EVENODD, sk2const.FILL_SOLID, color],
+			[] + config.default_stroke, [], []]
+		x, y = rnd.uniform(-w / 2.0, w / 2.0), rnd.uniform(-h / 2.0, h / 2.0)
+		if i % 2:
+			obj = sk2_model.Rectangle(config, layer,
+				[x, y, rnd.uniform(1, 20), rnd.uniform(1, 20)], style=style)
+		else:
+			obj = sk2_model.Curve(config, layer, random_paths(rnd, x, y),
+				style=style)
+		layer.childs.append(obj)
+	doc.update()
+	return doc
+
+def pan(renderer, view, invalidate):
+	renderer.paint_document()
+	for i in range(STEPS):
+		view.scroll(STEP if i % 8 < 6 else 0, STEP if i % 8 > 3 else 0)
+		if invalidate:
+			renderer.invalidate()
+		renderer.paint_document()
+
+def run():
+	sk1.config = get_app_config()
+	from sk1.document.renderer import PDRenderer
+	app = UCApplication()
+	app.default_cms = cms.ColorManager()
+	report('document', 'full, ms/frame', 'blit, ms/frame', 'speedup')
+	for size in SIZES:
+		doc = generate_document(app, size)
+		view = View(doc, WINDOW)
+		renderer = PDRenderer(view)
+		full = timeit(pan, renderer, view, True)[0] * 1000.0 / STEPS
+		view = View(doc, WINDOW)
+		renderer = PDRenderer(view)
+		blit = timeit(pan, renderer, view, False)[0] * 1000.0 / STEPS
+		report('%d objects' % size, '%.1f' % full, '%.1f' % blit,
+			'%.1fx' % (full / blit))
+		doc.close()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measures RGB to CMYK bitmap color transform of large images
+with different number of transform threads.
+"""
+
+import multiprocessing
+
+from PIL import Image
+
+from uc2 import uc2const
+from uc2.cms import libcms
+
+from benchmarks import timeit, report
+
+MEGAPIXELS = [4, 25, 100]
+
+def get_threads():
+	cpus = multiprocessing.cpu_count()
+	ret = [item for item in (1, 2, 4, 8) if item < cpus]
+	return ret + [cpus]
+
+def transform(trafo, image):
+	return libcms.cms_do_bitmap_transform(trafo, image,
+		uc2const.TYPE_RGB_8, uc2const.TYPE_CMYK_8)
+
+def run():
+	rgb = libcms.cms_create_srgb_profile()
+	cmyk = libcms.cms_create_cmyk_profile()
+	trafo = libcms.cms_create_transform(rgb, uc2const.TYPE_RGBA_8,
+		cmyk, uc2const.TYPE_CMYK_8, uc2const.INTENT_PERCEPTUAL,
+		uc2const.cmsFLAGS_NOTPRECALC)
+	threads = get_threads()
+	report('image', *['%d thr, s' % item for item in threads])
+	for megapixels in MEGAPIXELS:
+		side = int((megapixels * 1000000) ** 0.5)
+		image = Image.radial_gradient('L').resize((side, side))
+		image = Image.merge('RGB', (image, image.transpose(
+			Image.ROTATE_90), image.transpose(Image.FLIP_LEFT_RIGHT)))
+		columns = []
+		for item in threads:
+			libcms.cms_set_bitmap_threads(item)
+			repeat = 1 if megapixels > 25 else 3
+			columns.append('%.3f' % timeit(transform, trafo, image,
+				repeat=repeat)[0])
+		report('%d MP RGB to CMYK' % megapixels, *columns)
+	libcms.cms_set_bitmap_threads(1)
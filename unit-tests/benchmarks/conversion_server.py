@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Load test of conversion server: concurrent clients post small SVG
+snippets over Unix socket, request latency and throughput
+are measured.
+"""
+
+import os
+import random
+import shutil
+import signal
+import tempfile
+import threading
+import time
+
+from uc2 import cms
+from uc2.application import UCApplication
+from uc2.server import ConversionClient, serve
+
+from benchmarks import report
+
+SNIPPETS = 20
+SHAPES = 30
+REQUESTS = 200
+CLIENTS = [1, 4, 16]
+FORMATS = ['svg', 'pdf', 'png']
+
+def generate_svg(rnd):
+	items = []
+	for i in range(SHAPES):
+		items.append('<circle cx="%.2f" cy="%.2f" r="%.2f" fill="#%06x"/>' %
+			(rnd.uniform(0, 200), rnd.uniform(0, 200), rnd.uniform(1, 20),
+			rnd.randint(0, 0xffffff)))
+	return '<?xml version="1.0" encoding="UTF-8"?>\n' \
+		'<svg xmlns="http://www.w3.org/2000/svg" width="200" ' \
+		'height="200">\n%s\n</svg>\n' % '\n'.join(items)
+
+def start_server(app, address):
+	pid = os.fork()
+	if not pid:
+		try:
+			serve(app, address, -1)
+		finally:
+			os._exit(0)
+	for i in range(100):
+		if os.path.exists(address):
+			break
+		time.sleep(0.05)
+	return pid
+
+def load(address, snippets, saver_id, clients):
+	latencies = []
+
+	def work(num):
+		client = ConversionClient(address)
+		for i in range(num):
+			start = time.time()
+			client.convert(snippets[i % len(snippets)], saver_id, 'svg')
+			latencies.append(time.time() - start)
+		client.close()
+
+	threads = [threading.Thread(target=work, args=(REQUESTS // clients,))
+		for i in range(clients)]
+	start = time.time()
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	return sorted(latencies), time.time() - start
+
+def run():
+	app = UCApplication()
+	app.default_cms = cms.ColorManager()
+	dirpath = tempfile.mkdtemp()
+	address = os.path.join(dirpath, 'uc2.sock')
+	rnd = random.Random(1)
+	snippets = [generate_svg(rnd) for i in range(SNIPPETS)]
+	pid = start_server(app, address)
+	try:
+		report('format, clients', 'p50, ms', 'p95, ms', 'requests/s')
+		for saver_id in FORMATS:
+			for clients in CLIENTS:
+				latencies, elapsed = load(address, snippets, saver_id,
+					clients)
+				report('%s, %d' % (saver_id, clients),
+					'%.1f' % (latencies[len(latencies) // 2] * 1000.0),
+					'%.1f' % (latencies[len(latencies) * 95 // 100] * 1000.0),
+					'%.0f' % (len(latencies) / elapsed))
+	finally:
+		os.kill(pid, signal.SIGINT)
+		os.waitpid(pid, 0)
+		shutil.rmtree(dirpath)
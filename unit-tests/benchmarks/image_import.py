@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares single-decode image import with legacy pipeline
+(MagickWand environment per image, PNG/TIFF re-encoding and
+decoding by PIL) on generated photos.
+"""
+
+import random
+from copy import deepcopy
+from cStringIO import StringIO
+from PIL import Image
+
+from uc2 import cms, libimg
+from uc2.application import UCApplication
+from uc2.formats.sk2.sk2_config import SK2_Config
+from uc2.formats.sk2 import sk2_model
+from uc2.libimg import _libimg
+
+from benchmarks import timeit, report
+
+PHOTOS = 50
+SIZE = (1200, 900)
+MODES = ['RGB', 'CMYK', 'RGBA']
+
+def legacy_set_image_data(cms, pixmap, raw_content):
+	profile = mode = None
+	img = Image.open(StringIO(raw_content))
+	if 'icc_profile' in img.info:
+		profile, mode = img.info['icc_profile'], img.mode
+	_libimg.init_magick()
+	wand = _libimg.new_image()
+	_libimg.load_image_blob(wand, raw_content)
+	image_type = _libimg.get_image_type(wand)
+	alpha_stream = None
+	if image_type in libimg.magickwand.ALPHA_TYPES:
+		alpha_wand = _libimg.clone_image(wand)
+		_libimg.remove_alpha_channel(wand)
+		_libimg.set_image_format(alpha_wand, 'png')
+		_libimg.set_image_type(alpha_wand, libimg.magickwand.RGBA_TYPE)
+		alpha_stream = StringIO(_libimg.get_image_blob(alpha_wand))
+	if image_type in libimg.magickwand.CMYK_TYPES:
+		_libimg.set_image_format(wand, 'tiff')
+	else:
+		_libimg.set_image_format(wand, 'png')
+	base_image = Image.open(StringIO(_libimg.get_image_blob(wand)))
+	base_image.load()
+	_libimg.terminate_magick()
+	if profile and base_image.mode == mode:
+		base_image = cms.adjust_image(base_image, profile)
+	fobj = StringIO()
+	base_image.save(fobj, format=libimg._get_saver_fmt(base_image))
+	pixmap.bitmap = fobj.getvalue()
+	pixmap.alpha_channel = ''
+	if alpha_stream:
+		alpha_image = Image.open(alpha_stream)
+		fobj = StringIO()
+		alpha_image.split()[3].save(fobj, format='PNG')
+		pixmap.alpha_channel = fobj.getvalue()
+	pixmap.colorspace = base_image.mode
+	pixmap.style = deepcopy(pixmap.config.default_image_style)
+
+def generate_photo(rnd, mode):
+	image = Image.radial_gradient('L').resize(SIZE)
+	noise = Image.effect_noise(SIZE, rnd.uniform(20, 60))
+	bands = [image, noise, Image.blend(image, noise, rnd.random())]
+	image = Image.merge('RGB', bands)
+	fobj = StringIO()
+	if mode == 'RGBA':
+		image.putalpha(noise)
+		image.save(fobj, format='PNG')
+	else:
+		image.convert(mode).save(fobj, format='JPEG', quality=90)
+	return fobj.getvalue()
+
+def import_photos(func, color_manager, photos):
+	config = SK2_Config()
+	for data in photos:
+		func(color_manager, sk2_model.Pixmap(config), data)
+
+def run():
+	app = UCApplication()
+	app.default_cms = cms.ColorManager()
+	color_manager = cms.ColorManager()
+	rnd = random.Random(1)
+	report('photos', 'legacy, s', 'single decode, s', 'speedup')
+	for mode in MODES:
+		photos = [generate_photo(rnd, mode) for i in range(PHOTOS)]
+		legacy = timeit(import_photos, legacy_set_image_data,
+			color_manager, photos)[0]
+		current = timeit(import_photos, libimg.set_image_data,
+			color_manager, photos)[0]
+		report('%d %s' % (PHOTOS, mode), '%.2f' % legacy, '%.2f' % current,
+			'%.1fx' % (legacy / current))
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measures level-of-detail rendering on imported map-like SVG documents
+(dense contour lines and lots of tiny marks) at several zoom levels:
+full detail rendering, first LOD rendering (simplified paths are
+created) and repeated LOD rendering.
+"""
+
+import cairo
+import math
+import os
+import random
+import tempfile
+
+from uc2 import cms
+from uc2.application import UCApplication
+from uc2.formats.svg import svg_loader
+from uc2.formats.sk2.crenderer import CairoRenderer
+
+from benchmarks import timeit, report
+
+CONTOURS = [200, 1000]
+CONTOUR_NODES = 2000
+MARKS_PER_CONTOUR = 20
+WINDOW = (1000, 800)
+ZOOMS = [0.05, 0.25, 1.0]
+
+def generate_svg(contours, seed=1):
+	rnd = random.Random(seed)
+	items = []
+	for i in range(contours):
+		cx, cy = rnd.uniform(0, 2000), rnd.uniform(0, 2000)
+		radius = rnd.uniform(20, 400)
+		points = []
+		for j in range(CONTOUR_NODES):
+			angle = 2.0 * math.pi * j / CONTOUR_NODES
+			r = radius * (1.0 + 0.1 * math.sin(7 * angle) +
+				0.02 * rnd.random())
+			points.append('%.3f,%.3f' % (cx + r * math.cos(angle),
+				cy + r * math.sin(angle)))
+		items.append('<path d="M %s Z" fill="none" stroke="#%06x"/>' %
+			(' L '.join(points), rnd.randint(0, 0xffffff)))
+		for j in range(MARKS_PER_CONTOUR):
+			items.append('<circle cx="%.2f" cy="%.2f" r="0.8" '
+				'fill="#%06x"/>' % (rnd.uniform(0, 2000),
+				rnd.uniform(0, 2000), rnd.randint(0, 0xffffff)))
+	return '<?xml version="1.0" encoding="UTF-8"?>\n' \
+		'<svg xmlns="http://www.w3.org/2000/svg" width="2000" ' \
+		'height="2000" viewBox="0 0 2000 2000">\n%s\n</svg>\n' % \
+		'\n'.join(items)
+
+def get_objects(doc):
+	ret = []
+	for layer in doc.methods.get_page().childs:
+		ret += layer.childs
+	return ret
+
+def clear_lod(objs):
+	for obj in objs:
+		if obj.is_primitive():
+			obj.cache_lod = None
+		elif obj.childs:
+			clear_lod(obj.childs)
+
+def render(doc, objs, zoom, lod):
+	width, height = WINDOW
+	surface = cairo.ImageSurface(cairo.FORMAT_RGB24, width, height)
+	ctx = cairo.Context(surface)
+	ctx.set_source_rgb(1.0, 1.0, 1.0)
+	ctx.paint()
+	ctx.set_matrix(cairo.Matrix(zoom, 0.0, 0.0, -zoom,
+		width / 2.0, height / 2.0))
+	renderer = CairoRenderer(doc.cms)
+	renderer.lod_flag = lod
+	renderer.render(ctx, objs)
+
+def render_cold(doc, objs, zoom):
+	clear_lod(objs)
+	render(doc, objs, zoom, True)
+
+def run():
+	app = UCApplication()
+	app.default_cms = cms.ColorManager()
+	filepath = tempfile.mktemp(suffix='.svg')
+	report('document, zoom', 'full, s', 'LOD cold, s', 'LOD warm, s',
+		'speedup')
+	for contours in CONTOURS:
+		open(filepath, 'wb').write(generate_svg(contours))
+		doc = svg_loader(app.appdata, filepath)
+		objs = get_objects(doc)
+		for zoom in ZOOMS:
+			full = timeit(render, doc, objs, zoom, False)[0]
+			cold = timeit(render_cold, doc, objs, zoom, repeat=1)[0]
+			warm = timeit(render, doc, objs, zoom, True)[0]
+			report('%d contours, %g' % (contours, zoom), '%.3f' % full,
+				'%.3f' % cold, '%.3f' % warm, '%.1fx' % (full / warm))
+		doc.close()
+	if os.path.exists(filepath):
+		os.remove(filepath)
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares paths lists with packed paths on million-node documents:
+memory usage and transform, bbox, reverse and flattening time.
+"""
+
+import random
+import sys
+
+from uc2 import libgeom, sk2const
+from uc2.libgeom import PackedPaths
+
+from benchmarks import timeit, report
+
+NODES = 1000000
+PATH_NODES = 1000
+# part of curve nodes in document
+DOCUMENTS = [('polylines', 0.0), ('mixed', 0.5), ('curves', 1.0)]
+TRAFO = [0.8, 0.2, -0.3, 1.2, 15.0, -7.0]
+
+def generate_paths(curves, seed=1):
+	rnd = random.Random(seed)
+	paths = []
+	for i in range(NODES // PATH_NODES):
+		start = [rnd.uniform(0, 1000), rnd.uniform(0, 1000)]
+		x, y = start
+		points = []
+		for j in range(PATH_NODES - 1):
+			dx, dy = rnd.uniform(1, 5), rnd.uniform(1, 5)
+			if rnd.random() < curves:
+				points.append([[x + dx / 3.0, y + dy / 2.0],
+					[x + dx / 2.0, y + dy * 2.0 / 3.0],
+					[x + dx, y + dy], sk2const.NODE_CUSP])
+			else:
+				points.append([x + dx, y + dy])
+			x += dx
+			y += dy
+		paths.append([start, points, sk2const.CURVE_OPENED])
+	return paths
+
+def get_size(obj):
+	ret = sys.getsizeof(obj)
+	if isinstance(obj, list):
+		ret += sum([get_size(item) for item in obj])
+	return ret
+
+def run():
+	report('document, operation', 'lists', 'packed', 'speedup')
+	for name, curves in DOCUMENTS:
+		paths = generate_paths(curves)
+		packed = PackedPaths(paths)
+		size = get_size(paths)
+		packed_size = packed.get_memory_size()
+		report('%s, MB' % name, '%.1f' % (size / 1048576.0),
+			'%.1f' % (packed_size / 1048576.0),
+			'%.1fx' % (float(size) / packed_size))
+		report('%s, pack, s' % name, '-',
+			'%.3f' % timeit(PackedPaths, paths)[0], '')
+		report('%s, unpack, s' % name, '-',
+			'%.3f' % timeit(packed.to_paths)[0], '')
+		tests = [
+			('transform', lambda: libgeom.apply_trafo_to_paths(paths, TRAFO),
+				lambda: packed.apply_trafo(TRAFO)),
+			('bbox', lambda: libgeom.get_paths_bbox(paths),
+				lambda: packed.get_bbox()),
+			('reverse', lambda: libgeom.reverse_paths(paths),
+				lambda: packed.reverse()),
+			('flatten', lambda: libgeom.flat_paths(paths, 0.5),
+				lambda: packed.flat(0.5)),
+		]
+		for operation, list_func, packed_func in tests:
+			repeat = 1 if curves and operation == 'flatten' else 3
+			list_time = timeit(list_func, repeat=repeat)[0]
+			packed_time = timeit(packed_func, repeat=repeat)[0]
+			report('%s, %s, s' % (name, operation), '%.3f' % list_time,
+				'%.3f' % packed_time, '%.1fx' % (list_time / packed_time))
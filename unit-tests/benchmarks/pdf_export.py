@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measures multi-page PDF export scaling by page count
+and number of worker processes.
+"""
+
+import multiprocessing
+import os
+import random
+import tempfile
+from copy import deepcopy
+from cStringIO import StringIO
+
+from PIL import Image
+
+from uc2 import cms, sk2const, uc2const
+from uc2.application import UCApplication
+from uc2.formats.pdf import pdf_saver
+from uc2.formats.sk2 import sk2_model
+from uc2.formats.sk2.sk2_presenter import SK2_Presenter
+
+from benchmarks import timeit, report
+
+PAGES = [10, 50, 200]
+OBJECTS_PER_PAGE = 300
+
+def get_workers():
+	cpus = multiprocessing.cpu_count()
+	ret = [0, ]
+	num = 2
+	while num < cpus:
+		ret.append(num)
+		num *= 2
+	if cpus > 1:
+		ret.append(cpus)
+	return ret
+
+def random_color(rnd):
+	if rnd.random() > 0.5:
+		return [uc2const.COLOR_CMYK, [rnd.random() for i in range(4)],
+			1.0, '']
+	return [uc2const.COLOR_RGB, [rnd.random() for i in range(3)], 1.0, '']
+
+def random_bitmap(rnd, size):
+	image = Image.new('RGB', (size, size))
+	image.putdata([(rnd.randint(0, 255), rnd.randint(0, 255), i % 256)
+				for i in range(size * size)])
+	fobj = StringIO()
+	image.save(fobj, format='PNG')
+	return fobj.getvalue()
+
+def fill_page(doc, layer, rnd):
+	config = doc.config
+	for i in range(OBJECTS_PER_PAGE):
+		style = [[sk2const.FILL_EVENODD, sk2const.FILL_SOLID,
+				random_color(rnd)], [] + config.default_stroke, [], []]
+		rect = [rnd.uniform(-250, 250), rnd.uniform(-350, 350),
+			rnd.uniform(1, 50), rnd.uniform(1, 50)]
+		obj = sk2_model.Rectangle(config, layer, rect, style=style)
+		layer.childs.append(obj)
+	pixmap = sk2_model.Pixmap(config, layer,
+		bitmap=random_bitmap(rnd, 256), size=(256, 256),
+		style=deepcopy(config.default_image_style))
+	pixmap.colorspace = 'RGB'
+	layer.childs.append(pixmap)
+
+def generate_document(app, pages_num, seed=1):
+	rnd = random.Random(seed)
+	doc = SK2_Presenter(app.appdata)
+	methods = doc.methods
+	for index in range(pages_num):
+		if index:
+			page = methods.add_page()
+			methods.add_layer(page)
+		else:
+			page = methods.get_page()
+		fill_page(doc, methods.get_layer(page), rnd)
+	doc.update()
+	return doc
+
+def export(doc, workers, filepath):
+	pdf_saver(doc, filepath, workers=workers)
+	return os.path.getsize(filepath)
+
+def run():
+	app = UCApplication()
+	app.default_cms = cms.ColorManager()
+	workers = get_workers()
+	fd, filepath = tempfile.mkstemp(suffix='.pdf')
+	os.close(fd)
+	report('document', *['%d proc, s' % item if item else 'serial, s'
+		for item in workers])
+	for pages_num in PAGES:
+		doc = generate_document(app, pages_num)
+		columns = []
+		serial_time = None
+		for num in workers:
+			elapsed, size = timeit(export, doc, num, filepath,
+				repeat=1)
+			if serial_time is None:
+				serial_time = elapsed
+				columns.append('%.2f' % elapsed)
+			else:
+				columns.append('%.2f (%.1fx)' % (elapsed,
+					serial_time / elapsed))
+		report('%d pages' % pages_num, *columns)
+		doc.close()
+	if os.path.exists(filepath):
+		os.remove(filepath)
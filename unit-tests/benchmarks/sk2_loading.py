@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Compares SK2 record parser with legacy exec() based loader
+on generated documents.
+"""
+
+import random
+from cStringIO import StringIO
+
+from uc2 import sk2const
+from uc2.formats.sk2 import sk2_model
+from uc2.formats.sk2.sk2_config import SK2_Config
+from uc2.formats.sk2.sk2_filters import SK2_Loader, SK2_Saver
+from uc2.formats.sk2.sk2_methods import create_new_doc
+
+from benchmarks import timeit, report
+
+SIZES = [10000, 50000]
+
+class Exec_SK2_Loader(SK2_Loader):
+	"""Reference loader which executes every record line."""
+
+	def do_load(self):
+		self.model = None
+		self.break_flag = False
+		self.parent_stack = []
+		self.fileptr.readline()
+		while not self.break_flag:
+			self.line = self.fileptr.readline().rstrip('\n')
+			if self.line:
+				code = compile('self.' + self.line, '<string>', 'exec')
+				exec code
+
+def random_paths(rnd):
+	paths = []
+	for i in range(rnd.randint(1, 3)):
+		points = []
+		for j in range(rnd.randint(3, 20)):
+			if rnd.random() > 0.5:
+				points.append([rnd.uniform(0, 500), rnd.uniform(0, 500)])
+			else:
+				points.append([[rnd.uniform(0, 500), rnd.uniform(0, 500)],
+					[rnd.uniform(0, 500), rnd.uniform(0, 500)],
+					[rnd.uniform(0, 500), rnd.uniform(0, 500)],
+					sk2const.NODE_CUSP])
+		paths.append([[rnd.uniform(0, 500), rnd.uniform(0, 500)], points,
+					sk2const.CURVE_CLOSED])
+	return paths
+
+def generate_document(size, seed=1):
+	rnd = random.Random(seed)
+	config = SK2_Config()
+	doc = create_new_doc(config)
+	layer = doc.childs[0].childs[0].childs[0]
+	style = [[sk2const.FILL_EVENODD, sk2const.FILL_SOLID,
+			sk2const.CMYK_BLACK], [] + config.default_stroke, [], []]
+	for i in range(size):
+		if i % 2:
+			rect = [rnd.uniform(0, 500), rnd.uniform(0, 500),
+				rnd.uniform(1, 50), rnd.uniform(1, 50)]
+			obj = sk2_model.Rectangle(config, layer, rect, style=style)
+		else:
+			obj = sk2_model.Curve(config, layer, random_paths(rnd),
+				style=style)
+		layer.childs.append(obj)
+	return config, save_document(doc)
+
+def save_document(doc):
+	saver = SK2_Saver()
+	saver.fileptr = StringIO()
+	saver.writeln(sk2const.SK2DOC_ID + sk2const.SK2VER)
+	saver.save_obj(doc)
+	return saver.fileptr.getvalue()
+
+def load_document(loader_class, config, data):
+	loader = loader_class()
+	loader.config = config
+	loader.fileptr = StringIO(data)
+	loader.file_size = len(data)
+	loader.do_load()
+	return loader.model
+
+def run():
+	report('document', 'size, MB', 'exec, s', 'parser, s', 'speedup')
+	for size in SIZES:
+		config, data = generate_document(size)
+		exec_time, model = timeit(load_document, Exec_SK2_Loader,
+								config, data, repeat=1)
+		parse_time, model2 = timeit(load_document, SK2_Loader,
+								config, data, repeat=1)
+		assert save_document(model) == save_document(model2)
+		report('%d objects' % size, '%.1f' % (len(data) / 1048576.0),
+			'%.2f' % exec_time, '%.2f' % parse_time,
+			'%.1fx' % (exec_time / parse_time))
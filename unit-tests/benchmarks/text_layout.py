@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Measures text layout on long mixed-script texts: without caches,
+with empty caches, with warm glyph outline cache (relayout of
+the same text) and relayout after editing of last paragraph.
+"""
+
+import random
+
+from uc2 import libpango
+from uc2.libpango import core
+
+from benchmarks import timeit, report
+
+TEXT_SIZE = 5000
+WIDTH = 500
+
+SAMPLES = {
+	'latin': u'The quick brown fox jumps over the lazy dog ',
+	'cyrillic': u'Съешь же ещё этих мягких французских булок ',
+	'greek': u'Ξεσκεπάζω την ψυχοφθόρα βδελυγμία ',
+	'arabic': u'نص حكيم له سر قاطع وذو شأن عظيم ',
+	'cjk': u'天地玄黄宇宙洪荒日月盈昃辰宿列张 ',
+}
+
+STYLES = [
+	['Sans', 'Regular', 12.0, 0, [], False],
+	['Serif', 'Regular', 10.0, 0, [], True],
+]
+
+def generate_text(names, size, seed=1):
+	rnd = random.Random(seed)
+	ret = u''
+	while len(ret) < size:
+		ret += SAMPLES[rnd.choice(names)]
+		if rnd.random() > 0.8:
+			ret += u'\n'
+	return ret[:size]
+
+def layout(text, text_style):
+	return libpango.get_text_paths(text, WIDTH, text_style, [])
+
+def relayout(text, text_style):
+	libpango.clear_paragraph_cache()
+	return layout(text, text_style)
+
+def run():
+	report('text', 'no cache, s', 'cold, s', 'warm, s', 'edit, s',
+		'hit rate')
+	cache_size = core.GLYPH_CACHE_SIZE
+	texts = [('latin', ['latin']),
+		('latin+cyrillic+greek', ['latin', 'cyrillic', 'greek']),
+		('mixed with arabic and cjk', SAMPLES.keys())]
+	for name, names in texts:
+		text = generate_text(names, TEXT_SIZE)
+		for text_style in STYLES:
+			core.GLYPH_CACHE_SIZE = 0
+			libpango.clear_glyph_cache()
+			libpango.clear_paragraph_cache()
+			nocache_time = timeit(layout, text, text_style, repeat=1)[0]
+			core.GLYPH_CACHE_SIZE = cache_size
+			libpango.clear_glyph_cache()
+			libpango.clear_paragraph_cache()
+			cold_time = timeit(layout, text, text_style, repeat=1)[0]
+			libpango.reset_glyph_cache_stats()
+			warm_time = timeit(relayout, text, text_style)[0]
+			stats = libpango.get_glyph_cache_stats()
+			edit_time = timeit(layout, text[:-1] + u'!', text_style,
+				repeat=1)[0]
+			total = stats['hits'] + stats['misses']
+			rate = 100.0 * stats['hits'] / total if total else 0.0
+			label = '%s, %s%s' % (name, text_style[0],
+				' (clusters)' if text_style[5] else '')
+			report(label, '%.2f' % nocache_time, '%.2f' % cold_time,
+				'%.2f' % warm_time, '%.2f' % edit_time, '%.1f%%' % rate)
+	core.GLYPH_CACHE_SIZE = cache_size
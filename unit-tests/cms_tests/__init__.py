@@ -452,4 +452,92 @@ class TestCmsFunctions(unittest.TestCase):
 		except libcms.CmsError:
 			self.fail()
 
+	#---Batch transformation tests
+	def test34_do_transform_many(self):
+		colors = [[0, 0, 0, 0], [255, 255, 255, 0], [100, 190, 150, 0]]
+		result = libcms.cms_do_transform_many(self.transform, colors)
+		self.assertEqual(len(colors), len(result))
+		for rgb, cmyk in zip(colors, result):
+			single = [0, 0, 0, 0]
+			libcms.cms_do_transform(self.transform, rgb, single)
+			self.assertEqual(single, cmyk)
+
+	def test35_do_transform_many_with_empty_input(self):
+		self.assertEqual([], libcms.cms_do_transform_many(self.transform, []))
+
+	def test36_do_transform_many_with_incorrect_input(self):
+		try:
+			libcms.cms_do_transform_many(self.transform, [[455, 0, 0, 0], ])
+		except libcms.CmsError:
+			return
+		self.fail()
 
+	def test37_DoBitmapTransformWithThreads(self):
+		inImage = Image.open(get_filepath('color100x100.png'))
+		inImage = inImage.resize((600, 600))
+		outImage = libcms.cms_do_bitmap_transform(self.transform2,
+							inImage, uc2const.TYPE_RGB_8, uc2const.TYPE_CMYK_8)
+		libcms.cms_set_bitmap_threads(4)
+		try:
+			threadImage = libcms.cms_do_bitmap_transform(self.transform2,
+							inImage, uc2const.TYPE_RGB_8, uc2const.TYPE_CMYK_8)
+		finally:
+			libcms.cms_set_bitmap_threads(1)
+		self.assertEqual(outImage.tobytes(), threadImage.tobytes())
+
+	#---Device link tests
+	def test38_device_link_transform(self):
+		proof = libcms.cms_create_proofing_transform(self.inProfile,
+				uc2const.TYPE_RGBA_8, self.inProfile, uc2const.TYPE_RGBA_8,
+				self.outProfile)
+		data = libcms.cms_transform_to_device_link(proof)
+		link = libcms.cms_open_profile_from_string(data)
+		transform = libcms.cms_create_device_link_transform(link,
+				uc2const.TYPE_RGBA_8, uc2const.TYPE_RGBA_8)
+		for color in ([0, 0, 0, 0], [255, 255, 255, 0], [100, 190, 150, 0]):
+			expected = libcms.cms_do_transform_many(proof, [color])[0]
+			result = libcms.cms_do_transform_many(transform, [color])[0]
+			for val1, val2 in zip(expected[:3], result[:3]):
+				self.assertTrue(abs(val1 - val2) <= 2)
+
+	def test39_get_profile_data(self):
+		data = libcms.cms_get_profile_data(self.inProfile)
+		profile = libcms.cms_open_profile_from_string(data)
+		self.assertEqual(libcms.cms_get_profile_name(self.inProfile),
+				libcms.cms_get_profile_name(profile))
+
+	def check_transform_many(self, transform, colors, in_mode, out_mode):
+		result = libcms.cms_do_transform_many(transform, colors,
+											in_mode, out_mode)
+		self.assertEqual(len(colors), len(result))
+		for color, values in zip(colors, result):
+			single = [0, 0, 0, 0]
+			libcms.cms_do_transform(transform, [] + color, single)
+			size = libcms.get_pixel_size(out_mode)
+			self.assertEqual(single[:size], values[:size])
+
+	def test40_do_transform_many_gray_to_rgb(self):
+		transform = libcms.cms_create_transform(
+						libcms.cms_create_gray_profile(), uc2const.COLOR_GRAY,
+						self.inProfile, uc2const.TYPE_RGB_8)
+		colors = [[0, 0, 0, 0], [255, 0, 0, 0], [100, 0, 0, 0], [37, 0, 0, 0]]
+		self.check_transform_many(transform, colors,
+								uc2const.COLOR_GRAY, uc2const.TYPE_RGB_8)
+
+	def test41_do_transform_many_rgb_to_gray(self):
+		transform = libcms.cms_create_transform(self.inProfile,
+						uc2const.TYPE_RGB_8, libcms.cms_create_gray_profile(),
+						uc2const.COLOR_GRAY)
+		colors = [[0, 0, 0, 0], [255, 255, 255, 0], [100, 190, 150, 0],
+				[255, 0, 0, 0], [0, 0, 255, 0]]
+		self.check_transform_many(transform, colors,
+								uc2const.TYPE_RGB_8, uc2const.COLOR_GRAY)
+
+	def test42_do_transform_many_lab_to_rgb(self):
+		transform = libcms.cms_create_transform(
+						libcms.cms_create_lab_profile(), uc2const.COLOR_LAB,
+						self.inProfile, uc2const.TYPE_RGB_8)
+		colors = [[0, 128, 128, 0], [100, 128, 128, 0], [50, 200, 60, 0],
+				[75, 20, 230, 0]]
+		self.check_transform_many(transform, colors,
+								uc2const.COLOR_LAB, uc2const.TYPE_RGB_8)
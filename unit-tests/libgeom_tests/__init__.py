@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import random
+import unittest
+
+from uc2 import libgeom
+from uc2.libgeom import PackedPaths
+
+TRAFOS = [
+	[1.0, 0.0, 0.0, 1.0, 0.0, 0.0],
+	[2.0, 0.0, 0.0, 1.0, 0.0, 0.0],
+	[1.0, 0.0, 0.0, 1.0, -5.5, 12.0],
+	[0.7, 0.3, -0.2, 1.1, 5.0, -3.0],
+]
+
+def random_point(rnd, size=100.0):
+	return [rnd.uniform(-size, size), rnd.uniform(-size, size)]
+
+def random_paths(rnd, size):
+	paths = []
+	for i in range(size):
+		points = []
+		for j in range(rnd.randint(0, 12)):
+			point = random_point(rnd)
+			kind = rnd.random()
+			if kind < 0.4:
+				points.append(point)
+			elif kind < 0.8:
+				points.append([random_point(rnd, 150.0),
+					random_point(rnd, 150.0), point, rnd.randint(0, 6)])
+			else:
+				# curve point without node marker
+				points.append([random_point(rnd, 150.0),
+					random_point(rnd, 150.0), point])
+		paths.append([random_point(rnd), points,
+			rnd.randint(0, 1) if points else 0])
+	return paths
+
+def add_markers(paths):
+	return [[path[0], [point + [0] if len(point) == 3 else point
+		for point in path[1]], path[2]] for path in paths]
+
+def sample_bbox(paths, steps=2000):
+	xs = []
+	ys = []
+	for path in paths:
+		prev = path[0]
+		xs.append(prev[0])
+		ys.append(prev[1])
+		for point in path[1]:
+			if len(point) == 2:
+				xs.append(point[0])
+				ys.append(point[1])
+				prev = point
+				continue
+			for i in range(steps + 1):
+				t = float(i) / steps
+				mt = 1.0 - t
+				for axis, coords in ((0, xs), (1, ys)):
+					coords.append(mt * mt * mt * prev[axis] +
+						3.0 * mt * mt * t * point[0][axis] +
+						3.0 * mt * t * t * point[1][axis] +
+						t * t * t * point[2][axis])
+			prev = point[2]
+	return [min(xs), min(ys), max(xs), max(ys)]
+
+class TestPackedPaths(unittest.TestCase):
+
+	def setUp(self):
+		self.paths = random_paths(random.Random(3), 200)
+
+	def test01_round_trip(self):
+		packed = PackedPaths(self.paths)
+		self.assertEqual(self.paths, packed.to_paths())
+		self.assertEqual(self.paths, packed.copy().to_paths())
+		self.assertEqual([], PackedPaths().to_paths())
+
+	def test02_append_paths(self):
+		packed = PackedPaths(self.paths[:50])
+		packed.append_paths(self.paths[50:])
+		self.assertEqual(self.paths, packed.to_paths())
+		self.assertEqual(len(self.paths), len(packed.get_ranges()))
+
+	def test03_apply_trafo(self):
+		paths = add_markers(self.paths)
+		packed = PackedPaths(paths)
+		for trafo in TRAFOS:
+			self.assertEqual(libgeom.apply_trafo_to_paths(paths, trafo),
+				packed.apply_trafo(trafo).to_paths())
+		# source paths are not changed
+		self.assertEqual(paths, packed.to_paths())
+
+	def test04_reverse(self):
+		paths = add_markers(self.paths)
+		packed = PackedPaths(paths)
+		self.assertEqual(libgeom.reverse_paths(paths),
+			packed.reverse().to_paths())
+		self.assertEqual(paths, packed.to_paths())
+
+	def test05_flat(self):
+		paths = [path for path in add_markers(self.paths) if path[1]]
+		packed = PackedPaths(paths)
+		for tlr in (0.1, 1.0):
+			self.assertEqual(libgeom.flat_paths(paths, tlr),
+				packed.flat(tlr).to_paths())
+
+	def test06_bbox(self):
+		self.assertEqual(None, PackedPaths().get_bbox())
+		lines = [[[0.0, 1.0], [[5.0, -2.0], [3.0, 4.0]], 0]]
+		self.assertEqual([0.0, -2.0, 5.0, 4.0],
+			PackedPaths(lines).get_bbox())
+		bbox = PackedPaths(self.paths).get_bbox()
+		for val1, val2 in zip(sample_bbox(self.paths), bbox):
+			self.assertAlmostEqual(val1, val2, 3)
+
+def rect_path(x0, y0, x1, y1, closed=1, reverse=False):
+	points = [[x1, y0], [x1, y1], [x0, y1], [x0, y0]]
+	if reverse:
+		points = [[x0, y1], [x1, y1], [x1, y0], [x0, y0]]
+	if not closed:
+		points = points[:-1]
+	return [[x0, y0], points, closed]
+
+def get_hit_paths(paths):
+	return libgeom.get_hit_paths(libgeom.flat_paths(paths, 0.01))
+
+class TestHitTest(unittest.TestCase):
+
+	def test01_inside_outside(self):
+		hit_paths = get_hit_paths([rect_path(0.0, 0.0, 10.0, 10.0)])
+		for evenodd in (True, False):
+			self.assertTrue(libgeom.is_point_in_hit_paths(
+				[5.0, 5.0], hit_paths, evenodd))
+			self.assertTrue(libgeom.is_point_in_hit_paths(
+				[0.1, 9.9], hit_paths, evenodd))
+			for point in ([15.0, 5.0], [-1.0, 5.0], [5.0, 10.1], [5.0, -3.0]):
+				self.assertFalse(libgeom.is_point_in_hit_paths(
+					point, hit_paths, evenodd))
+
+	def test02_fill_rules(self):
+		outer = rect_path(0.0, 0.0, 10.0, 10.0)
+		same = get_hit_paths([outer, rect_path(3.0, 3.0, 7.0, 7.0)])
+		opposite = get_hit_paths([outer,
+			rect_path(3.0, 3.0, 7.0, 7.0, reverse=True)])
+		# hole of even-odd fill
+		self.assertFalse(libgeom.is_point_in_hit_paths([5.0, 5.0], same))
+		self.assertFalse(libgeom.is_point_in_hit_paths([5.0, 5.0], opposite))
+		# nonzero winding fills inner path of the same direction only
+		self.assertTrue(libgeom.is_point_in_hit_paths(
+			[5.0, 5.0], same, False))
+		self.assertFalse(libgeom.is_point_in_hit_paths(
+			[5.0, 5.0], opposite, False))
+		for hit_paths in (same, opposite):
+			for evenodd in (True, False):
+				self.assertTrue(libgeom.is_point_in_hit_paths(
+					[1.0, 5.0], hit_paths, evenodd))
+				self.assertFalse(libgeom.is_point_in_hit_paths(
+					[11.0, 5.0], hit_paths, evenodd))
+
+	def test03_stroke_tolerance(self):
+		hit_paths = get_hit_paths([rect_path(0.0, 0.0, 10.0, 10.0)])
+		for point in ([5.0, 10.4], [5.0, 9.6], [-0.45, 5.0], [10.3, 10.3]):
+			self.assertTrue(libgeom.is_point_on_hit_paths(
+				point, hit_paths, 0.5))
+		for point in ([5.0, 10.6], [5.0, 5.0], [10.4, 10.4], [-0.6, 5.0]):
+			self.assertFalse(libgeom.is_point_on_hit_paths(
+				point, hit_paths, 0.5))
+
+	def test04_open_closed_paths(self):
+		opened = get_hit_paths([rect_path(0.0, 0.0, 10.0, 10.0, 0)])
+		closed = get_hit_paths([rect_path(0.0, 0.0, 10.0, 10.0)])
+		# open path is filled as implicitly closed one
+		self.assertTrue(libgeom.is_point_in_hit_paths([5.0, 5.0], opened))
+		self.assertFalse(libgeom.is_point_in_hit_paths(
+			[5.0, 5.0], opened, closed_only=True))
+		self.assertTrue(libgeom.is_point_in_hit_paths(
+			[5.0, 5.0], closed, closed_only=True))
+		# closing segment is stroked for closed path only
+		self.assertFalse(libgeom.is_point_on_hit_paths(
+			[0.2, 5.0], opened, 0.5))
+		self.assertTrue(libgeom.is_point_on_hit_paths(
+			[0.2, 5.0], closed, 0.5))
+		self.assertTrue(libgeom.is_point_on_hit_paths(
+			[5.0, 9.8], opened, 0.5))
+
+	def test05_curve_segment(self):
+		# apex of curve is at [5.0, 7.5]
+		path = [[0.0, 0.0], [[[0.0, 10.0], [10.0, 10.0], [10.0, 0.0], 0]], 1]
+		hit_paths = get_hit_paths([path])
+		self.assertTrue(libgeom.is_point_in_hit_paths([5.0, 7.3], hit_paths))
+		self.assertFalse(libgeom.is_point_in_hit_paths([5.0, 7.7], hit_paths))
+		# control points are outside of curve
+		self.assertFalse(libgeom.is_point_in_hit_paths([0.5, 9.0], hit_paths))
+		self.assertTrue(libgeom.is_point_on_hit_paths(
+			[5.0, 7.55], hit_paths, 0.1))
+		self.assertFalse(libgeom.is_point_on_hit_paths(
+			[5.0, 7.7], hit_paths, 0.1))
+		self.assertFalse(libgeom.is_point_on_hit_paths(
+			[0.5, 9.0], hit_paths, 0.1))
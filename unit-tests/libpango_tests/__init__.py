@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import unittest
+
+from uc2 import libcairo, libpango, sk2const
+from uc2.libpango import core, paths
+
+WIDTH = 200
+
+TEXTS = [
+	u'Quick brown fox\nlazy dog',
+	u'lazy dog\nQuick brown fox jumps\n\nover',
+	u'short\nQuick brown fox jumps over the lazy dog again and again',
+]
+
+def get_style(align):
+	return ['Sans', 'Regular', 12.0, align, [], False]
+
+def single_layout(text, width, text_style, markup):
+	# text as single Pango layout, as it was laid out before paragraphs
+	glyphs, line_points, layout_data, clusters, extents = \
+		paths.layout_paragraph(text, width, text_style, markup)
+	w, h = core.get_layout_size()
+	layout_bbox = [0.0, layout_data[0][1],
+		float(w), layout_data[0][1] - float(h)]
+	return glyphs, line_points, layout_data, layout_bbox, clusters
+
+def get_glyph_xs(glyphs):
+	return [libcairo.get_cpath_bbox(item)[0] if item else None
+		for item in glyphs]
+
+
+class TestParagraphLayout(unittest.TestCase):
+
+	def setUp(self):
+		libpango.clear_paragraph_cache()
+
+	def assertLayout(self, text, width, text_style, markup=None):
+		markup = markup or []
+		ret = libpango.get_text_paths(text, width, text_style, markup)
+		ref = single_layout(text, width, text_style, markup)
+		glyphs, line_points, layout_data, layout_bbox, clusters = ret
+		self.assertEqual(len(glyphs), len(ref[0]))
+		for x, ref_x in zip(get_glyph_xs(glyphs), get_glyph_xs(ref[0])):
+			if ref_x is None:
+				self.assertTrue(x is None)
+			else:
+				self.assertAlmostEqual(x, ref_x, delta=0.5)
+		for index, char in enumerate(text):
+			if char == '\n':
+				continue
+			self.assertAlmostEqual(layout_data[index][0],
+				ref[2][index][0], delta=0.5)
+		for value, ref_value in zip(layout_bbox, ref[3]):
+			self.assertAlmostEqual(value, ref_value, delta=1.0)
+
+	def check_alignment(self, align):
+		text_style = get_style(align)
+		for text in TEXTS:
+			for width in (-1, WIDTH):
+				self.assertLayout(text, width, text_style)
+
+	def test01_left(self):
+		self.check_alignment(sk2const.TEXT_ALIGN_LEFT)
+
+	def test02_center(self):
+		self.check_alignment(sk2const.TEXT_ALIGN_CENTER)
+
+	def test03_right(self):
+		self.check_alignment(sk2const.TEXT_ALIGN_RIGHT)
+
+	def test04_markup_over_line_break(self):
+		markup = [('b', (6, 20)), (('font', 'Serif', 'Bold', 18.0), (10, 17))]
+		for align in (sk2const.TEXT_ALIGN_CENTER, sk2const.TEXT_ALIGN_RIGHT):
+			for width in (-1, WIDTH):
+				self.assertLayout(TEXTS[0], width, get_style(align), markup)
+
+	def test05_cache_hits(self):
+		text_style = get_style(sk2const.TEXT_ALIGN_CENTER)
+		text = u'first line\nsecond line\nthird line'
+		libpango.get_text_paths(text, WIDTH, text_style, [])
+		self.assertEqual(len(paths.PARAGRAPH_CACHE), 3)
+		edited = u'first line\nsecond line edited\nthird line'
+		ret = libpango.get_text_paths(edited, WIDTH, text_style, [])
+		# only edited paragraph is laid out again
+		self.assertEqual(len(paths.PARAGRAPH_CACHE), 4)
+		libpango.clear_paragraph_cache()
+		ref = libpango.get_text_paths(edited, WIDTH, text_style, [])
+		self.assertEqual(get_glyph_xs(ret[0]), get_glyph_xs(ref[0]))
+		self.assertEqual(ret[2], ref[2])
+		self.assertEqual(ret[3], ref[3])
+		self.assertLayout(edited, WIDTH, text_style)
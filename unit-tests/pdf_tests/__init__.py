@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+import unittest
+from cStringIO import StringIO
+
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen.canvas import Canvas
+
+from uc2.formats.pdf import pdfmerge
+
+FONT_RE = re.compile(r'/F1 (\d+) 0 R')
+
+def build_pdf(objs, root=1, info=2):
+	"""
+	Writes objects (header, stream) numbered from 1 into
+	PDF document with classic cross-reference table.
+	"""
+	data = '%PDF-1.4\n'
+	offsets = []
+	for num, (header, stream) in enumerate(objs, 1):
+		offsets.append(len(data))
+		if stream is None:
+			data += '%d 0 obj\n%s\nendobj\n' % (num, header)
+		else:
+			header = header.replace('<<', '<< /Length %d' % len(stream), 1)
+			data += '%d 0 obj\n%s\nstream\n%s\nendstream\nendobj\n' % (
+				num, header, stream)
+	xref = len(data)
+	data += 'xref\n0 %d\n0000000000 65535 f \n' % (len(objs) + 1)
+	data += ''.join(['%010d 00000 n \n' % item for item in offsets])
+	data += 'trailer\n<< /Info %d 0 R /Root %d 0 R /Size %d >>\n' % (
+		info, root, len(objs) + 1)
+	data += 'startxref\n%d\n%%%%EOF\n' % xref
+	return data
+
+def make_document(markers, font_data='font', tag='AAAAAA',
+				image_data='\x80'):
+	"""
+	Generates document with page per marker. Pages share subset font
+	and image, page content shows marker.
+	"""
+	objs = [
+		('<< /Type /Catalog /Pages 3 0 R >>', None),
+		('<< /Producer (test) >>', None),
+		None,
+		('<< /Length1 %d >>' % len(font_data), font_data),
+		('<< /Type /FontDescriptor /FontName /%s+Face '
+		'/FontFile2 4 0 R >>' % tag, None),
+		('<< /Type /Font /Subtype /TrueType /BaseFont /%s+Face '
+		'/FontDescriptor 5 0 R >>' % tag, None),
+		('<< /Type /XObject /Subtype /Image /Width 1 /Height 1 '
+		'/ColorSpace /DeviceGray /BitsPerComponent 8 >>', image_data),
+	]
+	kids = []
+	for marker in markers:
+		objs.append(('<< >>', 'BT /F1 12 Tf (%s) Tj ET /Im1 Do' % marker))
+		objs.append(('<< /Type /Page /Parent 3 0 R /MediaBox [0 0 100 100] '
+			'/Contents %d 0 R /Resources << /Font << /F1 6 0 R >> '
+			'/XObject << /Im1 7 0 R >> >> >>' % len(objs), None))
+		kids.append('%d 0 R' % len(objs))
+	objs[2] = ('<< /Type /Pages /Count %d /Kids [ %s ] >>' %
+		(len(kids), ' '.join(kids)), None)
+	return build_pdf(objs)
+
+def make_reportlab_document(markers, image):
+	fileptr = StringIO()
+	canvas = Canvas(fileptr, invariant=1)
+	for marker in markers:
+		canvas.setFont('Helvetica', 12)
+		canvas.drawString(10, 10, marker)
+		canvas.drawImage(ImageReader(image), 10, 50, 20, 20)
+		canvas.showPage()
+	canvas.save()
+	return fileptr.getvalue()
+
+def merge(documents):
+	fileptr = StringIO()
+	pdfmerge.merge_documents(documents, fileptr)
+	return pdfmerge.parse_document(fileptr.getvalue())
+
+def get_pages(objs, root):
+	pages = objs[pdfmerge._get_ref(objs[root], 'Pages')]
+	kids = re.findall(r'(\d+) 0 R', pages.header[pages.header.find('/Kids'):])
+	count = int(re.search(r'/Count (\d+)', pages.header).group(1))
+	return count, [objs[int(item)] for item in kids]
+
+def find_objects(objs, pattern):
+	return [obj for obj in objs.values() if re.search(pattern, obj.header)]
+
+
+class TestPDFMerge(unittest.TestCase):
+
+	def test01_page_order(self):
+		documents = [make_document(['A1', 'A2']), make_document(['B1']),
+			make_document(['C1', 'C2', 'C3'])]
+		objs, root, info = merge(documents)
+		count, pages = get_pages(objs, root)
+		self.assertEqual(count, 6)
+		self.assertEqual(len(pages), 6)
+		markers = []
+		for page in pages:
+			self.assertTrue(page.header.startswith('<< /Parent '))
+			self.assertEqual(1, page.header.count('/Parent'))
+			contents = objs[pdfmerge._get_ref(page, 'Contents')]
+			markers.append(re.search(r'\((\w+)\)', contents.stream).group(1))
+		self.assertEqual(markers, ['A1', 'A2', 'B1', 'C1', 'C2', 'C3'])
+		self.assertIn('/Producer (test)', objs[info].header)
+
+	def test02_references(self):
+		documents = [make_document(['A1', 'A2'], 'font A'),
+			make_document(['B1'], 'font B', image_data='\x10')]
+		objs, root, info = merge(documents)
+		for obj in objs.values():
+			for ref in obj.refs:
+				self.assertIn(ref, objs)
+		pages_num = pdfmerge._get_ref(objs[root], 'Pages')
+		for page in get_pages(objs, root)[1]:
+			self.assertEqual(pages_num, pdfmerge._get_ref(page, 'Parent'))
+			font = objs[int(FONT_RE.search(page.header).group(1))]
+			self.assertIn('/Type /Font', font.header)
+			contents = objs[pdfmerge._get_ref(page, 'Contents')]
+			self.assertIn('Tj', contents.stream)
+
+	def test03_shared_objects(self):
+		documents = [make_document(['A1', 'A2']), make_document(['B1']),
+			make_document(['C1'])]
+		objs, root, info = merge(documents)
+		self.assertEqual(1, len(find_objects(objs, r'/Subtype /Image')))
+		self.assertEqual(1, len(find_objects(objs, r'/FontFile2')))
+		self.assertEqual(1, len(find_objects(objs, r'/Type /Font\b')))
+		fonts = set([FONT_RE.search(page.header).group(1)
+			for page in get_pages(objs, root)[1]])
+		self.assertEqual(1, len(fonts))
+
+	def test04_subset_tags(self):
+		documents = [make_document(['A1'], 'font A'),
+			make_document(['B1'], 'font B'), make_document(['C1'], 'font A')]
+		objs, root, info = merge(documents)
+		descriptors = find_objects(objs, r'/FontFile2')
+		self.assertEqual(2, len(descriptors))
+		names = [re.search(r'/FontName /(\S+)', obj.header).group(1)
+			for obj in descriptors]
+		self.assertNotEqual(names[0], names[1])
+		for name in names:
+			self.assertTrue(re.match(r'[A-Z]{6}\+Face$', name))
+		# font names follow own descriptors
+		for font in find_objects(objs, r'/Type /Font\b'):
+			descriptor = objs[pdfmerge._get_ref(font, 'FontDescriptor')]
+			self.assertEqual(
+				re.search(r'/BaseFont /(\S+)', font.header).group(1),
+				re.search(r'/FontName /(\S+)', descriptor.header).group(1))
+
+	def test05_reportlab_documents(self):
+		image = Image.new('RGB', (4, 4), (200, 10, 10))
+		documents = [make_reportlab_document(['A1', 'A2'], image),
+			make_reportlab_document(['B1'], image)]
+		objs, root, info = merge(documents)
+		count, pages = get_pages(objs, root)
+		self.assertEqual(count, 3)
+		for obj in objs.values():
+			for ref in obj.refs:
+				self.assertIn(ref, objs)
+		self.assertEqual(1, len(find_objects(objs, r'/Subtype /Image')))
+		self.assertEqual(1, len(find_objects(objs, r'/BaseFont /Helvetica')))
+
+	def test06_xref_stream(self):
+		data = '%PDF-1.5\n'
+		xref = len(data)
+		data += '1 0 obj\n<< /Type /XRef /Size 1 /W [1 2 1] /Length 0 >>\n' \
+			'stream\n\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n' % xref
+		self.assertRaises(pdfmerge.PDFMergeError,
+			pdfmerge.merge_documents, [data], StringIO())
+
+	def test07_no_documents(self):
+		self.assertRaises(pdfmerge.PDFMergeError,
+			pdfmerge.merge_documents, [], StringIO())
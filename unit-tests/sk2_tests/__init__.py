@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+#
+#	Copyright (C) 2018 by Igor E. Novikov
+#
+#	This program is free software: you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation, either version 3 of the License, or
+#	(at your option) any later version.
+#
+#	This program is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import ast
+import random
+import struct
+import unittest
+from cStringIO import StringIO
+
+from uc2 import sk2const
+from uc2.formats.sk2 import sk2_model, sk2_parser
+from uc2.formats.sk2.sk2_config import SK2_Config
+from uc2.formats.sk2.sk2_filters import SK2_Container, SK2_Loader, SK2_Saver
+from uc2.formats.sk2.sk2_methods import create_new_doc, add_child
+
+LITERALS = [
+	'0', '-1', '3.5', '-0.25', '.5', '5.', '1e3', '-2.5E-3', '1e+10',
+	'10L', '-123456789012345678901234567890', 'None', 'True', 'False',
+	"'abc'", '"abc"', "''", "'it\\'s'", "'a\\nb\\tc\\\\'", "'\\x00\\xff'",
+	"u'abc'", "u'\\u0436\\u0443\\u043a'", '"say \\"hi\\""',
+	'[]', '()', '{}', '[1, 2, 3]', '[1, 2, 3,]', '(1,)', '(1)', '(1, 2,)',
+	'[[0.0, 0.0], [[1.0, -1.0], [[2.0, 2.0], [3.0, 3.0], [4.0, 4.0], 0]], 1]',
+	"{'a': 1, 'b': [1.5, None], 2: (True, 'x')}", "{'a': 1,}",
+	"['RGB', [0.1, 0.2, 0.3], 1.0, '']", "  [ 1 ,2 ]  ",
+	"(u'\\xe9', 'plain', 1L, -1e-3)",
+]
+
+MALFORMED = [
+	'', '[1, 2', '[1 2]', '{1: }', '{1 2}', '(,)', 'foo', '__import__("os")',
+	'[1, 2]]', "'abc", '1 2', '{1: 2 3}', 'open("x")',
+]
+
+class TestSK2Parser(unittest.TestCase):
+
+	def assertSameLiteral(self, expected, result):
+		self.assertEqual(type(expected), type(result))
+		if isinstance(expected, (list, tuple)):
+			self.assertEqual(len(expected), len(result))
+			for item1, item2 in zip(expected, result):
+				self.assertSameLiteral(item1, item2)
+		elif isinstance(expected, dict):
+			self.assertEqual(sorted(expected.keys()), sorted(result.keys()))
+			for key in expected.keys():
+				self.assertSameLiteral(expected[key], result[key])
+		else:
+			self.assertEqual(expected, result)
+
+	def test01_parse_literal(self):
+		for text in LITERALS:
+			expected = ast.literal_eval(text.strip())
+			self.assertSameLiteral(expected, sk2_parser.parse_literal(text))
+			# second call is served by literal cache
+			self.assertSameLiteral(expected, sk2_parser.parse_literal(text))
+
+	def test02_parse_literal_is_not_shared(self):
+		val = sk2_parser.parse_literal('[[1.0, 2.0], {"a": [3]}]')
+		val[0].append(5)
+		val[1]['a'].append(4)
+		self.assertEqual([[1.0, 2.0], {'a': [3]}],
+			sk2_parser.parse_literal('[[1.0, 2.0], {"a": [3]}]'))
+
+	def test03_parse_malformed_literal(self):
+		for text in MALFORMED:
+			self.assertRaises((ValueError, SyntaxError),
+				sk2_parser.parse_literal, text)
+
+	def test04_parse_string(self):
+		for text in ["'abc'", '"a b"', "'it\\'s'", "u'\\u0436'", "'a\"b'"]:
+			self.assertSameLiteral(ast.literal_eval(text),
+				sk2_parser.parse_string(text))
+
+	def test05_parse_record(self):
+		self.assertEqual((sk2_parser.OBJ, ('Rectangle',)),
+			sk2_parser.parse_record("obj('Rectangle')"))
+		self.assertEqual((sk2_parser.OBJ_END, ()),
+			sk2_parser.parse_record('obj_end()'))
+		kind, args = sk2_parser.parse_record(
+			"set_field('trafo',[1.0, 0.0, 0.0, 1.0, -5.5, 1e-3])")
+		self.assertEqual(sk2_parser.SET_FIELD, kind)
+		self.assertEqual('trafo', args[0])
+		self.assertEqual([1.0, 0.0, 0.0, 1.0, -5.5, 1e-3],
+			sk2_parser.parse_literal(args[1]))
+
+	def test06_parse_record_fallback(self):
+		for line in ["obj( 'Rectangle' )", "obj(\"Curve\")",
+					"set_field( 'name' , u'\\u0436' )",
+					"set_field('name',(1,))"]:
+			kind, args = sk2_parser.parse_record(line)
+			call = ast.parse(line, mode='eval').body
+			expected = [ast.literal_eval(item) for item in call.args]
+			if kind == sk2_parser.SET_FIELD:
+				self.assertEqual(expected[0], args[0])
+				self.assertSameLiteral(expected[1],
+					sk2_parser.parse_literal(args[1]))
+			else:
+				self.assertEqual(tuple(expected), args)
+
+	def test07_parse_malformed_record(self):
+		for line in ['', 'obj(', "exec('x')", "obj(name='x')",
+					"set_field('a')", "__import__('os').system('ls')",
+					"obj('a', *b)", 'obj_end']:
+			self.assertRaises((ValueError, SyntaxError),
+				sk2_parser.parse_record, line)
+		# field value is not decoded by record parser
+		kind, args = sk2_parser.parse_record("set_field('a',os.name)")
+		self.assertRaises((ValueError, SyntaxError),
+			sk2_parser.parse_literal, args[1])
+
+
+def generate_document():
+	config = SK2_Config()
+	doc = create_new_doc(config)
+	pages = doc.childs[0]
+	style = [[sk2const.FILL_EVENODD, sk2const.FILL_SOLID,
+			sk2const.CMYK_BLACK], [] + config.default_stroke, [], []]
+	bitmap = 'bitmap\x00\n\xff' * 100
+	alpha = 'alpha\x00\r\n' * 50
+	for index in range(3):
+		if index:
+			page = sk2_model.Page(config, pages)
+			add_child(pages, page)
+			add_child(page, sk2_model.Layer(config, page))
+		layer = pages.childs[index].childs[0]
+		for i in range(index + 2):
+			rect = [10.0 * i, 5.0 * index, 20.0, 30.0 + i]
+			add_child(layer, sk2_model.Rectangle(config, layer, rect,
+				style=style))
+		# copied pixmaps share bitmap strings
+		for i in range(2):
+			add_child(layer, sk2_model.Pixmap(config, layer, bitmap, alpha))
+	# loaded pages are updated, so saved model should be updated too
+	doc.do_update()
+	return doc
+
+def dump_obj(obj):
+	fields = []
+	for item in sorted(obj.__dict__.keys()):
+		if item not in sk2_model.GENERIC_FIELDS and \
+				not item.startswith('cache'):
+			fields.append((item, getattr(obj, item)))
+	return (obj.cid, fields, [dump_obj(child) for child in obj.childs])
+
+def save_binary(doc):
+	saver = SK2_Saver()
+	saver.config = doc.config
+	saver.model = doc
+	saver.fileptr = StringIO()
+	saver.save_binary()
+	return saver.fileptr.getvalue()
+
+def load_binary(data):
+	loader = SK2_Loader()
+	loader.config = SK2_Config()
+	loader.fileptr = StringIO(data)
+	loader.file_size = len(data)
+	loader.do_load()
+	return loader
+
+class TestSK2Binary(unittest.TestCase):
+
+	def setUp(self):
+		self.doc = generate_document()
+		self.data = save_binary(self.doc)
+
+	def test01_header(self):
+		header = sk2const.SK2BIN_ID + sk2const.SK2VER + '\n'
+		self.assertEqual(header, self.data[:len(header)])
+
+	def test02_lazy_pages(self):
+		loader = load_binary(self.data)
+		doc = loader.model
+		pages = doc.childs[0].__dict__['childs']
+		self.assertEqual(3, len(pages))
+		for page, orig in zip(pages, self.doc.childs[0].childs):
+			self.assertFalse(page.is_loaded())
+			self.assertEqual(orig.count(), page.count())
+		# only accessed page is loaded
+		layer = pages[1].childs[0]
+		self.assertTrue(pages[1].is_loaded())
+		self.assertFalse(pages[0].is_loaded())
+		self.assertFalse(pages[2].is_loaded())
+		self.assertTrue(layer.parent is pages[1])
+		self.assertEqual(5, len(layer.childs))
+
+	def test03_round_trip(self):
+		doc = load_binary(self.data).model
+		self.assertEqual(dump_obj(self.doc), dump_obj(doc))
+		# loaded document is saved again without losses
+		doc = load_binary(save_binary(doc)).model
+		self.assertEqual(dump_obj(self.doc), dump_obj(doc))
+
+	def test04_blob_dedupe(self):
+		loader = load_binary(self.data)
+		# six pixmaps share one bitmap and one alpha channel
+		self.assertEqual(2, len(loader.container.index['blobs']))
+		page = loader.model.childs[0].childs[2]
+		pixmaps = [obj for obj in page.childs[0].childs if obj.is_pixmap()]
+		self.assertEqual(2, len(pixmaps))
+		for pixmap in pixmaps:
+			self.assertTrue(callable(pixmap.__dict__['bitmap']))
+			self.assertTrue(callable(pixmap.__dict__['alpha_channel']))
+		orig = self.doc.childs[0].childs[2].childs[0].childs[-1]
+		self.assertEqual(orig.bitmap, pixmaps[0].bitmap)
+		self.assertEqual(orig.alpha_channel, pixmaps[0].alpha_channel)
+		self.assertFalse(callable(pixmaps[0].__dict__['bitmap']))
+		self.assertTrue(callable(pixmaps[1].__dict__['bitmap']))
+
+	def test05_truncated_container(self):
+		trailer_size = struct.calcsize(sk2const.SK2BIN_TRAILER)
+		self.assertRaises(IOError, SK2_Container, self.data[:trailer_size - 1])
+		header = sk2const.SK2BIN_ID + sk2const.SK2VER + '\n'
+		self.assertRaises(IOError, load_binary, header)
+
+	def test06_corrupted_trailer(self):
+		trailer_size = struct.calcsize(sk2const.SK2BIN_TRAILER)
+		data = self.data[:-trailer_size]
+		offset, size = struct.unpack(sk2const.SK2BIN_TRAILER,
+			self.data[-trailer_size:])
+		for bad_offset, bad_size in [(len(data), size), (offset, size + 1),
+									(2 ** 40, size), (offset, 2 ** 40)]:
+			trailer = struct.pack(sk2const.SK2BIN_TRAILER, bad_offset, bad_size)
+			self.assertRaises(IOError, load_binary, data + trailer)
+		# cut data keeps index offset beyond container end
+		self.assertRaises(IOError, load_binary,
+			data[:offset] + self.data[-trailer_size:])
+
+
+def random_bbox(rnd):
+	x = rnd.uniform(-100.0, 1000.0)
+	y = rnd.uniform(-100.0, 1000.0)
+	return [x, y, x + rnd.uniform(0.0, 80.0), y + rnd.uniform(0.0, 80.0)]
+
+class TestLayerIndex(unittest.TestCase):
+
+	def setUp(self):
+		self.rnd = random.Random(5)
+		self.config = SK2_Config()
+		self.layer = sk2_model.Layer(self.config)
+
+	def new_obj(self):
+		obj = sk2_model.Rectangle(self.config, self.layer,
+			style=[[], [], [], []])
+		# some objects have no bbox and are always visible
+		if self.rnd.random() > 0.05:
+			obj.cache_bbox = random_bbox(self.rnd)
+		return obj
+
+	def brute_force(self, bbox):
+		x0, y0, x1, y1 = bbox
+		ret = []
+		for obj in self.layer.childs:
+			obj_bbox = sk2_model.get_visual_bbox(obj)
+			if not obj_bbox or (obj_bbox[0] <= x1 and obj_bbox[2] >= x0 and
+					obj_bbox[1] <= y1 and obj_bbox[3] >= y0):
+				ret.append(obj)
+		return ret
+
+	def check_queries(self, count=20):
+		for i in range(count):
+			bbox = random_bbox(self.rnd)
+			bbox[2] += self.rnd.uniform(0.0, 400.0)
+			expected = self.brute_force(bbox)
+			result = self.layer.query_bbox(bbox)
+			self.assertEqual(len(expected), len(result))
+			for obj1, obj2 in zip(expected, result):
+				self.assertTrue(obj1 is obj2)
+
+	def test01_small_layer(self):
+		for i in range(sk2_model.INDEX_MIN_SIZE - 1):
+			self.layer.childs.append(self.new_obj())
+		self.assertTrue(self.layer.query_bbox([0, 0, 1, 1]) is
+			self.layer.childs)
+		self.assertTrue(self.layer.cache_index is None)
+
+	def test02_random_edits(self):
+		rnd = self.rnd
+		self.layer.childs = [self.new_obj() for i in range(300)]
+		self.check_queries()
+		for step in range(300):
+			childs = self.layer.childs
+			action = rnd.randint(0, 6)
+			if action == 0:
+				childs.append(self.new_obj())
+			elif action == 1:
+				childs.insert(rnd.randint(0, len(childs)), self.new_obj())
+			elif action == 2:
+				childs.remove(rnd.choice(childs))
+			elif action == 3:
+				childs.pop(rnd.randint(0, len(childs) - 1))
+			elif action == 4:
+				childs[rnd.randint(0, len(childs) - 1)] = self.new_obj()
+			elif action == 5:
+				# z-order change
+				obj = childs.pop(rnd.randint(0, len(childs) - 1))
+				childs.insert(rnd.randint(0, len(childs)), obj)
+			else:
+				for obj in rnd.sample(childs, 5):
+					obj.cache_bbox = random_bbox(rnd)
+			if not step % 10:
+				self.check_queries(5)
+		self.check_queries()
+
+	def test03_list_reset(self):
+		rnd = self.rnd
+		self.layer.childs = [self.new_obj() for i in range(200)]
+		self.check_queries(5)
+		childs = self.layer.childs
+		del childs[10:50]
+		self.check_queries(5)
+		childs[5:8] = [self.new_obj() for i in range(10)]
+		self.check_queries(5)
+		rnd.shuffle(childs)
+		childs.reverse()
+		self.check_queries(5)
+		childs.extend([self.new_obj() for i in range(30)])
+		obj = childs[-1]
+		obj.cache_bbox = []
+		self.check_queries(5)
+		obj.cache_bbox = random_bbox(rnd)
+		self.check_queries()